@@ -0,0 +1,126 @@
+"""Benchmark das consultas quentes antes e depois do arquivamento de faturas pagas.
+
+Mede, no banco gerado por ``benchmarks.gerar_dados``, o tempo (mediana) e os
+blocos lidos (``EXPLAIN (ANALYZE, BUFFERS)``) do LTV, do histórico por CNPJ, das
+vencidas por nome e do top de pendências; roda ``src.arquivamento.arquivar`` e
+mede de novo com as consultas que somam ``a_receber_arquivo_totais``. Confere
+também que o LTV de todos os clientes é o mesmo antes e depois (código de saída
+1 se divergir).
+
+ATENÇÃO: altera o banco (move faturas para o arquivo). Use só no banco de benchmark.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.gerar_dados --escala 1m --recriar
+    python -m benchmarks.bench_arquivamento --clientes 40000 [--meses 12] [--repeticoes 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+
+import psycopg2
+
+from benchmarks.gerar_dados import cnpj_cliente, nome_cliente
+from src import arquivamento, consultas
+
+
+def variante(sql, arquivo):
+    """A consulta com o LTV só da tabela quente ou somando o arquivo"""
+    base = sql.replace(consultas.SQL_LTV_COM_ARQUIVO, consultas.SQL_LTV_QUENTE)
+    return base.replace(consultas.SQL_LTV_QUENTE, consultas.SQL_LTV_COM_ARQUIVO) if arquivo else base
+
+
+def consultas_quentes(arquivo, cnpjs, nomes):
+    return {
+        'ltv (todos)': (variante(consultas.SQL_LTV, arquivo), [()]),
+        'historico_cnpj': (variante(consultas.SQL_HISTORICO_CNPJ, arquivo), [(c,) for c in cnpjs]),
+        'vencidas_nome': (variante(consultas.SQL_VENCIDAS_NOME, arquivo), [(f'%{n}%',) for n in nomes]),
+        'top_pendencias': (variante(consultas.SQL_TOP_PENDENCIAS, arquivo), [(10,)]),
+    }
+
+
+def medir(cursor, sql, parametros, repeticoes):
+    """(mediana do tempo em ms, mediana de blocos lidos) do EXPLAIN ANALYZE"""
+    tempos, blocos = [], []
+    for _ in range(repeticoes):
+        for args in parametros:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", args)
+            plano = cursor.fetchone()[0][0]
+            tempos.append(plano['Execution Time'])
+            raiz = plano['Plan']
+            blocos.append(raiz.get('Shared Hit Blocks', 0) + raiz.get('Shared Read Blocks', 0))
+    return statistics.median(tempos), statistics.median(blocos)
+
+
+def ltv_por_cliente(cursor, arquivo):
+    cursor.execute(variante(consultas.SQL_LTV, arquivo))
+    return {row[0]: (row[1], int(row[2]), row[3]) for row in cursor.fetchall()}
+
+
+def tamanho_tabela(cursor):
+    cursor.execute("SELECT pg_size_pretty(pg_total_relation_size('a_receber_turbo')), COUNT(*) FROM a_receber_turbo")
+    return cursor.fetchone()
+
+
+def rodada(cursor, arquivo, cnpjs, nomes, repeticoes):
+    resultado = {}
+    for nome, (sql, parametros) in consultas_quentes(arquivo, cnpjs, nomes).items():
+        resultado[nome] = medir(cursor, sql, parametros, repeticoes)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # Nunca cair no DATABASE_URL: o benchmark arquiva (apaga) faturas da tabela quente
+    parser.add_argument('--dsn', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help="DSN do Postgres de benchmark (padrão: BENCH_DATABASE_URL)")
+    parser.add_argument('--clientes', type=int, required=True,
+                        help="Quantidade de clientes usada em benchmarks.gerar_dados")
+    parser.add_argument('--amostra', type=int, default=20, help="CNPJs/nomes sorteados por consulta")
+    parser.add_argument('--meses', type=int, default=arquivamento.ARQUIVO_MESES)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error("informe --dsn ou defina BENCH_DATABASE_URL")
+
+    rnd = random.Random(args.seed)
+    indices = [rnd.randrange(args.clientes) for _ in range(args.amostra)]
+    cnpjs = [cnpj_cliente(i) for i in indices]
+    nomes = [nome_cliente(i).split()[2] for i in indices]
+
+    conn = psycopg2.connect(args.dsn)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            tamanho_antes = tamanho_tabela(cursor)
+            ltv_antes = ltv_por_cliente(cursor, arquivo=False)
+            antes = rodada(cursor, False, cnpjs, nomes, args.repeticoes)
+
+        arquivamento.arquivar(conn, meses=args.meses)
+
+        with conn.cursor() as cursor:
+            tamanho_depois = tamanho_tabela(cursor)
+            ltv_depois = ltv_por_cliente(cursor, arquivo=True)
+            depois = rodada(cursor, True, cnpjs, nomes, args.repeticoes)
+    finally:
+        conn.close()
+
+    print(f"a_receber_turbo: {tamanho_antes[1]:,} faturas ({tamanho_antes[0]}) -> "
+          f"{tamanho_depois[1]:,} faturas ({tamanho_depois[0]})")
+    print(f"{'consulta':>16} | {'antes (ms)':>10} | {'depois (ms)':>11} | {'blocos antes':>12} | {'blocos depois':>13}")
+    for nome in antes:
+        print(f"{nome:>16} | {antes[nome][0]:>10.2f} | {depois[nome][0]:>11.2f} | "
+              f"{antes[nome][1]:>12,.0f} | {depois[nome][1]:>13,.0f}")
+
+    divergentes = [c for c in ltv_antes.keys() | ltv_depois.keys() if ltv_antes.get(c) != ltv_depois.get(c)]
+    if divergentes:
+        print(f"ERRO: LTV diferente para {len(divergentes)} cliente(s), ex.: {divergentes[:5]}", file=sys.stderr)
+        sys.exit(1)
+    print(f"LTV idêntico antes e depois para {len(ltv_antes):,} clientes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Micro-benchmark da renderização da resposta do TurboChat por CNPJ.
+
+Compara a montagem antiga (concatenação de f-strings) com os templates Jinja
+pré-compilados, sem cache (primeira consulta) e com cache (consulta repetida),
+para clientes com 10, 100 e 1000 faturas.
+
+O template não é mais rápido que as f-strings (ele ainda escapa o HTML, que a
+versão antiga não escapava): o ganho vem do cache por cliente. As saídas só são
+iguais depois de desfazer o escape; parte das faturas sintéticas tem ``&``,
+``<`` e aspas na descrição e no link para exercitar essa diferença.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_render_faturas [--repeticoes 200]
+"""
+import argparse
+import html
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from src.app import app  # noqa: F401  (inicializa o ambiente Jinja do chat)
+from src import chat_render
+from src.chat_render import resumir_atividade
+
+
+def gerar_linhas(qtd, seed=42):
+    """Gerar linhas no formato retornado pela consulta de buscar_por_cnpj_chat"""
+    rnd = random.Random(seed)
+    hoje = date.today()
+    linhas = []
+    for i in range(qtd):
+        # Uma em cada sete faturas com caracteres que o HTML precisa escapar
+        especial = i % 7 == 0
+        vencimento = hoje + timedelta(days=rnd.randint(-720, 60))
+        total = Decimal(rnd.randint(10000, 500000)) / 100
+        pago_ = rnd.random() < 0.7
+        if pago_:
+            status_cobranca, ordem = 'pago', 4
+        elif vencimento < hoje:
+            status_cobranca, ordem = 'vencido', 1
+        elif vencimento == hoje:
+            status_cobranca, ordem = 'vence_hoje', 2
+        else:
+            status_cobranca, ordem = 'futuro', 3
+        linhas.append({
+            'id': 100000 + i,
+            'status': 'ACQUITTED' if pago_ else 'PENDING',
+            'total': total,
+            'descricao': (f'Setup & <b>bônus</b> "{i}" - Gestão de tráfego' if especial
+                          else f'Mensalidade {i} - Gestão de tráfego e performance digital do cliente'),
+            'data_vencimento': vencimento,
+            'nao_pago': Decimal(0) if pago_ else total,
+            'pago': total if pago_ else Decimal(0),
+            'data_criacao': datetime(2023, 1, 1),
+            'data_alteracao': datetime(2024, 1, 1) + timedelta(minutes=i),
+            'cliente_id': 'c-1',
+            'cliente_nome': 'Empresa Exemplo LTDA',
+            'link_pagamento': (f'https://pagamento.example/{i}?origem=chat&ref=<{i}>' if especial
+                               else f'https://pagamento.example/{i}') if not pago_ else None,
+            'responsavel': 'Maria',
+            'segmento': 'Varejo',
+            'cluster': 'A',
+            'status_conta': 'ativo',
+            'atividade': 'Status: Em andamento | Relação com o cliente: 8 | ' + 'Reunião semanal. ' * 20,
+            'telefone_clickup': '11999999999',
+            'status_clickup': 'ativo',
+            'ltv_total': Decimal('123456.78'),
+            'total_faturas': qtd,
+            'valor_inadimplente_total': Decimal('4321.00'),
+            'status_cobranca': status_cobranca,
+            'ordem_prioridade': ordem,
+        })
+    linhas.sort(key=lambda r: (r['ordem_prioridade'], -r['data_vencimento'].toordinal()))
+    return linhas
+
+
+def formatar_legado(cnpj, rows):
+    """Implementação anterior (f-strings), mantida aqui apenas para comparação"""
+    cliente_nome = rows[0]['cliente_nome']
+    vencidas = [row for row in rows if row['status_cobranca'] == 'vencido']
+    vence_hoje = [row for row in rows if row['status_cobranca'] == 'vence_hoje']
+    futuras = [row for row in rows if row['status_cobranca'] == 'futuro']
+    pagas = [row for row in rows if row['status_cobranca'] == 'pago']
+    total_pendente = sum(float(row['nao_pago']) for row in rows if row['nao_pago'] > 0)
+    total_pago = sum(float(row['pago']) for row in rows if row['pago'] > 0)
+
+    response = f"📊 **{cliente_nome}** (CNPJ: {cnpj})\n\n"
+    response += f"💰 **Total Pendente**: R$ {total_pendente:,.2f}\n"
+    response += f"✅ **Total Pago**: R$ {total_pago:,.2f}\n"
+    response += f"📋 **Total de Faturas**: {len(rows)}\n\n"
+    if rows[0]['ltv_total'] is not None:
+        response += f"💎 **LTV Total Pago**: R$ {float(rows[0]['ltv_total']):,.2f}\n"
+    if rows[0]['total_faturas'] is not None:
+        response += f"📊 **Total de Faturas (LTV)**: {rows[0]['total_faturas']}\n"
+    if rows[0]['valor_inadimplente_total'] is not None:
+        response += f"⚠️ **Valor Inadimplente Total**: R$ {float(rows[0]['valor_inadimplente_total']):,.2f}\n"
+    response += "\n"
+    if rows[0]['responsavel']:
+        response += f"👤 **Responsável**: {rows[0]['responsavel']}\n"
+    if rows[0]['segmento']:
+        response += f"🏢 **Segmento**: {rows[0]['segmento']}\n"
+    if rows[0]['status_clickup'] is not None:
+        status_operacional = "🟢 Ativo" if rows[0]['status_clickup'] == 'ativo' else "🔴 Inativo"
+        response += f"⚡ **Status Operacional**: {status_operacional}\n"
+    if rows[0]['cluster']:
+        response += f"📊 **Cluster**: {rows[0]['cluster']}\n"
+    if rows[0]['atividade']:
+        resumo_atividade = resumir_atividade(rows[0]['atividade'])
+        if resumo_atividade:
+            response += f"\n📝 **Resumo da Atividade**:\n{resumo_atividade}\n"
+
+    todas_faturas = []
+    faturas_html = None
+    for row in vencidas + vence_hoje + futuras:
+        todas_faturas.append({
+            'id': row['id'], 'data': row['data_vencimento'],
+            'valor': float(row['nao_pago']) if row['nao_pago'] else 0.0,
+            'status': row['status_cobranca'], 'link_pagamento': row['link_pagamento'],
+            'descricao': row['descricao'] or 'Cobrança', 'tipo': 'pendente'
+        })
+    for row in pagas[:3]:
+        todas_faturas.append({
+            'id': row['id'], 'data': row['data_vencimento'],
+            'valor': float(row['pago']) if row['pago'] else 0.0,
+            'status': 'pago', 'link_pagamento': None,
+            'descricao': row['descricao'] or 'Cobrança', 'tipo': 'pago'
+        })
+    todas_faturas.sort(key=lambda x: (x['data'], x['status'] != 'vencido'))
+
+    if todas_faturas:
+        if vencidas:
+            total_vencido = sum(float(row['nao_pago']) for row in vencidas)
+            response += f"\n⚠️ **ATENÇÃO**: {len(vencidas)} fatura(s) vencida(s) totalizando R$ {total_vencido:,.2f}\n\n"
+        response += f"📋 **{len(todas_faturas)} faturas encontradas**\n\n"
+        response += "🔍 Use o botão abaixo para visualizar as faturas\n\n"
+        faturas_html = "<div class='faturas-content'>\n"
+        faturas_html += "<h4>📋 Histórico de Faturas (ordenado por data)</h4>\n"
+        for i, fatura in enumerate(todas_faturas[:10], 1):
+            if fatura['status'] == 'vencido':
+                status_emoji, status_text = "🔴", "<strong>VENCIDA</strong>"
+                valor_format = f"<strong>R$ {fatura['valor']:,.2f}</strong>"
+                row_class = "text-danger"
+            elif fatura['status'] == 'vence_hoje':
+                status_emoji, status_text = "🟡", "Vence Hoje"
+                valor_format = f"<strong>R$ {fatura['valor']:,.2f}</strong>"
+                row_class = "text-warning"
+            elif fatura['status'] == 'futuro':
+                status_emoji, status_text = "🔵", "Futuro"
+                valor_format = f"R$ {fatura['valor']:,.2f}"
+                row_class = "text-info"
+            else:
+                status_emoji, status_text = "✅", "Pago"
+                valor_format = f"R$ {fatura['valor']:,.2f}"
+                row_class = "text-success"
+            faturas_html += f"<div class='fatura-item {row_class} mb-2 p-2 border rounded'>\n"
+            faturas_html += f"  <div><strong>{i:2d}. {status_emoji} {status_text}</strong> | {valor_format}</div>\n"
+            faturas_html += f"  <div class='text-muted'>📅 {fatura['data']} | 📝 {fatura['descricao'][:50]}{'...' if len(fatura['descricao']) > 50 else ''}</div>\n"
+            if fatura['link_pagamento'] and fatura['tipo'] == 'pendente':
+                faturas_html += f"  <div class='mt-1'><a href='{fatura['link_pagamento']}' target='_blank' class='btn btn-sm btn-primary'>💳 Pagar Agora</a></div>\n"
+            faturas_html += "</div>\n"
+        if len(rows) > 10:
+            faturas_html += f"<div class='text-muted mt-2'>📊 <em>Mostrando 10 de {len(rows)} faturas totais</em></div>\n"
+        faturas_html += "</div>\n"
+    return response, faturas_html
+
+
+def medir(func, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        func()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=200)
+    args = parser.parse_args()
+
+    cnpj = '12345678000190'
+    print(f"{'faturas':>8} | {'f-strings (ms)':>15} | {'jinja s/ cache (ms)':>19} | {'jinja c/ cache (ms)':>19}")
+    for qtd in (10, 100, 1000):
+        rows = gerar_linhas(qtd)
+        # Mesmo conteúdo; o HTML do template vem escapado e o da versão antiga não
+        texto_legado, html_legado = formatar_legado(cnpj, rows)
+        texto, html_jinja = chat_render.formatar_resposta_cnpj(cnpj, rows)
+        assert texto == texto_legado, qtd
+        assert html.unescape(html_jinja) == html_legado, qtd
+        assert '&lt;b&gt;' in html_jinja, qtd
+
+        legado = medir(lambda: formatar_legado(cnpj, rows), args.repeticoes)
+        sem_cache = medir(lambda: chat_render.formatar_resposta_cnpj(cnpj, rows), args.repeticoes)
+        chat_render.invalidar_cliente()
+        chat_render.renderizar_resposta_cnpj(cnpj, rows)
+        com_cache = medir(lambda: chat_render.renderizar_resposta_cnpj(cnpj, rows), args.repeticoes)
+        print(f"{qtd:>8} | {legado:>15.3f} | {sem_cache:>19.3f} | {com_cache:>19.3f}")
+
+
+if __name__ == '__main__':
+    main()
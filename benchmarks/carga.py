@@ -0,0 +1,188 @@
+"""Driver de carga ponta a ponta para as rotas de consulta.
+
+Dispara requisições concorrentes contra ``/buscar``, ``/buscar_por_nome``,
+``/listar-clientes`` e ``/turbochat/message`` de uma instância do app (local,
+apontando para o banco gerado por ``benchmarks.gerar_dados``) e reporta
+p50/p95/p99 e vazão por rota.
+
+O resultado pode ser salvo como baseline em JSON e comparado numa execução
+futura; a comparação termina com código 1 se o p95 de alguma rota piorar além
+da tolerância, o que permite usar o script para pegar regressões.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.carga --url http://localhost:5000 --clientes 4000 --duracao 60 \\
+        --salvar benchmarks/resultados/baseline.json
+    python -m benchmarks.carga --clientes 4000 --comparar benchmarks/resultados/baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from benchmarks.gerar_dados import cnpj_cliente, nome_cliente
+
+# Peso padrão de cada rota no mix de requisições
+MIX_PADRAO = {
+    'buscar': 40,
+    'buscar_por_nome': 20,
+    'turbochat': 35,
+    'listar_clientes': 5,
+}
+
+
+def _requisicao(sessao, base_url, rota, rnd, n_clientes, timeout):
+    """Montar e executar uma requisição da rota; retorna o status HTTP"""
+    i = rnd.randrange(n_clientes)
+    if rota == 'buscar':
+        resp = sessao.post(f"{base_url}/buscar", data={'cnpj': cnpj_cliente(i)}, timeout=timeout)
+    elif rota == 'buscar_por_nome':
+        resp = sessao.post(f"{base_url}/buscar_por_nome", data={'nome': nome_cliente(i).split()[2]}, timeout=timeout)
+    elif rota == 'turbochat':
+        resp = sessao.post(f"{base_url}/turbochat/message", json={'message': f"cnpj {cnpj_cliente(i)}"}, timeout=timeout)
+    elif rota == 'listar_clientes':
+        resp = sessao.get(f"{base_url}/listar-clientes", timeout=timeout)
+    else:
+        raise ValueError(f"Rota desconhecida: {rota}")
+    resp.content  # garantir que o corpo inteiro foi lido
+    return resp.status_code
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return None
+    indice = min(len(valores_ordenados) - 1, max(0, round(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
+
+
+def executar(base_url, n_clientes, concorrencia, duracao, mix, seed, timeout):
+    latencias = {rota: [] for rota in mix}
+    erros = {rota: 0 for rota in mix}
+    lock = threading.Lock()
+    local = threading.local()
+    rotas = list(mix)
+    pesos = [mix[r] for r in rotas]
+    fim = time.monotonic() + duracao
+
+    def trabalhador(n):
+        rnd = random.Random(seed + n)
+        if not hasattr(local, 'sessao'):
+            local.sessao = requests.Session()
+        while time.monotonic() < fim:
+            rota = rnd.choices(rotas, weights=pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                status = _requisicao(local.sessao, base_url, rota, rnd, n_clientes, timeout)
+                ok = status < 500
+            except requests.RequestException:
+                ok = False
+            decorrido = (time.perf_counter() - inicio) * 1000
+            with lock:
+                latencias[rota].append(decorrido)
+                if not ok:
+                    erros[rota] += 1
+
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(trabalhador, range(concorrencia)))
+    total_segundos = time.monotonic() - inicio
+
+    resultado = {}
+    for rota in rotas:
+        valores = sorted(latencias[rota])
+        resultado[rota] = {
+            'requisicoes': len(valores),
+            'erros': erros[rota],
+            'vazao_rps': round(len(valores) / total_segundos, 2),
+            'p50_ms': _arredondar(percentil(valores, 50)),
+            'p95_ms': _arredondar(percentil(valores, 95)),
+            'p99_ms': _arredondar(percentil(valores, 99)),
+        }
+    return resultado, total_segundos
+
+
+def _arredondar(valor):
+    return None if valor is None else round(valor, 2)
+
+
+def comparar(atual, baseline, tolerancia):
+    """Retornar a lista de rotas cujo p95 piorou além da tolerância"""
+    regressoes = []
+    for rota, dados in atual.items():
+        anterior = baseline.get('rotas', {}).get(rota)
+        if not anterior or not anterior.get('p95_ms') or dados['p95_ms'] is None:
+            continue
+        variacao = dados['p95_ms'] / anterior['p95_ms'] - 1
+        if variacao > tolerancia:
+            regressoes.append((rota, anterior['p95_ms'], dados['p95_ms'], variacao))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga das rotas de consulta")
+    parser.add_argument('--url', default=os.environ.get('BENCH_URL', 'http://localhost:5000'))
+    parser.add_argument('--clientes', type=int, required=True,
+                        help="Quantidade de clientes gerada por benchmarks.gerar_dados")
+    parser.add_argument('--concorrencia', type=int, default=16)
+    parser.add_argument('--duracao', type=float, default=30, help="Duração do teste em segundos")
+    parser.add_argument('--timeout', type=float, default=30, help="Timeout por requisição em segundos")
+    parser.add_argument('--mix', help="Pesos por rota, ex: buscar=40,turbochat=40,listar_clientes=0")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--salvar', help="Salvar o resultado como baseline neste arquivo JSON")
+    parser.add_argument('--comparar', help="Comparar com um baseline salvo anteriormente")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="Piora máxima aceita no p95 em relação ao baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    mix = dict(MIX_PADRAO)
+    if args.mix:
+        for item in args.mix.split(','):
+            rota, peso = item.split('=')
+            mix[rota.strip()] = int(peso)
+    mix = {rota: peso for rota, peso in mix.items() if peso > 0}
+
+    resultado, total_segundos = executar(args.url.rstrip('/'), args.clientes, args.concorrencia,
+                                         args.duracao, mix, args.seed, args.timeout)
+
+    print(f"{'rota':<16} {'req':>7} {'erros':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for rota, dados in resultado.items():
+        print(f"{rota:<16} {dados['requisicoes']:>7} {dados['erros']:>6} {dados['vazao_rps']:>8} "
+              f"{dados['p50_ms'] or '-':>9} {dados['p95_ms'] or '-':>9} {dados['p99_ms'] or '-':>9}")
+    total = sum(d['requisicoes'] for d in resultado.values())
+    print(f"Total: {total} requisições em {total_segundos:.1f}s ({total / total_segundos:.1f} req/s)")
+
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'url': args.url,
+        'clientes': args.clientes,
+        'concorrencia': args.concorrencia,
+        'duracao_s': round(total_segundos, 2),
+        'mix': mix,
+        'rotas': resultado,
+    }
+
+    if args.salvar:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salvar)), exist_ok=True)
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"Baseline salvo em {args.salvar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressoes = comparar(resultado, baseline, args.tolerancia)
+        for rota, antes, depois, variacao in regressoes:
+            print(f"REGRESSÃO em {rota}: p95 {antes} ms -> {depois} ms (+{variacao:.0%})", file=sys.stderr)
+        if regressoes:
+            sys.exit(1)
+        print("Nenhuma regressão de p95 em relação ao baseline.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Gerador de dados sintéticos para reproduzir a carga de produção localmente.
+
+Cria (se necessário) as tabelas ``clientes_turbo``, ``a_receber_turbo`` e
+``clientes_clickup`` num Postgres local e as popula com dados realistas:
+
+- quantidade de faturas por cliente com distribuição enviesada (poucos
+  clientes concentram muitas faturas, como em produção);
+- mistura de faturas pagas, vencidas, vencendo hoje e futuras;
+- registros duplicados no ClickUp para o mesmo CNPJ (o app usa
+  ``DISTINCT ON (cnpj) ... ORDER BY id DESC`` para pegar o mais recente);
+- alguns clientes sem cadastro no ClickUp.
+
+Os CNPJs e nomes são determinísticos (``cnpj_cliente(i)`` / ``nome_cliente(i)``),
+então o driver de carga consegue sortear clientes existentes sem consultar o banco.
+
+O banco vem só de ``--dsn`` ou ``BENCH_DATABASE_URL`` (nunca de ``DATABASE_URL``,
+que pode ser o de produção). As tabelas são esvaziadas antes de gerar: se já
+tiverem dados, é preciso confirmar com ``--apagar-dados``.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.gerar_dados --escala 100k --recriar
+    python -m benchmarks.gerar_dados --recebiveis 250000 --clientes 8000 --dsn postgresql://... --apagar-dados
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import psycopg2
+
+ESCALAS = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+# Média de faturas por cliente usada quando --clientes não é informado
+FATURAS_POR_CLIENTE = 25
+TAMANHO_LOTE_COPY = 50_000
+
+DDL = """
+CREATE TABLE IF NOT EXISTS clientes_turbo (
+    id SERIAL PRIMARY KEY,
+    nome TEXT NOT NULL,
+    cnpj VARCHAR(20),
+    telefone TEXT,
+    email TEXT
+);
+
+CREATE TABLE IF NOT EXISTS a_receber_turbo (
+    id BIGINT PRIMARY KEY,
+    status TEXT,
+    total NUMERIC(14, 2),
+    descricao TEXT,
+    data_vencimento DATE,
+    nao_pago NUMERIC(14, 2),
+    pago NUMERIC(14, 2),
+    data_criacao TIMESTAMP,
+    data_alteracao TIMESTAMP,
+    cliente_id TEXT,
+    cliente_nome TEXT,
+    link_pagamento TEXT,
+    status_clickup TEXT
+);
+
+CREATE TABLE IF NOT EXISTS clientes_clickup (
+    id SERIAL PRIMARY KEY,
+    cnpj VARCHAR(20),
+    responsavel TEXT,
+    segmento TEXT,
+    cluster TEXT,
+    status_conta TEXT,
+    atividade TEXT,
+    telefone TEXT
+);
+"""
+
+RESPONSAVEIS = ['Ana Souza', 'Bruno Lima', 'Carla Dias', 'Diego Alves', 'Elisa Rocha', 'Felipe Melo']
+SEGMENTOS = ['Varejo', 'Serviços', 'Indústria', 'Saúde', 'Educação', 'Tecnologia']
+CLUSTERS = ['A', 'B', 'C', 'D']
+STATUS_CONTA = ['ativo', 'ativo', 'ativo', 'em risco', 'cancelado']
+DESCRICOES = ['Mensalidade', 'Gestão de tráfego', 'Setup inicial', 'Consultoria', 'Produção de conteúdo']
+
+
+def _digito_cnpj(base, pesos):
+    soma = sum(int(d) * p for d, p in zip(base, pesos))
+    resto = soma % 11
+    return '0' if resto < 2 else str(11 - resto)
+
+
+def cnpj_cliente(i):
+    """CNPJ válido (somente dígitos) e determinístico para o cliente de índice ``i``"""
+    base = f"{i + 10_000_000:08d}0001"
+    d1 = _digito_cnpj(base, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    d2 = _digito_cnpj(base + d1, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    return base + d1 + d2
+
+
+def nome_cliente(i):
+    """Nome determinístico do cliente de índice ``i``"""
+    return f"Empresa Sintetica {i:07d} LTDA"
+
+
+def _atividade(rnd):
+    partes = [
+        f"Status: {rnd.choice(['Em andamento', 'Onboarding', 'Pausado', 'Renovação'])}",
+        f"Relação com o cliente: {rnd.randint(1, 10)}",
+    ]
+    partes += ["Reunião de alinhamento realizada, próximos passos definidos."] * rnd.randint(0, 6)
+    return ' | '.join(partes)
+
+
+def _copy(cursor, tabela, colunas, linhas):
+    """Enviar as linhas via COPY (muito mais rápido que INSERT em lote)"""
+    buffer = io.StringIO()
+    for linha in linhas:
+        buffer.write('\t'.join(r'\N' if v is None else str(v) for v in linha))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN", buffer)
+
+
+def gerar_clientes(cursor, n_clientes, rnd):
+    linhas = []
+    for i in range(n_clientes):
+        linhas.append((nome_cliente(i), cnpj_cliente(i), f"119{rnd.randint(10_000_000, 99_999_999)}",
+                       f"financeiro{i}@exemplo.com.br"))
+    _copy(cursor, 'clientes_turbo', ['nome', 'cnpj', 'telefone', 'email'], linhas)
+
+
+def gerar_clickup(cursor, n_clientes, duplicatas, sem_clickup, rnd):
+    """Cadastros do ClickUp; ``duplicatas`` é a média de registros por CNPJ"""
+    linhas = []
+    for i in range(n_clientes):
+        if rnd.random() < sem_clickup:
+            continue
+        # 1 registro + extras com distribuição geométrica (média = duplicatas)
+        copias = 1
+        p_extra = 1 - 1 / max(duplicatas, 1)
+        while rnd.random() < p_extra:
+            copias += 1
+        for _ in range(copias):
+            linhas.append((cnpj_cliente(i), rnd.choice(RESPONSAVEIS), rnd.choice(SEGMENTOS),
+                           rnd.choice(CLUSTERS), rnd.choice(STATUS_CONTA), _atividade(rnd),
+                           f"119{rnd.randint(10_000_000, 99_999_999)}"))
+    _copy(cursor, 'clientes_clickup',
+          ['cnpj', 'responsavel', 'segmento', 'cluster', 'status_conta', 'atividade', 'telefone'], linhas)
+    return len(linhas)
+
+
+def gerar_recebiveis(cursor, n_recebiveis, n_clientes, assimetria, rnd):
+    """Faturas com distribuição Zipf de faturas por cliente"""
+    pesos = [1 / (i + 1) ** assimetria for i in range(n_clientes)]
+    # Embaralhar para que os clientes "grandes" não sejam sempre os primeiros índices
+    rnd.shuffle(pesos)
+    clientes = rnd.choices(range(n_clientes), weights=pesos, k=n_recebiveis)
+    status_clickup = {i: ('ativo' if rnd.random() < 0.8 else 'inativo') for i in set(clientes)}
+
+    hoje = date.today()
+    colunas = ['id', 'status', 'total', 'descricao', 'data_vencimento', 'nao_pago', 'pago',
+               'data_criacao', 'data_alteracao', 'cliente_id', 'cliente_nome', 'link_pagamento',
+               'status_clickup']
+    lote = []
+    for n, i in enumerate(clientes, 1):
+        vencimento = hoje + timedelta(days=rnd.randint(-3 * 365, 90))
+        total = rnd.randint(5_000, 2_000_000) / 100
+        if vencimento > hoje:
+            pago_ = rnd.random() < 0.05
+        else:
+            pago_ = rnd.random() < 0.85
+        nao_pago = 0 if pago_ else total
+        criacao = datetime.combine(vencimento - timedelta(days=30), datetime.min.time())
+        alteracao = criacao + timedelta(days=rnd.randint(0, 60), seconds=rnd.randint(0, 86_399))
+        lote.append((
+            n, 'ACQUITTED' if pago_ else 'PENDING', f"{total:.2f}",
+            f"{rnd.choice(DESCRICOES)} {vencimento:%m/%Y}", vencimento,
+            f"{nao_pago:.2f}", f"{total - nao_pago:.2f}", criacao, alteracao,
+            f"ca-{i}", nome_cliente(i),
+            None if pago_ else f"https://pagamento.exemplo.com.br/{n}",
+            status_clickup[i],
+        ))
+        if len(lote) >= TAMANHO_LOTE_COPY:
+            _copy(cursor, 'a_receber_turbo', colunas, lote)
+            lote = []
+            print(f"  {n:,} faturas inseridas", file=sys.stderr)
+    if lote:
+        _copy(cursor, 'a_receber_turbo', colunas, lote)
+
+
+def tabelas_com_dados(cursor):
+    """Tabelas geradas aqui que já existem e não estão vazias"""
+    com_dados = []
+    for tabela in ('clientes_turbo', 'a_receber_turbo', 'clientes_clickup'):
+        cursor.execute("SELECT to_regclass(%s)", (tabela,))
+        if cursor.fetchone()[0] is None:
+            continue
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {tabela})")
+        if cursor.fetchone()[0]:
+            com_dados.append(tabela)
+    return com_dados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerar dados sintéticos para benchmarks")
+    parser.add_argument('--dsn', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help="DSN do Postgres local (padrão: BENCH_DATABASE_URL)")
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='10k')
+    parser.add_argument('--recebiveis', type=int, help="Quantidade de faturas (sobrepõe --escala)")
+    parser.add_argument('--clientes', type=int, help=f"Quantidade de clientes (padrão: faturas / {FATURAS_POR_CLIENTE})")
+    parser.add_argument('--assimetria', type=float, default=1.1,
+                        help="Expoente Zipf da distribuição de faturas por cliente")
+    parser.add_argument('--duplicatas-clickup', type=float, default=1.5,
+                        help="Média de registros do ClickUp por CNPJ")
+    parser.add_argument('--sem-clickup', type=float, default=0.1,
+                        help="Fração de clientes sem cadastro no ClickUp")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--recriar', action='store_true', help="Apagar e recriar as tabelas antes de gerar")
+    parser.add_argument('--apagar-dados', action='store_true',
+                        help="Confirmar que as tabelas podem ser esvaziadas mesmo já tendo dados")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error("informe --dsn ou defina BENCH_DATABASE_URL")
+
+    n_recebiveis = args.recebiveis or ESCALAS[args.escala]
+    n_clientes = args.clientes or max(n_recebiveis // FATURAS_POR_CLIENTE, 1)
+    rnd = random.Random(args.seed)
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        with conn, conn.cursor() as cursor:
+            com_dados = tabelas_com_dados(cursor)
+            if com_dados and not args.apagar_dados:
+                parser.error(f"as tabelas {', '.join(com_dados)} já têm dados; use --apagar-dados para "
+                             f"confirmar que podem ser apagadas (confira o --dsn)")
+            if args.recriar:
+                cursor.execute("DROP TABLE IF EXISTS a_receber_turbo, clientes_clickup, clientes_turbo")
+            cursor.execute(DDL)
+            cursor.execute("TRUNCATE a_receber_turbo, clientes_clickup, clientes_turbo RESTART IDENTITY")
+
+            inicio = time.perf_counter()
+            print(f"Gerando {n_clientes:,} clientes...", file=sys.stderr)
+            gerar_clientes(cursor, n_clientes, rnd)
+            print("Gerando cadastros do ClickUp...", file=sys.stderr)
+            n_clickup = gerar_clickup(cursor, n_clientes, args.duplicatas_clickup, args.sem_clickup, rnd)
+            print(f"Gerando {n_recebiveis:,} faturas...", file=sys.stderr)
+            gerar_recebiveis(cursor, n_recebiveis, n_clientes, args.assimetria, rnd)
+
+        # ANALYZE fora da transação para o planner enxergar as estatísticas novas
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("ANALYZE clientes_turbo, a_receber_turbo, clientes_clickup")
+    finally:
+        conn.close()
+
+    print(f"Pronto: {n_clientes:,} clientes, {n_clickup:,} registros ClickUp, {n_recebiveis:,} faturas "
+          f"em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
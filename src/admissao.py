@@ -0,0 +1,179 @@
+"""Controle de admissão das rotas caras (listagem completa, exportação direta).
+
+Algumas listagens completas ao mesmo tempo ocupavam todos os workers do
+gunicorn, e as buscas por CNPJ (baratas) esperavam atrás delas. Aqui as rotas
+caras declaram um custo e disputam uma capacidade compartilhada:
+
+- ``capacidade``: total de unidades de custo em execução ao mesmo tempo, somando
+  todos os workers da máquina. Sobram workers para as rotas baratas, que não
+  passam pelo controle e nunca entram na fila.
+- ``limite`` por rota: execuções simultâneas daquela rota, independente do custo.
+- Sem vaga, a requisição espera até ``espera_s`` numa fila de no máximo
+  ``fila_max`` lugares. Com a fila cheia a recusa é imediata (429); se a espera
+  acabar sem vaga, 503. As duas com ``Retry-After``.
+
+As vagas são arquivos em ``ADMISSAO_DIR`` travados com ``flock``: valem entre
+processos e são liberadas pelo sistema se o worker morrer. Em workers ``sync``
+uma requisição na fila prende o worker, por isso a espera padrão é curta.
+"""
+import fcntl
+import math
+import os
+import tempfile
+import threading
+import time
+
+ADMISSAO_DIR = os.getenv('ADMISSAO_DIR') or os.path.join(tempfile.gettempdir(), 'admissao')
+
+# Intervalo entre tentativas enquanto espera na fila
+INTERVALO_TENTATIVAS_S = 0.05
+
+
+class Recusada(Exception):
+    """Sem vaga para a rota: responder ``status`` com ``Retry-After: retry_after``"""
+
+    def __init__(self, rota, status, retry_after, motivo):
+        super().__init__(f"{rota}: {motivo}")
+        self.rota = rota
+        self.status = status
+        self.retry_after = retry_after
+        self.motivo = motivo
+
+
+class _Vagas:
+    """``quantidade`` vagas entre processos, uma por arquivo travado com flock"""
+
+    def __init__(self, diretorio, nome, quantidade):
+        self._caminhos = [os.path.join(diretorio, f"{nome}.{i}") for i in range(quantidade)]
+
+    def ocupar(self, quantidade=1):
+        """Descritores das vagas ocupadas, ou None se não houver ``quantidade`` livres"""
+        ocupadas = []
+        for caminho in self._caminhos:
+            fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            ocupadas.append(fd)
+            if len(ocupadas) == quantidade:
+                return ocupadas
+        liberar(ocupadas)
+        return None
+
+
+def liberar(descritores):
+    for fd in descritores:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class Permissao:
+    """Vagas de uma requisição admitida; ``liberar()`` (ou o ``with``) as devolve"""
+
+    def __init__(self, controle, rota, descritores):
+        self._controle = controle
+        self._rota = rota
+        self._descritores = descritores
+        self._inicio = time.monotonic()
+        self._lock = threading.Lock()
+
+    def liberar(self):
+        with self._lock:
+            descritores, self._descritores = self._descritores, None
+        if descritores is not None:
+            liberar(descritores)
+            self._controle._concluir(self._rota, time.monotonic() - self._inicio)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.liberar()
+
+
+class ControleAdmissao:
+    def __init__(self, rotas, capacidade=2, espera_s=0.5, fila_max=2, diretorio=ADMISSAO_DIR):
+        """``rotas`` mapeia nome -> {'custo': unidades, 'limite': execuções simultâneas}"""
+        os.makedirs(diretorio, exist_ok=True)
+        self.rotas = rotas
+        self.capacidade = capacidade
+        self.espera_s = espera_s
+        self._capacidade = _Vagas(diretorio, 'capacidade', capacidade)
+        self._fila = _Vagas(diretorio, 'fila', fila_max)
+        self._por_rota = {rota: _Vagas(diretorio, f'rota_{rota}', cfg['limite']) for rota, cfg in rotas.items()}
+        self._lock = threading.Lock()
+        self._estatisticas = {
+            rota: {'em_execucao': 0, 'na_fila': 0, 'admitidas': 0, 'enfileiradas': 0,
+                   'recusadas_429': 0, 'recusadas_503': 0, 'duracao_media_s': None}
+            for rota in rotas
+        }
+
+    def _tentar(self, rota):
+        custo = min(self.rotas[rota]['custo'], self.capacidade)
+        da_rota = self._por_rota[rota].ocupar()
+        if da_rota is None:
+            return None
+        capacidade = self._capacidade.ocupar(custo)
+        if capacidade is None:
+            liberar(da_rota)
+            return None
+        return da_rota + capacidade
+
+    def _retry_after(self, rota):
+        # Uma execução média da rota, no mínimo 1s
+        duracao = self._estatisticas[rota]['duracao_media_s'] or 1
+        return max(1, math.ceil(duracao))
+
+    def _recusar(self, rota, status, motivo):
+        with self._lock:
+            self._estatisticas[rota][f'recusadas_{status}'] += 1
+        return Recusada(rota, status, self._retry_after(rota), motivo)
+
+    def admitir(self, rota):
+        """``Permissao`` para executar a rota; levanta ``Recusada`` se não houver vaga"""
+        descritores = self._tentar(rota)
+        if descritores is None:
+            lugar = self._fila.ocupar() if self.espera_s > 0 else None
+            if lugar is None:
+                raise self._recusar(rota, 429, "fila cheia")
+            with self._lock:
+                self._estatisticas[rota]['na_fila'] += 1
+                self._estatisticas[rota]['enfileiradas'] += 1
+            try:
+                limite = time.monotonic() + self.espera_s
+                while descritores is None and time.monotonic() < limite:
+                    time.sleep(INTERVALO_TENTATIVAS_S)
+                    descritores = self._tentar(rota)
+            finally:
+                liberar(lugar)
+                with self._lock:
+                    self._estatisticas[rota]['na_fila'] -= 1
+            if descritores is None:
+                raise self._recusar(rota, 503, f"sem vaga após {self.espera_s:g}s na fila")
+
+        with self._lock:
+            self._estatisticas[rota]['em_execucao'] += 1
+            self._estatisticas[rota]['admitidas'] += 1
+        return Permissao(self, rota, descritores)
+
+    def _concluir(self, rota, duracao):
+        with self._lock:
+            estatisticas = self._estatisticas[rota]
+            estatisticas['em_execucao'] -= 1
+            anterior = estatisticas['duracao_media_s']
+            # Média móvel exponencial: acompanha mudanças de carga sem guardar histórico
+            estatisticas['duracao_media_s'] = round(duracao if anterior is None else 0.8 * anterior + 0.2 * duracao, 3)
+
+    def estatisticas(self):
+        with self._lock:
+            por_rota = {rota: dict(valores) for rota, valores in self._estatisticas.items()}
+        return {
+            'capacidade': self.capacidade,
+            'espera_s': self.espera_s,
+            'na_fila': sum(valores['na_fila'] for valores in por_rota.values()),
+            'rotas': {rota: dict(valores, **self.rotas[rota]) for rota, valores in por_rota.items()},
+        }
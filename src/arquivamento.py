@@ -0,0 +1,246 @@
+"""Arquivamento de faturas pagas antigas de ``a_receber_turbo``.
+
+As consultas quentes (histórico por CNPJ, pendências, LTV) varrem
+``a_receber_turbo`` inteira, que cresce para sempre com anos de faturas já
+quitadas. ``arquivar`` move as faturas pagas (``nao_pago = 0``) com vencimento
+anterior a ``ARQUIVO_MESES`` meses para ``a_receber_turbo_arquivo``, particionada
+por ano de ``data_vencimento``, e acumula a quantidade e os valores por cliente
+em ``a_receber_arquivo_totais``. Com ``ARQUIVO_RECEBIVEIS=1`` o LTV, o resumo do
+cliente e os KPIs somam esses totais (``src/consultas.py``), então os números
+não mudam; as listas de faturas mostram só o que está na tabela quente.
+
+``a_receber_turbo`` continua sem particionamento: a chave primária ``id`` é usada
+pelos upserts da sincronização e dos webhooks, e uma tabela particionada exigiria
+a data de vencimento na chave.
+
+Se a sincronização inserir de novo uma fatura arquivada, a trigger
+``desarquivar_a_receber_turbo`` a remove do arquivo e desconta os totais, então
+nenhuma fatura é contada duas vezes.
+
+Rodar fora do horário de pico (cada lote apagado dispara o feed de alterações):
+    ARQUIVO_RECEBIVEIS=1 python -m src.arquivamento [--meses 12] [--lote 5000]
+"""
+import os
+import sys
+import time
+
+ARQUIVO_MESES = int(os.getenv('ARQUIVO_MESES', 12))
+TAMANHO_LOTE = 5000
+
+TABELA = 'a_receber_turbo'
+TABELA_ARQUIVO = 'a_receber_turbo_arquivo'
+
+# Tabelas lidas pelas consultas com ARQUIVO_RECEBIVEIS=1; o app as cria vazias
+# na inicialização, então a variável pode ser ligada antes do primeiro arquivamento
+DDL_TABELAS = f"""
+CREATE TABLE IF NOT EXISTS a_receber_arquivo_totais (
+    cliente_nome TEXT PRIMARY KEY,
+    qtd_faturas INTEGER NOT NULL,
+    total NUMERIC(16, 2) NOT NULL,
+    pago NUMERIC(16, 2) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS {TABELA_ARQUIVO} (LIKE {TABELA}) PARTITION BY RANGE (data_vencimento);
+CREATE INDEX IF NOT EXISTS idx_a_receber_arquivo_id ON {TABELA_ARQUIVO} (id);
+CREATE INDEX IF NOT EXISTS idx_a_receber_arquivo_cliente ON {TABELA_ARQUIVO} (cliente_nome);
+"""
+
+DDL = DDL_TABELAS + f"""
+-- Caminho das consultas quentes: faturas em aberto
+CREATE INDEX IF NOT EXISTS idx_a_receber_abertas ON {TABELA} (data_vencimento, cliente_nome) WHERE nao_pago > 0;
+
+CREATE OR REPLACE FUNCTION desarquivar_recebiveis() RETURNS trigger AS $$
+BEGIN
+    WITH removidas AS (
+        DELETE FROM {TABELA_ARQUIVO} ar
+        USING novos n
+        WHERE ar.id = n.id
+        RETURNING ar.cliente_nome, ar.total, ar.pago
+    ), totais AS (
+        SELECT cliente_nome, COUNT(*) AS qtd, COALESCE(SUM(total), 0) AS total, COALESCE(SUM(pago), 0) AS pago
+        FROM removidas
+        GROUP BY cliente_nome
+    )
+    UPDATE a_receber_arquivo_totais t
+    SET qtd_faturas = t.qtd_faturas - totais.qtd,
+        total = t.total - totais.total,
+        pago = t.pago - totais.pago
+    FROM totais
+    WHERE t.cliente_nome = totais.cliente_nome;
+
+    IF FOUND THEN
+        DELETE FROM a_receber_arquivo_totais WHERE qtd_faturas <= 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS desarquivar_{TABELA} ON {TABELA};
+CREATE TRIGGER desarquivar_{TABELA} AFTER INSERT ON {TABELA}
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE PROCEDURE desarquivar_recebiveis();
+"""
+
+_SQL_ELEGIVEIS = f"""
+    FROM {TABELA}
+    WHERE nao_pago = 0 AND data_vencimento < %(limite)s AND cliente_nome IS NOT NULL
+"""
+
+# Trava o próximo lote; os anos dizem quais partições ele precisa
+SQL_TRAVAR_LOTE = f"""
+SELECT id, date_part('year', data_vencimento)::int {_SQL_ELEGIVEIS}
+LIMIT %(lote)s
+FOR UPDATE SKIP LOCKED
+"""
+
+# Move o lote travado e acumula os totais na mesma instrução; retorna quantas faturas moveu
+SQL_ARQUIVAR_LOTE = f"""
+WITH movidas AS (
+    DELETE FROM {TABELA} a
+    WHERE a.id = ANY(%(ids)s)
+    RETURNING a.*
+), arquivadas AS (
+    INSERT INTO {TABELA_ARQUIVO} ({{colunas}})
+    SELECT {{colunas}} FROM movidas
+    RETURNING cliente_nome, total, pago
+), totais AS (
+    INSERT INTO a_receber_arquivo_totais AS t (cliente_nome, qtd_faturas, total, pago)
+    SELECT cliente_nome, COUNT(*), COALESCE(SUM(total), 0), COALESCE(SUM(pago), 0)
+    FROM arquivadas
+    GROUP BY cliente_nome
+    ON CONFLICT (cliente_nome) DO UPDATE SET
+        qtd_faturas = t.qtd_faturas + EXCLUDED.qtd_faturas,
+        total = t.total + EXCLUDED.total,
+        pago = t.pago + EXCLUDED.pago
+    RETURNING 1
+)
+SELECT COUNT(*) FROM arquivadas
+"""
+
+
+def _colunas(cursor, tabela):
+    """(nome, tipo) das colunas da tabela, na ordem"""
+    cursor.execute("""
+    SELECT attname, format_type(atttypid, atttypmod)
+    FROM pg_attribute
+    WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+    ORDER BY attnum
+    """, (tabela,))
+    return cursor.fetchall()
+
+
+def criar_tabelas(conn):
+    """Criar (vazias) as tabelas lidas pelas consultas com ``ARQUIVO_RECEBIVEIS=1``"""
+    with conn.cursor() as cursor:
+        # Vários workers iniciando juntos: um CREATE por vez. Uma instrução só,
+        # para o lock valer também numa conexão em autocommit
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('arquivamento'));" + DDL_TABELAS)
+    if not conn.autocommit:
+        conn.commit()
+
+
+def instalar(conn):
+    """Criar arquivo, totais, índice de abertas e trigger; alinhar colunas novas"""
+    with conn.cursor() as cursor:
+        cursor.execute(DDL)
+        # Colunas adicionadas em a_receber_turbo depois da criação do arquivo
+        existentes = {nome for nome, _ in _colunas(cursor, TABELA_ARQUIVO)}
+        for nome, tipo in _colunas(cursor, TABELA):
+            if nome not in existentes:
+                cursor.execute(f'ALTER TABLE {TABELA_ARQUIVO} ADD COLUMN "{nome}" {tipo}')
+    conn.commit()
+
+
+def garantir_particoes(cursor, anos):
+    """Criar as partições anuais que ainda não existem para os ``anos``"""
+    for ano in sorted(anos):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABELA_ARQUIVO}_{ano} PARTITION OF {TABELA_ARQUIVO} "
+            f"FOR VALUES FROM ('{ano}-01-01') TO ('{ano + 1}-01-01')"
+        )
+
+
+def arquivar(conn, meses=ARQUIVO_MESES, lote=TAMANHO_LOTE):
+    """Mover as faturas pagas com vencimento há mais de ``meses`` meses.
+
+    Cada lote é uma transação: trava as faturas, cria as partições dos anos
+    delas e só então as move, então uma fatura que ficou elegível durante o
+    arquivamento (sync, webhook) nunca cai num ano sem partição. Retorna o
+    total de faturas arquivadas.
+    """
+    conn.autocommit = False
+    try:
+        instalar(conn)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT (date_trunc('month', CURRENT_DATE) - make_interval(months => %s))::date", (meses,)
+            )
+            limite = cursor.fetchone()[0]
+            colunas = ', '.join(f'"{nome}"' for nome, _ in _colunas(cursor, TABELA_ARQUIVO))
+            conn.commit()
+
+            sql_lote = SQL_ARQUIVAR_LOTE.format(colunas=colunas)
+            arquivadas = 0
+            anos = set()
+            while True:
+                cursor.execute(SQL_TRAVAR_LOTE, {'limite': limite, 'lote': lote})
+                travadas = cursor.fetchall()
+                if not travadas:
+                    conn.rollback()
+                    break
+                anos_lote = {ano for _, ano in travadas}
+                garantir_particoes(cursor, anos_lote - anos)
+                anos |= anos_lote
+                cursor.execute(sql_lote, {'ids': [id_fatura for id_fatura, _ in travadas]})
+                movidas = cursor.fetchone()[0]
+                conn.commit()
+                arquivadas += movidas
+                if movidas:
+                    print(f"  {arquivadas:,} faturas arquivadas", file=sys.stderr)
+                if len(travadas) < lote:
+                    break
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+    if arquivadas:
+        # Devolver o espaço das linhas removidas e atualizar as estatísticas do planner
+        with conn.cursor() as cursor:
+            cursor.execute(f"VACUUM (ANALYZE) {TABELA}")
+            cursor.execute(f"ANALYZE {TABELA_ARQUIVO}")
+    print(f"Arquivamento até {limite}: {arquivadas:,} faturas (anos: {sorted(anos) or 'nenhum'})",
+          file=sys.stderr)
+    return arquivadas
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import psycopg2
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Arquivar faturas pagas antigas")
+    parser.add_argument('--meses', type=int, default=ARQUIVO_MESES,
+                        help="Arquivar faturas pagas vencidas há mais de N meses")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.environ.get('DATABASE_URL', '')
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    conexao_pg = psycopg2.connect(database_url) if database_url else psycopg2.connect(
+        host=os.getenv("PG_HOST"),
+        dbname=os.getenv("PG_DBNAME"),
+        user=os.getenv("PG_USER"),
+        password=os.getenv("PG_PASSWORD"),
+        port=os.getenv("PG_PORT")
+    )
+    try:
+        inicio = time.monotonic()
+        arquivar(conexao_pg, meses=args.meses, lote=args.lote)
+        print(f"Concluído em {time.monotonic() - inicio:.1f}s")
+    finally:
+        conexao_pg.close()
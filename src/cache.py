@@ -0,0 +1,97 @@
+"""Caches em memória usados pelas rotas (um por worker do gunicorn)."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Cache LRU limitado e thread-safe, com expiração opcional dos itens.
+
+    ``maxsize`` limita a quantidade de entradas (a menos usada sai primeiro) e
+    ``ttl`` (segundos) define por quanto tempo uma entrada continua válida. Com
+    ``weight`` (função do valor, ex.: quantidade de linhas) o cache também fica
+    limitado a ``maxweight`` somando todas as entradas; um valor que sozinho
+    passa do limite não é guardado.
+    """
+
+    def __init__(self, maxsize=256, ttl=None, maxweight=None, weight=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxweight = maxweight if weight else None
+        self._peso = weight
+        self.hits = 0
+        self.misses = 0
+        self._dados = OrderedDict()  # chave -> (valor, expira_em, peso)
+        self._peso_total = 0
+        self._lock = threading.Lock()
+
+    def _remover(self, key):
+        self._peso_total -= self._dados.pop(key)[2]
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._dados.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            valor, expira_em, _ = item
+            if expira_em is not None and expira_em < time.monotonic():
+                self._remover(key)
+                self.misses += 1
+                return default
+            self._dados.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expira_em = time.monotonic() + ttl if ttl else None
+        peso = self._peso(value) if self.maxweight else 0
+        with self._lock:
+            if key in self._dados:
+                self._remover(key)
+            if self.maxweight and peso > self.maxweight:
+                return
+            self._dados[key] = (value, expira_em, peso)
+            self._peso_total += peso
+            while len(self._dados) > self.maxsize or (self.maxweight and self._peso_total > self.maxweight):
+                self._remover(next(iter(self._dados)))
+
+    def invalidate(self, predicate):
+        """Remover todas as entradas cuja chave satisfaz ``predicate``; retorna quantas saíram."""
+        with self._lock:
+            chaves = [k for k in self._dados if predicate(k)]
+            for k in chaves:
+                self._remover(k)
+        return len(chaves)
+
+    def invalidate_values(self, predicate):
+        """Remover todas as entradas cujo valor satisfaz ``predicate``; retorna quantas saíram."""
+        with self._lock:
+            chaves = [k for k, (valor, _, _) in self._dados.items() if predicate(valor)]
+            for k in chaves:
+                self._remover(k)
+        return len(chaves)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+            self._peso_total = 0
+
+    def stats(self):
+        with self._lock:
+            tamanho, peso = len(self._dados), self._peso_total
+        estatisticas = {'size': tamanho, 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+        if self.maxweight:
+            estatisticas.update(weight=peso, maxweight=self.maxweight)
+        return estatisticas
+
+    def __contains__(self, key):
+        return self.get(key, _AUSENTE) is not _AUSENTE
+
+    def __len__(self):
+        with self._lock:
+            return len(self._dados)
+
+
+_AUSENTE = object()
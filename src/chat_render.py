@@ -0,0 +1,251 @@
+"""Renderização das respostas do TurboChat com fragmentos Jinja pré-compilados.
+
+As respostas por CNPJ (texto Markdown + HTML das faturas) eram montadas com
+dezenas de concatenações de f-strings a cada requisição. Agora o texto vem dos
+templates ``chat/resposta_cnpj.txt`` e ``chat/faturas.html``, compilados uma
+única vez, e o resultado fica em cache por cliente + marca d'água dos dados +
+data atual (o status "vencido"/"vence hoje" depende do dia).
+
+A mesma resposta pode ser enviada em partes (rota ``/turbochat/stream``): o
+resumo (``chat/_resumo_cnpj.txt``) logo após a primeira consulta, depois o
+bloco de LTV/ClickUp (``chat/_detalhes_cnpj.txt``) e as faturas em páginas
+(``chat/faturas_pagina.html``).
+"""
+import os
+import zlib
+from array import array
+from datetime import date
+
+from src.cache import LRUCache
+
+# Quantidade máxima de faturas exibidas no HTML do chat
+MAX_FATURAS_HTML = 10
+# Quantidade de faturas pagas incluídas no histórico
+MAX_FATURAS_PAGAS = 3
+
+_env = None
+_cache_respostas = LRUCache(maxsize=int(os.getenv('CHAT_RENDER_CACHE_SIZE', 512)))
+
+
+def formatar_moeda(valor):
+    """Formatar valor como no restante do chat (ex: 1,234.56)"""
+    return f"{float(valor or 0):,.2f}"
+
+
+def init_app(app):
+    """Criar o ambiente Jinja do chat a partir do ambiente da aplicação Flask"""
+    global _env
+    _env = app.jinja_env.overlay(trim_blocks=True, lstrip_blocks=True, keep_trailing_newline=True)
+    _env.filters['moeda'] = formatar_moeda
+    # Compilar os fragmentos já na inicialização
+    for nome in ('chat/resposta_cnpj.txt', 'chat/faturas.html',
+                 'chat/_resumo_cnpj.txt', 'chat/_detalhes_cnpj.txt', 'chat/faturas_pagina.html',
+                 'chat/seguimento.txt', 'chat/faturas_seguimento.html'):
+        _env.get_template(nome)
+
+
+def resumir_atividade(atividade):
+    """Resumir a atividade do cliente para exibição no chat"""
+    if not atividade or len(atividade.strip()) == 0:
+        return None
+
+    # Limitar o tamanho e extrair informações principais
+    atividade = atividade.strip()
+
+    # Se a atividade for muito longa, pegar apenas os primeiros 200 caracteres
+    if len(atividade) > 200:
+        # Tentar cortar em uma frase completa
+        resumo = atividade[:200]
+        ultimo_ponto = resumo.rfind('.')
+        ultimo_pipe = resumo.rfind('|')
+
+        if ultimo_ponto > 100:  # Se há um ponto após 100 caracteres
+            resumo = resumo[:ultimo_ponto + 1]
+        elif ultimo_pipe > 100:  # Se há um pipe após 100 caracteres
+            resumo = resumo[:ultimo_pipe]
+
+        resumo += "..."
+    else:
+        resumo = atividade
+
+    # Extrair informações específicas se disponíveis
+    info_extras = []
+
+    # Procurar por status
+    if "Status:" in atividade:
+        status_match = atividade.split("Status:")[1].split("\n")[0].split("|")[0].strip()
+        if status_match:
+            info_extras.append(f"Status: {status_match}")
+
+    # Procurar por relação com cliente
+    if "Relação com o cliente:" in atividade:
+        relacao_match = atividade.split("Relação com o cliente:")[1].split("\n")[0].split("|")[0].strip()
+        if relacao_match and relacao_match != "-":
+            info_extras.append(f"Relação: {relacao_match}/10")
+
+    # Combinar resumo com informações extras
+    if info_extras:
+        return f"{resumo}\n📊 {' | '.join(info_extras)}"
+
+    return resumo
+
+
+def marca_dagua(rows):
+    """Identificador barato do estado dos dados exibidos para um cliente.
+
+    Muda sempre que alguma fatura é criada, removida, paga ou alterada (a
+    alteração mais recente avança ``data_alteracao``), ou quando os dados de
+    ClickUp/LTV da primeira linha mudam. CRC32, e não ``hash()``, que tem
+    semente aleatória por processo; as colunas numéricas entram como arrays
+    binários, bem mais baratos de montar que o repr de milhares de Decimals.
+    """
+    primeira = rows[0]
+    marca = zlib.crc32(array('q', [row['id'] for row in rows]))
+    marca = zlib.crc32(array('d', [row['nao_pago'] or 0 for row in rows]), marca)
+    marca = zlib.crc32(array('d', [row['pago'] or 0 for row in rows]), marca)
+    ultima_alteracao = max(filter(None, [row['data_alteracao'] for row in rows]), default=None)
+    return zlib.crc32(repr((
+        ultima_alteracao,
+        primeira['ltv_total'], primeira['total_faturas'], primeira['valor_inadimplente_total'],
+        primeira['responsavel'], primeira['segmento'], primeira['cluster'],
+        primeira['status_clickup'], primeira['atividade'],
+    )).encode('utf-8'), marca)
+
+
+def fatura_para_exibicao(row):
+    """Dados de uma fatura do histórico usados nos templates do chat"""
+    if row['status_cobranca'] == 'pago':
+        return {
+            'id': row['id'],
+            'data': row['data_vencimento'],
+            'valor': float(row['pago']) if row['pago'] else 0.0,
+            'status': 'pago',
+            'link_pagamento': None,
+            'descricao': row['descricao'] or 'Cobrança',
+            'tipo': 'pago'
+        }
+    return {
+        'id': row['id'],
+        'data': row['data_vencimento'],
+        'valor': float(row['nao_pago']) if row['nao_pago'] else 0.0,
+        'status': row['status_cobranca'],
+        'link_pagamento': row['link_pagamento'],
+        'descricao': row['descricao'] or 'Cobrança',
+        'tipo': 'pendente'
+    }
+
+
+def faturas_para_exibicao(rows):
+    """Todas as faturas do histórico (sem o limite de pagas), para o contexto da conversa"""
+    return [fatura_para_exibicao(row) for row in rows if row['status_cobranca'] != 'indefinido']
+
+
+def montar_contexto_cnpj(cnpj, rows):
+    """Categorizar as faturas e montar o contexto usado pelos templates"""
+    primeira = rows[0]
+
+    # Categorizar faturas por status
+    vencidas = [row for row in rows if row['status_cobranca'] == 'vencido']
+    vence_hoje = [row for row in rows if row['status_cobranca'] == 'vence_hoje']
+    futuras = [row for row in rows if row['status_cobranca'] == 'futuro']
+    pagas = [row for row in rows if row['status_cobranca'] == 'pago']
+
+    # Criar lista única de todas as faturas ordenada por data:
+    # pendentes (vencidas, vence hoje, futuras) e as últimas pagas
+    todas_faturas = [fatura_para_exibicao(row) for row in vencidas + vence_hoje + futuras + pagas[:MAX_FATURAS_PAGAS]]
+
+    # Ordenar por data (mais antigas primeiro, faturas vencidas no topo)
+    todas_faturas.sort(key=lambda x: (x['data'], x['status'] != 'vencido'))
+
+    return {
+        'cnpj': cnpj,
+        'cliente_nome': primeira['cliente_nome'],
+        'total_pendente': sum(float(row['nao_pago']) for row in rows if row['nao_pago'] > 0),
+        'total_pago': sum(float(row['pago']) for row in rows if row['pago'] > 0),
+        'total_faturas': len(rows),
+        'cliente': primeira,
+        'resumo_atividade': resumir_atividade(primeira['atividade']) if primeira['atividade'] else None,
+        'qtd_vencidas': len(vencidas),
+        'total_vencido': sum(float(row['nao_pago']) for row in vencidas),
+        'todas_faturas': todas_faturas,
+        'max_faturas': MAX_FATURAS_HTML,
+    }
+
+
+def formatar_resposta_cnpj(cnpj, rows):
+    """Renderizar (sem cache) o texto da resposta e o HTML das faturas"""
+    contexto = montar_contexto_cnpj(cnpj, rows)
+    response = _env.get_template('chat/resposta_cnpj.txt').render(contexto)
+    faturas_html = None
+    if contexto['todas_faturas']:
+        faturas_html = _env.get_template('chat/faturas.html').render(contexto)
+    return response, faturas_html
+
+
+def renderizar_resposta_cnpj(cnpj, rows):
+    """Retornar (response, faturas_html) usando o cache de renderização"""
+    chave = (cnpj, marca_dagua(rows), date.today())
+    resultado = _cache_respostas.get(chave)
+    if resultado is None:
+        resultado = formatar_resposta_cnpj(cnpj, rows)
+        _cache_respostas.set(chave, resultado)
+    return resultado
+
+
+def renderizar_resumo_cnpj(cnpj, cliente_info):
+    """Texto do resumo a partir da linha de ``consultas.cliente_cnpj``"""
+    return _env.get_template('chat/_resumo_cnpj.txt').render(
+        cnpj=cnpj,
+        cliente_nome=cliente_info['nome'],
+        total_pendente=cliente_info['total_pendente'],
+        total_pago=cliente_info['total_pago'],
+        total_faturas=cliente_info['total_faturas'] or 0,
+    )
+
+
+def formatar_partes_cnpj(cnpj, rows, por_pagina=MAX_FATURAS_HTML):
+    """Renderizar (sem cache) o bloco de LTV/ClickUp e as páginas de faturas.
+
+    Diferente de ``faturas.html``, as páginas cobrem todas as faturas listadas
+    e não só as ``MAX_FATURAS_HTML`` primeiras.
+    """
+    contexto = montar_contexto_cnpj(cnpj, rows)
+    detalhes = _env.get_template('chat/_detalhes_cnpj.txt').render(contexto)
+    template_pagina = _env.get_template('chat/faturas_pagina.html')
+    todas_faturas = contexto['todas_faturas']
+    paginas = [
+        template_pagina.render(faturas=todas_faturas[inicio:inicio + por_pagina], inicio=inicio + 1)
+        for inicio in range(0, len(todas_faturas), por_pagina)
+    ]
+    return detalhes, paginas
+
+
+def renderizar_partes_cnpj(cnpj, rows):
+    """Retornar (detalhes, paginas_html) usando o cache de renderização"""
+    chave = (cnpj, marca_dagua(rows), date.today(), 'partes')
+    resultado = _cache_respostas.get(chave)
+    if resultado is None:
+        resultado = formatar_partes_cnpj(cnpj, rows)
+        _cache_respostas.set(chave, resultado)
+    return resultado
+
+
+def renderizar_seguimento(resultado):
+    """Retornar (response, faturas_html) de uma pergunta de seguimento (``chat_sessao.aplicar``)"""
+    response = _env.get_template('chat/seguimento.txt').render(resultado)
+    faturas_html = None
+    if resultado['faturas']:
+        faturas_html = _env.get_template('chat/faturas_seguimento.html').render(resultado)
+    return response, faturas_html
+
+
+def invalidar_cliente(cnpj=None):
+    """Descartar respostas renderizadas de um cliente (ou de todos)"""
+    if cnpj is None:
+        _cache_respostas.clear()
+        return
+    _cache_respostas.invalidate(lambda chave: chave[0] == cnpj)
+
+
+def estatisticas_cache():
+    return _cache_respostas.stats()
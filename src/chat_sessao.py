@@ -0,0 +1,164 @@
+"""Contexto de conversa do TurboChat para perguntas de seguimento.
+
+Depois de uma consulta por CNPJ, o histórico completo do cliente fica guardado
+por conversa (``conversa_id`` enviado pela página) num cache limitado e com
+expiração. Mensagens como "mostrar pagas", "só vencidas", "ordenar por valor",
+"mais" ou "página 3" são respondidas a partir dele, sem consultar o banco.
+
+O contexto fica na memória do worker; se a mensagem cair em outro worker, a
+página também envia ``cnpj_contexto`` e o histórico é carregado uma vez. Com o
+feed de alterações ligado (``NOTIFICACOES_ALTERACOES``), ``invalidar_cliente``
+descarta os contextos dos clientes alterados pelos syncs.
+"""
+import os
+import re
+
+from src.cache import LRUCache
+
+FATURAS_POR_PAGINA = 10
+
+FILTROS = {
+    'todas': ('Todas as faturas', ('vencido', 'vence_hoje', 'futuro', 'pago')),
+    'pendente': ('Faturas em aberto', ('vencido', 'vence_hoje', 'futuro')),
+    'vencido': ('Faturas vencidas', ('vencido',)),
+    'vence_hoje': ('Faturas que vencem hoje', ('vence_hoje',)),
+    'futuro': ('Faturas a vencer', ('futuro',)),
+    'pago': ('Faturas pagas', ('pago',)),
+}
+
+ORDENS = {
+    'data': lambda fatura: (fatura['data'], fatura['status'] != 'vencido'),
+    'recentes': lambda fatura: fatura['data'],
+    'valor': lambda fatura: fatura['valor'],
+}
+
+# (padrão, campo, valor) na ordem em que são testados; o primeiro de cada campo vale
+_PADROES = [
+    (r'maior(es)? valor|por valor', 'ordem', 'valor'),
+    (r'mais recentes?|recentes', 'ordem', 'recentes'),
+    (r'mais antigas?|por data|antigas', 'ordem', 'data'),
+    (r'vence(m)? hoje', 'filtro', 'vence_hoje'),
+    (r'\bvencid|atrasad', 'filtro', 'vencido'),
+    (r'a vencer|futur', 'filtro', 'futuro'),
+    (r'em aberto|pendente', 'filtro', 'pendente'),
+    (r'\bpag[oa]s?\b|quitad', 'filtro', 'pago'),
+    (r'\btodas\b', 'filtro', 'todas'),
+]
+
+# Limitado também pelo total de faturas guardadas: um contexto de cliente grande
+# pode ter milhares de linhas
+_sessoes = LRUCache(
+    maxsize=int(os.getenv('CHAT_SESSOES_MAX', 1000)),
+    ttl=float(os.getenv('CHAT_SESSAO_TTL_S', 1800)),
+    maxweight=int(os.getenv('CHAT_SESSOES_MAX_FATURAS', 100000)),
+    weight=lambda contexto: len(contexto['rows']),
+)
+
+
+# Palavras de comando do chat: a mensagem é uma busca, listagem ou pedido de
+# ajuda, mesmo que o nome procurado contenha "pagos", "futura", "mais"...
+_COMANDOS = re.compile(r'\b(clientes?|empresas?|buscar|procurar|listar|lista|ajuda|help|como|usar)\b')
+
+
+def interpretar(message):
+    """Pedido de seguimento contido na mensagem (já em minúsculas), ou None"""
+    if _COMANDOS.search(message):
+        return None
+
+    pedido = {}
+    restante = message
+    for padrao, campo, valor in _PADROES:
+        if campo not in pedido and re.search(padrao, restante):
+            pedido[campo] = valor
+            restante = re.sub(padrao, ' ', restante)
+
+    pagina = re.search(r'p[áa]gina\s+(\d+)', restante)
+    if pagina:
+        pedido['pagina'] = int(pagina.group(1))
+    elif re.search(r'\b(mais|pr[óo]xima|continuar|seguinte)\b', restante):
+        pedido['pagina'] = 'proxima'
+
+    return pedido or None
+
+
+def lembrar(conversa_id, cnpj, rows):
+    """Guardar o histórico do cliente consultado; retorna o contexto criado"""
+    contexto = {
+        'cnpj': cnpj,
+        'cliente_nome': rows[0]['cliente_nome'],
+        'rows': rows,
+        'filtro': 'pendente',
+        'ordem': 'data',
+        'pagina': 1,
+    }
+    if conversa_id:
+        _sessoes.set(conversa_id, contexto)
+    return contexto
+
+
+def obter(conversa_id, cnpj=None):
+    """Contexto da conversa (do mesmo CNPJ, se informado), ou None"""
+    if not conversa_id:
+        return None
+    contexto = _sessoes.get(conversa_id)
+    if contexto is None or (cnpj and contexto['cnpj'] != cnpj):
+        return None
+    return contexto
+
+
+def aplicar(conversa_id, contexto, pedido, faturas):
+    """Gravar o contexto com o filtro/ordem/página pedidos e retornar a página.
+
+    ``faturas`` é a lista completa (``chat_render.faturas_para_exibicao``). O
+    contexto recebido não é alterado: ele pode ser o objeto do cache, lido ao
+    mesmo tempo por outra requisição da conversa.
+    """
+    contexto = dict(contexto)
+    if 'filtro' in pedido or 'ordem' in pedido:
+        contexto['filtro'] = pedido.get('filtro', contexto['filtro'])
+        contexto['ordem'] = pedido.get('ordem', contexto['ordem'])
+        contexto['pagina'] = 1
+    if pedido.get('pagina') == 'proxima':
+        contexto['pagina'] += 1
+    elif pedido.get('pagina'):
+        contexto['pagina'] = pedido['pagina']
+
+    titulo, status = FILTROS[contexto['filtro']]
+    selecionadas = sorted(
+        (fatura for fatura in faturas if fatura['status'] in status),
+        key=ORDENS[contexto['ordem']],
+        reverse=contexto['ordem'] in ('recentes', 'valor'),
+    )
+    paginas = max(1, -(-len(selecionadas) // FATURAS_POR_PAGINA))
+    contexto['pagina'] = min(max(contexto['pagina'], 1), paginas)
+    inicio = (contexto['pagina'] - 1) * FATURAS_POR_PAGINA
+    # Gravar de novo renova a expiração da conversa
+    if conversa_id:
+        _sessoes.set(conversa_id, contexto)
+
+    return {
+        'titulo': titulo,
+        'cnpj': contexto['cnpj'],
+        'cliente_nome': contexto['cliente_nome'],
+        'faturas': selecionadas[inicio:inicio + FATURAS_POR_PAGINA],
+        'inicio': inicio + 1,
+        'total': len(selecionadas),
+        'soma': sum(fatura['valor'] for fatura in selecionadas),
+        'pagina': contexto['pagina'],
+        'paginas': paginas,
+    }
+
+
+def invalidar_cliente(cnpj=None, nome=None):
+    """Descartar os contextos de um cliente (pelo CNPJ ou nome), ou de todos"""
+    if cnpj is None and nome is None:
+        _sessoes.clear()
+        return
+    _sessoes.invalidate_values(
+        lambda contexto: (cnpj is not None and contexto['cnpj'] == cnpj)
+        or (nome is not None and contexto['cliente_nome'] == nome)
+    )
+
+
+def estatisticas():
+    return _sessoes.stats()
@@ -0,0 +1,305 @@
+"""Consultas de leitura usadas pelas rotas de busca e pelo TurboChat.
+
+Cada função recebe um cursor ``RealDictCursor`` do Postgres e devolve as linhas
+no formato esperado pelas rotas. ``src/snapshot.py`` expõe funções com os
+mesmos nomes e o mesmo formato de retorno, lendo da snapshot local.
+
+Com ``ARQUIVO_RECEBIVEIS=1``, faturas pagas antigas ficam fora de
+``a_receber_turbo`` (``src/arquivamento.py``) e os totais de LTV e do resumo do
+cliente somam também ``a_receber_arquivo_totais``.
+"""
+import os
+import re
+import weakref
+
+ARQUIVO_RECEBIVEIS = os.getenv('ARQUIVO_RECEBIVEIS') == '1'
+
+
+class BancoIndisponivel(Exception):
+    """Não foi possível obter uma conexão com o banco de dados"""
+
+
+class ConsultaExpirada(BancoIndisponivel):
+    """A consulta foi cancelada pelo ``statement_timeout`` da rota"""
+
+
+# Cadastro do ClickUp mais recente por CNPJ (há registros duplicados na tabela)
+SQL_CLICKUP_RECENTE = """
+    SELECT DISTINCT ON (cnpj) cnpj, responsavel, segmento, cluster, status_conta, atividade, telefone
+    FROM clientes_clickup
+    ORDER BY cnpj, id DESC
+"""
+
+# Totais de LTV por cliente (só as faturas em a_receber_turbo)
+SQL_LTV_QUENTE = """
+    SELECT cliente_nome,
+           SUM(pago) as total_pago,
+           COUNT(*) as total_faturas,
+           SUM(CASE WHEN nao_pago > 0 AND data_vencimento < CURRENT_DATE THEN nao_pago ELSE 0 END) as valor_inadimplente_total
+    FROM a_receber_turbo
+    GROUP BY cliente_nome
+"""
+
+# Faturas arquivadas são todas pagas: entram no total pago e na contagem
+SQL_LTV_COM_ARQUIVO = f"""
+    SELECT cliente_nome,
+           SUM(total_pago) as total_pago,
+           SUM(total_faturas)::bigint as total_faturas,
+           SUM(valor_inadimplente_total) as valor_inadimplente_total
+    FROM ({SQL_LTV_QUENTE}
+          UNION ALL
+          SELECT cliente_nome, pago, qtd_faturas, 0 FROM a_receber_arquivo_totais) ltv_partes
+    GROUP BY cliente_nome
+"""
+
+SQL_LTV = SQL_LTV_COM_ARQUIVO if ARQUIVO_RECEBIVEIS else SQL_LTV_QUENTE
+
+if ARQUIVO_RECEBIVEIS:
+    SQL_CLIENTE_CNPJ = """
+    SELECT c.nome, c.cnpj,
+           COUNT(a.id) + COALESCE(arq.qtd_faturas, 0) as total_faturas,
+           CASE WHEN arq.cliente_nome IS NULL THEN SUM(a.total) ELSE COALESCE(SUM(a.total), 0) + arq.total END as total_geral,
+           CASE WHEN arq.cliente_nome IS NULL THEN SUM(a.pago) ELSE COALESCE(SUM(a.pago), 0) + arq.pago END as total_pago,
+           SUM(a.nao_pago) as total_pendente,
+           COUNT(CASE WHEN a.nao_pago > 0 AND a.data_vencimento <= CURRENT_DATE THEN 1 END) as faturas_vencidas
+    FROM clientes_turbo c
+    LEFT JOIN a_receber_turbo a ON c.nome = a.cliente_nome
+    LEFT JOIN a_receber_arquivo_totais arq ON c.nome = arq.cliente_nome
+    WHERE c.cnpj = %s
+    GROUP BY c.nome, c.cnpj, arq.cliente_nome, arq.qtd_faturas, arq.total, arq.pago
+    """
+else:
+    SQL_CLIENTE_CNPJ = """
+    SELECT c.nome, c.cnpj,
+           COUNT(a.id) as total_faturas,
+           SUM(a.total) as total_geral,
+           SUM(a.pago) as total_pago,
+           SUM(a.nao_pago) as total_pendente,
+           COUNT(CASE WHEN a.nao_pago > 0 AND a.data_vencimento <= CURRENT_DATE THEN 1 END) as faturas_vencidas
+    FROM clientes_turbo c
+    LEFT JOIN a_receber_turbo a ON c.nome = a.cliente_nome
+    WHERE c.cnpj = %s
+    GROUP BY c.nome, c.cnpj
+    """
+
+# TODO o histórico de contas a receber pelo CNPJ do cliente
+# Incluindo: pagas, pendentes, vencidas e futuras
+SQL_HISTORICO_CNPJ = f"""
+SELECT a.id, a.status, a.total, a.descricao, a.data_vencimento,
+       a.nao_pago, a.pago, a.data_criacao, a.data_alteracao,
+       a.cliente_id, a.cliente_nome, a.link_pagamento,
+       a.status_clickup,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone as telefone_clickup,
+       ltv.total_pago as ltv_total,
+       ltv.total_faturas,
+       ltv.valor_inadimplente_total,
+       CASE
+           WHEN a.nao_pago = 0 THEN 'pago'
+           WHEN a.nao_pago > 0 AND a.data_vencimento < CURRENT_DATE THEN 'vencido'
+           WHEN a.nao_pago > 0 AND a.data_vencimento = CURRENT_DATE THEN 'vence_hoje'
+           WHEN a.nao_pago > 0 AND a.data_vencimento > CURRENT_DATE THEN 'futuro'
+           ELSE 'indefinido'
+       END as status_cobranca,
+       CASE
+           WHEN a.nao_pago > 0 AND a.data_vencimento < CURRENT_DATE THEN 1  -- Vencidos primeiro
+           WHEN a.nao_pago > 0 AND a.data_vencimento = CURRENT_DATE THEN 2   -- Vence hoje
+           WHEN a.nao_pago > 0 AND a.data_vencimento > CURRENT_DATE THEN 3   -- Futuros
+           WHEN a.nao_pago = 0 THEN 4                                        -- Pagos por último
+           ELSE 5
+       END as ordem_prioridade
+FROM a_receber_turbo a
+JOIN clientes_turbo c ON a.cliente_nome = c.nome
+LEFT JOIN ({SQL_CLICKUP_RECENTE}) ck ON c.cnpj = ck.cnpj
+LEFT JOIN ({SQL_LTV}) ltv ON a.cliente_nome = ltv.cliente_nome
+WHERE c.cnpj = %s
+ORDER BY ordem_prioridade, a.data_vencimento DESC
+"""
+
+# Informações do ClickUp e LTV para clientes sem faturas
+SQL_CLICKUP_CNPJ = f"""
+SELECT DISTINCT ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone as telefone_clickup,
+       ltv.total_pago as ltv_total,
+       ltv.total_faturas,
+       ltv.valor_inadimplente_total
+FROM clientes_turbo c
+LEFT JOIN ({SQL_CLICKUP_RECENTE}) ck ON c.cnpj = ck.cnpj
+LEFT JOIN ({SQL_LTV}) ltv ON c.nome = ltv.cliente_nome
+WHERE c.cnpj = %s
+"""
+
+# Contas a receber vencidas com saldo pendente (nao_pago > 0) pelo nome do cliente
+SQL_VENCIDAS_NOME = f"""
+SELECT DISTINCT a.id, a.status, a.total, a.descricao, a.data_vencimento,
+       a.nao_pago, a.pago, a.data_criacao, a.data_alteracao,
+       a.cliente_id, a.cliente_nome, a.link_pagamento,
+       a.status_clickup,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone as telefone_clickup,
+       ltv.total_pago as ltv_total,
+       ltv.total_faturas,
+       ltv.valor_inadimplente_total
+FROM a_receber_turbo a
+LEFT JOIN clientes_turbo c ON a.cliente_nome = c.nome
+LEFT JOIN ({SQL_CLICKUP_RECENTE}) ck ON c.cnpj = ck.cnpj
+LEFT JOIN ({SQL_LTV}) ltv ON a.cliente_nome = ltv.cliente_nome
+WHERE a.cliente_nome ILIKE %s
+  AND a.nao_pago > 0
+  AND a.data_vencimento <= CURRENT_DATE
+ORDER BY a.data_vencimento DESC
+"""
+
+# Clientes com maior valor pendente vencido
+SQL_TOP_PENDENCIAS = f"""
+SELECT DISTINCT c.nome, c.cnpj,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone as telefone_clickup,
+       ltv.total_pago as ltv_total,
+       ltv.total_faturas,
+       ltv.valor_inadimplente_total,
+       CASE
+           WHEN COUNT(a.id) FILTER (WHERE a.nao_pago > 0 AND a.data_vencimento <= CURRENT_DATE) > 0 THEN true
+           ELSE false
+       END as tem_pendencias,
+       SUM(a.nao_pago) FILTER (WHERE a.nao_pago > 0 AND a.data_vencimento <= CURRENT_DATE) as total_pendente
+FROM clientes_turbo c
+LEFT JOIN ({SQL_CLICKUP_RECENTE}) ck ON c.cnpj = ck.cnpj
+LEFT JOIN a_receber_turbo a ON c.nome = a.cliente_nome
+LEFT JOIN ({SQL_LTV}) ltv ON c.nome = ltv.cliente_nome
+GROUP BY c.nome, c.cnpj, ck.responsavel, ck.segmento, ck.cluster, ck.status_conta, ck.atividade, ck.telefone, ltv.total_pago, ltv.total_faturas, ltv.valor_inadimplente_total
+HAVING COUNT(a.id) FILTER (WHERE a.nao_pago > 0 AND a.data_vencimento <= CURRENT_DATE) > 0
+ORDER BY total_pendente DESC
+LIMIT %s
+"""
+
+# Todos os clientes com os dados do ClickUp (listagem completa); igual ao
+# SQL_LISTAR_CLIENTES de src/snapshot.py, que também usa só o registro mais recente por CNPJ
+SQL_LISTAR_CLIENTES = f"""
+SELECT DISTINCT c.nome, c.cnpj,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone as telefone_clickup,
+       a.status_clickup,
+       CASE
+           WHEN COUNT(a.id) FILTER (WHERE a.nao_pago > 0 AND a.data_vencimento <= CURRENT_DATE) > 0 THEN true
+           ELSE false
+       END as tem_pendencias
+FROM clientes_turbo c
+LEFT JOIN ({SQL_CLICKUP_RECENTE}) ck ON c.cnpj = ck.cnpj
+LEFT JOIN a_receber_turbo a ON c.nome = a.cliente_nome
+GROUP BY c.nome, c.cnpj, ck.responsavel, ck.segmento, ck.cluster, ck.status_conta, ck.atividade, ck.telefone, a.status_clickup
+ORDER BY c.nome
+"""
+
+# Detalhe de várias faturas numa consulta só (a tabela muda para o arquivo)
+SQL_DETALHES_FATURAS = """
+SELECT a.id, a.status, a.total, a.descricao, a.data_vencimento,
+       a.nao_pago, a.pago, a.data_criacao, a.data_alteracao,
+       a.cliente_id, a.cliente_nome, a.link_pagamento,
+       c.cnpj, c.telefone, c.email
+FROM {tabela} a
+LEFT JOIN clientes_turbo c ON a.cliente_nome = c.nome
+WHERE a.id = ANY(%s::bigint[])
+"""
+
+
+# Consultas quentes preparadas (PREPARE) em cada conexão do pool de src/pool.py:
+# o Postgres não precisa analisar e planejar de novo a cada requisição
+PREPARADAS = {
+    'cliente_cnpj': SQL_CLIENTE_CNPJ,
+    'historico_cnpj': SQL_HISTORICO_CNPJ,
+    'clickup_cnpj': SQL_CLICKUP_CNPJ,
+    'vencidas_por_nome': SQL_VENCIDAS_NOME,
+    'top_pendencias': SQL_TOP_PENDENCIAS,
+    'detalhes_faturas': SQL_DETALHES_FATURAS.format(tabela='a_receber_turbo'),
+}
+
+_conexoes_preparadas = weakref.WeakSet()
+
+
+def preparar(conn):
+    """Preparar as consultas quentes na sessão de ``conn`` (psycopg2)"""
+    with conn.cursor() as cursor:
+        for nome, sql in PREPARADAS.items():
+            numero = iter(range(1, sql.count('%s') + 1))
+            cursor.execute(f"PREPARE {nome} AS {re.sub('%s', lambda _: f'${next(numero)}', sql)}")
+    _conexoes_preparadas.add(conn)
+
+
+def _executar(cursor, nome, args):
+    """Executar a consulta ``nome`` de PREPARADAS, preparada se a conexão já tiver"""
+    if cursor.connection in _conexoes_preparadas:
+        cursor.execute(f"EXECUTE {nome} ({', '.join(['%s'] * len(args))})", args)
+    else:
+        cursor.execute(PREPARADAS[nome], args)
+
+
+def cliente_cnpj(cursor, cnpj):
+    """Resumo do cliente (nome e totais das faturas), ou None se o CNPJ não existe"""
+    _executar(cursor, 'cliente_cnpj', (cnpj,))
+    cliente_info = cursor.fetchone()
+    if not cliente_info or not cliente_info['nome']:
+        return None
+    return cliente_info
+
+
+def historico_cnpj(cursor, cnpj):
+    """Histórico completo de faturas do CNPJ com dados do ClickUp e LTV"""
+    _executar(cursor, 'historico_cnpj', (cnpj,))
+    return cursor.fetchall()
+
+
+def clickup_cnpj(cursor, cnpj):
+    """Dados do ClickUp e LTV do CNPJ (usado quando o cliente não tem faturas)"""
+    _executar(cursor, 'clickup_cnpj', (cnpj,))
+    return cursor.fetchone()
+
+
+def dados_cnpj(cursor, cnpj):
+    """Carregar resumo, histórico de faturas e dados do ClickUp/LTV de um CNPJ.
+
+    Retorna um dict com ``cliente_info`` (None se o CNPJ não existe), ``rows``
+    (histórico completo) e ``clickup_data`` (consultado só quando não há faturas).
+    """
+    cliente_info = cliente_cnpj(cursor, cnpj)
+    if cliente_info is None:
+        return {'cliente_info': None, 'rows': [], 'clickup_data': None}
+
+    rows = historico_cnpj(cursor, cnpj)
+    clickup_data = clickup_cnpj(cursor, cnpj) if not rows else None
+
+    return {'cliente_info': cliente_info, 'rows': rows, 'clickup_data': clickup_data}
+
+
+def vencidas_por_nome(cursor, nome):
+    """Faturas vencidas em aberto de clientes cujo nome contém ``nome``"""
+    _executar(cursor, 'vencidas_por_nome', (f'%{nome}%',))
+    return cursor.fetchall()
+
+
+def top_pendencias(cursor, limite=10):
+    """Clientes com pendências vencidas, do maior para o menor valor pendente"""
+    _executar(cursor, 'top_pendencias', (limite,))
+    return cursor.fetchall()
+
+
+def listar_clientes(cursor):
+    """Todos os clientes com dados do ClickUp e indicação de pendências vencidas"""
+    cursor.execute(SQL_LISTAR_CLIENTES)
+    return cursor.fetchall()
+
+
+def detalhes_faturas(cursor, ids):
+    """Faturas dos ``ids`` (mesma ordem; as inexistentes ficam de fora).
+
+    Com ``ARQUIVO_RECEBIVEIS=1``, as que não estão em ``a_receber_turbo`` são
+    procuradas em ``a_receber_turbo_arquivo``.
+    """
+    ids = list(ids)
+    _executar(cursor, 'detalhes_faturas', (ids,))
+    faturas = {row['id']: row for row in cursor.fetchall()}
+    faltantes = [i for i in ids if i not in faturas]
+    if faltantes and ARQUIVO_RECEBIVEIS:
+        cursor.execute(SQL_DETALHES_FATURAS.format(tabela='a_receber_turbo_arquivo'), (faltantes,))
+        faturas.update((row['id'], row) for row in cursor.fetchall())
+    return [faturas[i] for i in ids if i in faturas]
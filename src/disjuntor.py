@@ -0,0 +1,86 @@
+"""Disjuntor (circuit breaker) para as consultas ao banco de dados.
+
+Com o Postgres sobrecarregado, cada requisição esperava a conexão ou a consulta
+até o fim, prendendo todos os workers do gunicorn. O disjuntor conta falhas de
+conexão e consultas canceladas por ``statement_timeout``:
+
+- ``fechado``: tudo passa; após ``falhas_max`` falhas seguidas ele abre.
+- ``aberto``: as chamadas falham na hora (``DisjuntorAberto``) durante
+  ``espera_s`` segundos, sem tocar no banco.
+- ``meio_aberto``: passada a espera, uma chamada a cada ``intervalo_sondas_s``
+  segundos testa o banco; um sucesso fecha o disjuntor e uma falha o abre de novo.
+
+As sondas são liberadas por tempo (e não por vaga reservada) para que uma
+chamada que não informa o resultado não deixe o disjuntor preso.
+"""
+import sys
+import threading
+import time
+
+from src.consultas import BancoIndisponivel
+
+FECHADO = 'fechado'
+ABERTO = 'aberto'
+MEIO_ABERTO = 'meio_aberto'
+
+
+class DisjuntorAberto(BancoIndisponivel):
+    """O disjuntor está aberto: a chamada foi recusada sem consultar o banco"""
+
+
+class Disjuntor:
+    def __init__(self, nome, falhas_max=5, espera_s=30.0, intervalo_sondas_s=1.0):
+        self.nome = nome
+        self.falhas_max = falhas_max
+        self.espera_s = espera_s
+        self.intervalo_sondas_s = intervalo_sondas_s
+        self._lock = threading.Lock()
+        self._estado = FECHADO
+        self._falhas_seguidas = 0
+        self._aberto_em = 0.0
+        self._ultima_sonda = 0.0
+        self.aberturas = 0
+        self.rejeicoes = 0
+
+    def permitir(self):
+        """False se a chamada deve falhar sem consultar o banco"""
+        with self._lock:
+            if self._estado == FECHADO:
+                return True
+            agora = time.monotonic()
+            if agora - self._aberto_em >= self.espera_s and agora - self._ultima_sonda >= self.intervalo_sondas_s:
+                self._estado = MEIO_ABERTO
+                self._ultima_sonda = agora
+                return True
+            self.rejeicoes += 1
+            return False
+
+    def verificar(self):
+        """Como ``permitir``, mas levanta ``DisjuntorAberto`` em vez de retornar False"""
+        if not self.permitir():
+            raise DisjuntorAberto(f"disjuntor {self.nome} aberto")
+
+    def registrar_sucesso(self):
+        with self._lock:
+            if self._estado != FECHADO:
+                print(f"INFO: disjuntor {self.nome} fechado", file=sys.stderr)
+            self._estado = FECHADO
+            self._falhas_seguidas = 0
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas_seguidas += 1
+            if self._estado == MEIO_ABERTO or (self._estado == FECHADO and self._falhas_seguidas >= self.falhas_max):
+                print(f"AVISO: disjuntor {self.nome} aberto após {self._falhas_seguidas} falha(s) seguida(s)", file=sys.stderr)
+                self._estado = ABERTO
+                self._aberto_em = time.monotonic()
+                self.aberturas += 1
+
+    def estado(self):
+        with self._lock:
+            return {
+                'estado': self._estado,
+                'falhas_seguidas': self._falhas_seguidas,
+                'aberturas': self.aberturas,
+                'rejeicoes': self.rejeicoes,
+            }
@@ -0,0 +1,404 @@
+"""Exportação de clientes inadimplentes e faturas vencidas em CSV e XLSX.
+
+As linhas vêm de um cursor nomeado (server-side) em lotes de ``TAMANHO_LOTE``
+e são escritas conforme chegam: a memória usada não depende do tamanho da
+exportação. O XLSX é montado sem dependências extras (zip + XML da planilha
+escrito incrementalmente, com strings inline).
+
+Exportações pequenas são enviadas direto na resposta. As grandes rodam como
+job em segundo plano (thread no worker), gravando o arquivo e o progresso em
+``EXPORTACAO_DIR``; como o estado fica em disco, qualquer worker responde ao
+acompanhamento e ao download.
+"""
+import csv
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from src.consultas import SQL_CLICKUP_RECENTE, SQL_LTV
+
+EXPORTACAO_DIR = os.getenv('EXPORTACAO_DIR') or os.path.join(tempfile.gettempdir(), 'exportacoes')
+# Tempo que arquivos de jobs concluídos ficam disponíveis para download
+EXPORTACAO_RETENCAO_S = int(os.getenv('EXPORTACAO_RETENCAO_S', 3600))
+TAMANHO_LOTE = 2000
+# statement_timeout das consultas de exportação (ordenam a carteira inteira)
+TIMEOUT_EXPORTACAO_MS = int(os.getenv('EXPORTACAO_TIMEOUT_MS', 300000))
+# O job regrava o estado a cada BATIMENTO_S, mesmo enquanto espera a primeira
+# linha da consulta; sem regravação há mais de PARADO_S o worker morreu
+BATIMENTO_S = 15
+PARADO_S = 120
+
+_SQL_CLIENTE = """
+    LEFT JOIN (SELECT DISTINCT ON (nome) nome, cnpj FROM clientes_turbo ORDER BY nome, id) c ON c.nome = a.cliente_nome
+"""
+
+_SQL_VENCIDA = "a.nao_pago > 0 AND a.data_vencimento < CURRENT_DATE"
+
+SQL_FATURAS = f"""
+SELECT a.cliente_nome, c.cnpj, a.id, a.descricao, a.data_vencimento,
+       CURRENT_DATE - a.data_vencimento AS dias_atraso,
+       a.total, a.nao_pago, a.link_pagamento,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta, ck.telefone,
+       ltv.total_pago, ltv.total_faturas, ltv.valor_inadimplente_total
+FROM a_receber_turbo a
+{_SQL_CLIENTE}
+LEFT JOIN ({SQL_CLICKUP_RECENTE}) ck ON ck.cnpj = c.cnpj
+LEFT JOIN ({SQL_LTV}) ltv ON ltv.cliente_nome = a.cliente_nome
+WHERE {_SQL_VENCIDA}
+ORDER BY a.cliente_nome, a.data_vencimento
+"""
+
+SQL_CLIENTES = f"""
+SELECT a.cliente_nome, c.cnpj,
+       COUNT(*) AS faturas_vencidas,
+       SUM(a.nao_pago) AS valor_vencido,
+       MIN(a.data_vencimento) AS vencimento_mais_antigo,
+       CURRENT_DATE - MIN(a.data_vencimento) AS dias_atraso,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta, ck.telefone,
+       ltv.total_pago, ltv.total_faturas
+FROM a_receber_turbo a
+{_SQL_CLIENTE}
+LEFT JOIN ({SQL_CLICKUP_RECENTE}) ck ON ck.cnpj = c.cnpj
+LEFT JOIN ({SQL_LTV}) ltv ON ltv.cliente_nome = a.cliente_nome
+WHERE {_SQL_VENCIDA}
+GROUP BY a.cliente_nome, c.cnpj, ck.responsavel, ck.segmento, ck.cluster, ck.status_conta, ck.telefone,
+         ltv.total_pago, ltv.total_faturas
+ORDER BY valor_vencido DESC
+"""
+
+EXPORTACOES = {
+    'faturas': {
+        'sql': SQL_FATURAS,
+        'sql_contagem': f"SELECT COUNT(*) FROM a_receber_turbo a WHERE {_SQL_VENCIDA}",
+        'titulos': ['Cliente', 'CNPJ', 'Fatura', 'Descrição', 'Vencimento', 'Dias em atraso',
+                    'Valor total', 'Valor em aberto', 'Link de pagamento',
+                    'Responsável', 'Segmento', 'Cluster', 'Status da conta', 'Telefone',
+                    'LTV total pago', 'Faturas (LTV)', 'Inadimplente total'],
+        'nome_arquivo': 'faturas_vencidas',
+    },
+    'clientes': {
+        'sql': SQL_CLIENTES,
+        'sql_contagem': f"SELECT COUNT(DISTINCT a.cliente_nome) FROM a_receber_turbo a WHERE {_SQL_VENCIDA}",
+        'titulos': ['Cliente', 'CNPJ', 'Faturas vencidas', 'Valor vencido', 'Vencimento mais antigo',
+                    'Dias em atraso', 'Responsável', 'Segmento', 'Cluster', 'Status da conta', 'Telefone',
+                    'LTV total pago', 'Faturas (LTV)'],
+        'nome_arquivo': 'clientes_inadimplentes',
+    },
+}
+
+
+def contar(conn, tipo):
+    with conn.cursor() as cursor:
+        cursor.execute(EXPORTACOES[tipo]['sql_contagem'])
+        return cursor.fetchone()[0]
+
+
+def linhas(conn, tipo):
+    """Gerar as linhas (tuplas) da exportação via cursor server-side.
+
+    Usa uma transação própria na conexão (cursor nomeado não funciona em
+    autocommit) e a desfaz ao final.
+    """
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", (TIMEOUT_EXPORTACAO_MS,))
+        with conn.cursor(name=f"exportacao_{tipo}_{uuid.uuid4().hex[:8]}") as cursor:
+            cursor.itersize = TAMANHO_LOTE
+            cursor.execute(EXPORTACOES[tipo]['sql'])
+            for linha in cursor:
+                yield linha
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (date, datetime)):
+        return valor.strftime('%d/%m/%Y')
+    if isinstance(valor, (Decimal, float)):
+        # Formato brasileiro, como o Excel em pt-BR espera
+        return f"{valor:.2f}".replace('.', ',')
+    return str(valor)
+
+
+def csv_em_partes(tipo, linhas_iter, tamanho_parte=64 * 1024):
+    """CSV (separador ";", UTF-8 com BOM para o Excel) em blocos de bytes"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';', lineterminator='\r\n')
+    buffer.write('\ufeff')
+    escritor.writerow(EXPORTACOES[tipo]['titulos'])
+    for linha in linhas_iter:
+        escritor.writerow([_texto(valor) for valor in linha])
+        if buffer.tell() >= tamanho_parte:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+# Caracteres de controle não são permitidos no XML da planilha
+_CONTROLE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_FIXOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+_ESTILO_TITULO, _ESTILO_VALOR, _ESTILO_DATA = 1, 2, 3
+_EPOCA_EXCEL = date(1899, 12, 30)
+
+
+def _celula_xlsx(valor, estilo=0):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        valor = 'Sim' if valor else 'Não'
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    if isinstance(valor, date):
+        return f'<c s="{_ESTILO_DATA}"><v>{(valor - _EPOCA_EXCEL).days}</v></c>'
+    if isinstance(valor, (Decimal, float)):
+        return f'<c s="{_ESTILO_VALOR}"><v>{valor}</v></c>'
+    if isinstance(valor, int):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(_CONTROLE.sub('', str(valor)))
+    estilo = f' s="{estilo}"' if estilo else ''
+    return f'<c t="inlineStr"{estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+class _SaidaEmPartes(io.RawIOBase):
+    """Destino não pesquisável para o zipfile; os bytes são retirados aos poucos"""
+
+    def __init__(self):
+        self._partes = []
+        self.tamanho = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self.tamanho += len(dados)
+        return len(dados)
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        self.tamanho = 0
+        return dados
+
+
+def _escrever_xlsx(destino, tipo, linhas_iter):
+    """Escrever o XLSX em ``destino`` (arquivo ou stream não pesquisável).
+
+    Gerador: devolve o controle após cada linha, para quem chama repassar os
+    blocos já comprimidos ou registrar o progresso.
+    """
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as pacote:
+        for nome, conteudo in _XLSX_FIXOS.items():
+            pacote.writestr(nome, conteudo)
+        pacote.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{EXPORTACOES[tipo]["nome_arquivo"][:31]}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        with pacote.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>'
+            ).encode('utf-8'))
+            titulos = ''.join(_celula_xlsx(titulo, _ESTILO_TITULO) for titulo in EXPORTACOES[tipo]['titulos'])
+            planilha.write(f'<row>{titulos}</row>'.encode('utf-8'))
+            for linha in linhas_iter:
+                planilha.write(f"<row>{''.join(_celula_xlsx(valor) for valor in linha)}</row>".encode('utf-8'))
+                yield
+            planilha.write(b'</sheetData></worksheet>')
+
+
+def xlsx_em_partes(tipo, linhas_iter, tamanho_parte=64 * 1024):
+    """XLSX em blocos de bytes, comprimido conforme as linhas chegam"""
+    saida = _SaidaEmPartes()
+    for _ in _escrever_xlsx(saida, tipo, linhas_iter):
+        if saida.tamanho >= tamanho_parte:
+            yield saida.retirar()
+    yield saida.retirar()
+
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', csv_em_partes),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', xlsx_em_partes),
+}
+
+
+def nome_arquivo(tipo, formato):
+    return f"{EXPORTACOES[tipo]['nome_arquivo']}_{date.today().isoformat()}.{formato}"
+
+
+# Jobs em segundo plano ------------------------------------------------------
+
+def _caminho_job(id_job, extensao):
+    return os.path.join(EXPORTACAO_DIR, f"{id_job}.{extensao}")
+
+
+def _gravar_estado(id_job, **estado):
+    estado['atualizado_em'] = time.time()
+    temporario = _caminho_job(id_job, 'json.tmp')
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(estado, arquivo)
+    os.replace(temporario, _caminho_job(id_job, 'json'))
+
+
+def estado_job(id_job):
+    """Estado do job (dict) ou None se não existe; jobs sem batimento há mais de ``PARADO_S`` falharam"""
+    if not re.fullmatch(r'[0-9a-f]{32}', id_job or ''):
+        return None
+    try:
+        with open(_caminho_job(id_job, 'json'), encoding='utf-8') as arquivo:
+            estado = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    if estado['status'] == 'executando' and time.time() - estado['atualizado_em'] > PARADO_S:
+        estado['status'] = 'erro'
+        estado['erro'] = 'o worker que executava a exportação foi encerrado'
+    return estado
+
+
+def arquivo_job(id_job):
+    estado = estado_job(id_job)
+    if not estado or estado['status'] != 'concluido':
+        return None, None
+    return _caminho_job(id_job, estado['formato']), estado
+
+
+def _limpar_antigos():
+    limite = time.time() - EXPORTACAO_RETENCAO_S
+    for nome in os.listdir(EXPORTACAO_DIR):
+        caminho = os.path.join(EXPORTACAO_DIR, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def iniciar_job(conectar, tipo, formato):
+    """Iniciar a exportação numa thread; retorna o id do job.
+
+    ``conectar`` deve devolver uma conexão (réplica serve) ou None.
+    """
+    os.makedirs(EXPORTACAO_DIR, exist_ok=True)
+    _limpar_antigos()
+    id_job = uuid.uuid4().hex
+    base = {'id': id_job, 'tipo': tipo, 'formato': formato, 'arquivo': nome_arquivo(tipo, formato)}
+    estado = dict(base, status='executando', linhas=0, total=None)
+    _gravar_estado(id_job, **estado)
+    # O batimento e o progresso gravam o mesmo arquivo
+    trava_estado = threading.Lock()
+    terminou = threading.Event()
+
+    def gravar(**alteracoes):
+        with trava_estado:
+            estado.update(alteracoes)
+            _gravar_estado(id_job, **estado)
+
+    def batimento():
+        while not terminou.wait(BATIMENTO_S):
+            gravar()
+
+    def executar():
+        conn = None
+        escritas = [0]
+        ultimo_registro = [time.monotonic()]
+        try:
+            conn = conectar()
+            if conn is None:
+                raise ConnectionError("sem conexão com o banco")
+            total = contar(conn, tipo)
+            gravar(total=total)
+
+            def progresso():
+                escritas[0] += 1
+                # Gravar o progresso no máximo a cada segundo
+                if time.monotonic() - ultimo_registro[0] >= 1.0:
+                    ultimo_registro[0] = time.monotonic()
+                    gravar(linhas=escritas[0])
+
+            parcial = _caminho_job(id_job, f'{formato}.parcial')
+            with open(parcial, 'wb') as destino:
+                if formato == 'xlsx':
+                    for _ in _escrever_xlsx(destino, tipo, linhas(conn, tipo)):
+                        progresso()
+                else:
+                    for parte in csv_em_partes(tipo, _contando(linhas(conn, tipo), progresso)):
+                        destino.write(parte)
+            os.replace(parcial, _caminho_job(id_job, formato))
+            gravar(status='concluido', linhas=escritas[0])
+        except Exception as e:
+            print(f"AVISO: exportação {id_job} falhou: {e}", file=sys.stderr)
+            gravar(status='erro', erro=str(e), linhas=escritas[0], total=None)
+        finally:
+            terminou.set()
+            if conn is not None:
+                conn.close()
+
+    threading.Thread(target=batimento, name=f'exportacao-{id_job[:8]}-batimento', daemon=True).start()
+    threading.Thread(target=executar, name=f'exportacao-{id_job[:8]}', daemon=True).start()
+    return id_job
+
+
+def _contando(linhas_iter, ao_escrever):
+    for linha in linhas_iter:
+        yield linha
+        ao_escrever()
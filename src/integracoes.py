@@ -0,0 +1,472 @@
+"""Cliente HTTP compartilhado para as APIs do ClickUp e do Conta Azul.
+
+Cada provedor tem um ``ClienteAPI`` por processo (``clickup()`` e
+``conta_azul()``) com:
+
+- uma ``requests.Session`` com pool de conexões keep-alive (sem TCP/TLS novo a
+  cada chamada);
+- um balde de tokens com a taxa do provedor: as chamadas esperam a vez em vez
+  de estourar o limite e tomar 429. O limite do provedor vale por token, não
+  por processo, então o balde fica num arquivo em ``INTEGRACOES_DIR``
+  compartilhado (com ``flock``) por todos os workers da máquina;
+- novas tentativas com backoff exponencial e jitter em 429 (respeitando
+  ``Retry-After``), 5xx e falhas de conexão. 5xx e timeout de leitura só são
+  repetidos em métodos idempotentes: num POST a requisição pode já ter sido
+  processada, então só se repete o que nem chegou ao servidor (conexão
+  recusada ou timeout ao conectar);
+- token de acesso do Conta Azul (OAuth) em cache, renovado antes de expirar.
+  Como o refresh token muda a cada renovação, o token fica num arquivo
+  compartilhado entre os workers e a renovação é feita por um processo por vez;
+- ``em_paralelo`` para disparar várias chamadas ao mesmo tempo (o balde continua
+  valendo);
+- latência, tentativas e esperas por endpoint, expostas em ``/metricas``.
+
+As URLs vêm do ambiente (``CLICKUP_API_URL``, ``CONTA_AZUL_API_URL``,
+``CONTA_AZUL_TOKEN_URL``), então os clientes podem apontar para um servidor
+HTTP local nos testes. Os limites padrão seguem a documentação dos provedores
+(ClickUp: 100 req/min por token nos planos básicos); ajuste pelo ambiente
+conforme o plano contratado.
+"""
+import email.utils
+import fcntl
+import json
+import math
+import os
+import random
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from src import metricas
+
+METODOS_IDEMPOTENTES = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# Latências guardadas por endpoint para a média e o p95
+AMOSTRAS_LATENCIA = 200
+
+INTEGRACOES_DIR = os.getenv('INTEGRACOES_DIR') or os.path.join(tempfile.gettempdir(), 'integracoes')
+
+
+class ErroAPI(Exception):
+    """Resposta de erro (ou falha de conexão) depois de esgotadas as tentativas"""
+
+    def __init__(self, provedor, endpoint, status, corpo):
+        super().__init__(f"{provedor} {endpoint}: HTTP {status or 'sem resposta'} {corpo[:200]}")
+        self.provedor = provedor
+        self.endpoint = endpoint
+        self.status = status
+        self.corpo = corpo
+
+
+class BaldeTokens:
+    """``taxa_por_s`` chamadas por segundo com rajadas de até ``capacidade``.
+
+    Com ``arquivo``, o estado do balde (tokens e instante da última atualização,
+    pelo relógio monotônico do sistema) fica nesse arquivo e é alterado sob
+    ``flock``: todos os processos que usam o mesmo arquivo dividem a taxa.
+    """
+
+    _FORMATO = struct.Struct('dd')
+
+    def __init__(self, taxa_por_s, capacidade, arquivo=None):
+        self.taxa_por_s = taxa_por_s
+        self.capacidade = capacidade
+        self.arquivo = arquivo
+        self._tokens = float(capacidade)
+        self._atualizado_em = time.monotonic()
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+
+    def _descritor(self):
+        # Um descritor por processo: depois de um fork, o herdado dividiria o
+        # flock com o processo pai
+        if self._fd is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.arquivo), exist_ok=True)
+            self._fd = os.open(self.arquivo, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+    def _alterar(self, funcao):
+        """Aplicar ``funcao(tokens) -> (tokens, resultado)`` ao balde reabastecido"""
+        with self._lock:
+            agora = time.monotonic()
+            if not self.arquivo:
+                tokens = min(self.capacidade, self._tokens + (agora - self._atualizado_em) * self.taxa_por_s)
+                self._tokens, resultado = funcao(tokens)
+                self._atualizado_em = agora
+                return resultado
+            fd = self._descritor()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                dados = os.pread(fd, self._FORMATO.size, 0)
+                if len(dados) == self._FORMATO.size:
+                    tokens, atualizado_em = self._FORMATO.unpack(dados)
+                else:
+                    tokens, atualizado_em = float(self.capacidade), agora
+                tokens = min(self.capacidade, tokens + max(0.0, agora - atualizado_em) * self.taxa_por_s)
+                tokens, resultado = funcao(tokens)
+                os.pwrite(fd, self._FORMATO.pack(tokens, agora), 0)
+                return resultado
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _tentar_retirar(self, tokens):
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self.taxa_por_s
+
+    def retirar(self):
+        """Esperar um token; retorna quantos segundos esperou"""
+        esperado = 0.0
+        while True:
+            falta_s = self._alterar(self._tentar_retirar)
+            if not falta_s:
+                return esperado
+            time.sleep(falta_s)
+            esperado += falta_s
+
+    def esvaziar(self):
+        """O provedor respondeu 429: parar de gastar a rajada acumulada"""
+        self._alterar(lambda tokens: (min(tokens, 0.0), None))
+
+
+class CacheTokenOAuth:
+    """Token de acesso renovado ``margem_s`` segundos antes de expirar.
+
+    ``renovar(refresh_token)`` chama o provedor e devolve o JSON do token
+    (``access_token``, ``expires_in`` e, se mudar, ``refresh_token``). Com
+    ``arquivo``, o token é compartilhado entre processos e a renovação é
+    serializada com ``flock``.
+    """
+
+    def __init__(self, renovar, refresh_token, margem_s=60.0, arquivo=None):
+        self._renovar = renovar
+        self._lock = threading.Lock()
+        self._arquivo = arquivo
+        self.margem_s = margem_s
+        self.renovacoes = 0
+        self._token = {'access_token': None, 'expira_em': 0, 'refresh_token': refresh_token}
+        # Último token recusado pelo provedor: não pode ser reaproveitado do arquivo
+        self._recusado = None
+
+    def _valido(self, token):
+        return token['access_token'] and token['expira_em'] - self.margem_s > time.time()
+
+    def _ler_arquivo(self):
+        try:
+            with open(self._arquivo, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return None
+
+    def obter(self):
+        with self._lock:
+            if self._valido(self._token):
+                return self._token['access_token']
+            if not self._arquivo:
+                return self._atualizar()
+            os.makedirs(os.path.dirname(self._arquivo), exist_ok=True)
+            fd = os.open(f"{self._arquivo}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                # Outro worker pode ter renovado enquanto este esperava a trava
+                salvo = self._ler_arquivo()
+                if salvo and self._valido(salvo) and salvo['access_token'] != self._recusado:
+                    self._token = salvo
+                    return salvo['access_token']
+                if salvo and salvo.get('refresh_token'):
+                    self._token['refresh_token'] = salvo['refresh_token']
+                token = self._atualizar()
+                temporario = f"{self._arquivo}.{os.getpid()}"
+                with open(temporario, 'w', encoding='utf-8') as arquivo:
+                    json.dump(self._token, arquivo)
+                os.chmod(temporario, 0o600)
+                os.replace(temporario, self._arquivo)
+                return token
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def _atualizar(self):
+        dados = self._renovar(self._token['refresh_token'])
+        self._token = {
+            'access_token': dados['access_token'],
+            'expira_em': time.time() + float(dados.get('expires_in', 3600)),
+            'refresh_token': dados.get('refresh_token') or self._token['refresh_token'],
+        }
+        self.renovacoes += 1
+        return self._token['access_token']
+
+    def invalidar(self, access_token=None):
+        """O provedor recusou ``access_token`` (401): renovar na próxima chamada.
+
+        Se outra thread já trocou o token em memória, não há o que fazer. O
+        token recusado também deixa de valer quando lido do arquivo, mesmo que
+        a expiração gravada diga o contrário.
+        """
+        with self._lock:
+            if access_token is not None and access_token != self._token['access_token']:
+                return
+            self._recusado = self._token['access_token']
+            self._token['expira_em'] = 0
+
+
+class _MetricasEndpoint:
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.novas_tentativas = 0
+        self.limitadas_429 = 0
+        self.espera_balde_s = 0.0
+        self.latencias = deque(maxlen=AMOSTRAS_LATENCIA)
+
+    def resumo(self):
+        latencias = sorted(self.latencias)
+        return {
+            'chamadas': self.chamadas,
+            'erros': self.erros,
+            'novas_tentativas': self.novas_tentativas,
+            'limitadas_429': self.limitadas_429,
+            'espera_balde_s': round(self.espera_balde_s, 3),
+            'latencia_media_ms': round(sum(latencias) / len(latencias) * 1000, 1) if latencias else None,
+            'latencia_p95_ms': round(latencias[math.ceil(len(latencias) * 0.95) - 1] * 1000, 1) if latencias else None,
+        }
+
+
+def _retry_after_s(valor):
+    """Segundos do cabeçalho Retry-After (número ou data HTTP), ou None"""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _nao_enviada(erro):
+    """A falha aconteceu antes de a requisição chegar ao servidor"""
+    if isinstance(erro, requests.ConnectTimeout):
+        return True
+    motivo = getattr(erro.args[0], 'reason', None) if erro.args else None
+    return isinstance(motivo, NewConnectionError)
+
+
+class ClienteAPI:
+    """Cliente de um provedor; ``autenticar()`` devolve os cabeçalhos de autenticação"""
+
+    def __init__(self, nome, url_base, taxa_por_s, rajada, autenticar=None, token_oauth=None,
+                 tentativas=4, backoff_base_s=0.5, backoff_max_s=30.0, timeout_s=10.0, conexoes=10,
+                 arquivo_balde=None):
+        self.nome = nome
+        self.url_base = url_base.rstrip('/')
+        self.balde = BaldeTokens(taxa_por_s, rajada, arquivo_balde)
+        self._autenticar = autenticar
+        self.token_oauth = token_oauth
+        self.tentativas = tentativas
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.timeout_s = timeout_s
+        self.conexoes = conexoes
+        self.sessao = requests.Session()
+        # As novas tentativas são feitas aqui (com o balde), não pelo urllib3
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexoes, max_retries=0)
+        self.sessao.mount('https://', adaptador)
+        self.sessao.mount('http://', adaptador)
+        self._lock = threading.Lock()
+        self._metricas = {}
+
+    def _autenticacao(self):
+        """(cabeçalhos, token OAuth usado ou None)"""
+        if self.token_oauth:
+            token = self.token_oauth.obter()
+            return {'Authorization': f"Bearer {token}"}, token
+        return (self._autenticar() if self._autenticar else {}), None
+
+    def _backoff_s(self, tentativa):
+        # Full jitter: espalha as novas tentativas dos vários workers
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** tentativa))
+
+    def _registrar(self, endpoint, **valores):
+        with self._lock:
+            item = self._metricas.setdefault(endpoint, _MetricasEndpoint())
+            for nome, valor in valores.items():
+                if nome == 'latencia_s':
+                    item.latencias.append(valor)
+                else:
+                    setattr(item, nome, getattr(item, nome) + valor)
+
+    def requisitar(self, metodo, caminho, endpoint=None, idempotente=None, **kwargs):
+        """Fazer a chamada com balde, autenticação e novas tentativas.
+
+        ``endpoint`` é o nome usado nas métricas (padrão: método e caminho com os
+        ids trocados por ``{id}``). Levanta ``ErroAPI`` se a resposta final não
+        for 2xx/3xx.
+        """
+        metodo = metodo.upper()
+        endpoint = endpoint or f"{metodo} {re.sub(r'/[0-9a-fA-F-]*[0-9][0-9a-fA-F-]*(?=/|$)', '/{id}', caminho)}"
+        if idempotente is None:
+            idempotente = metodo in METODOS_IDEMPOTENTES
+        kwargs.setdefault('timeout', self.timeout_s)
+        url = f"{self.url_base}/{caminho.lstrip('/')}"
+        cabecalhos = kwargs.pop('headers', None) or {}
+        reautenticado = False
+
+        tentativa = 0
+        while True:
+            self._registrar(endpoint, espera_balde_s=self.balde.retirar())
+            inicio = time.monotonic()
+            autenticacao, token = self._autenticacao()
+            try:
+                resposta = self.sessao.request(metodo, url, headers={**autenticacao, **cabecalhos}, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._registrar(endpoint, chamadas=1, latencia_s=time.monotonic() - inicio)
+                if tentativa + 1 >= self.tentativas or not (idempotente or _nao_enviada(e)):
+                    self._registrar(endpoint, erros=1)
+                    raise ErroAPI(self.nome, endpoint, None, str(e)) from e
+                espera_s = self._backoff_s(tentativa)
+            else:
+                self._registrar(endpoint, chamadas=1, latencia_s=time.monotonic() - inicio)
+                status = resposta.status_code
+                if status == 401 and self.token_oauth and not reautenticado:
+                    self.token_oauth.invalidar(token)
+                    reautenticado = True
+                    continue
+                repetir = status == 429 or (status >= 500 and idempotente)
+                if not repetir or tentativa + 1 >= self.tentativas:
+                    if status >= 400:
+                        self._registrar(endpoint, erros=1, limitadas_429=int(status == 429))
+                        raise ErroAPI(self.nome, endpoint, status, resposta.text)
+                    return resposta
+                espera_s = self._backoff_s(tentativa)
+                if status == 429:
+                    self._registrar(endpoint, limitadas_429=1)
+                    self.balde.esvaziar()
+                    espera_s = max(espera_s, min(_retry_after_s(resposta.headers.get('Retry-After')) or 0,
+                                                 self.backoff_max_s))
+                resposta.close()
+            self._registrar(endpoint, novas_tentativas=1)
+            time.sleep(espera_s)
+            tentativa += 1
+
+    def json(self, metodo, caminho, **kwargs):
+        """``requisitar`` devolvendo o corpo JSON (None se vazio)"""
+        resposta = self.requisitar(metodo, caminho, **kwargs)
+        return resposta.json() if resposta.content else None
+
+    def em_paralelo(self, chamadas, trabalhadores=None):
+        """Executar várias chamadas ``json`` ao mesmo tempo.
+
+        ``chamadas`` é uma lista de (método, caminho, kwargs). Retorna os
+        resultados na mesma ordem; uma chamada que falhou vira a ``ErroAPI``
+        correspondente na lista, sem cancelar as outras.
+        """
+        def executar(chamada):
+            metodo, caminho, kwargs = chamada
+            try:
+                return self.json(metodo, caminho, **kwargs)
+            except ErroAPI as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=trabalhadores or self.conexoes) as executor:
+            return list(executor.map(executar, chamadas))
+
+    def estatisticas(self):
+        with self._lock:
+            endpoints = {endpoint: item.resumo() for endpoint, item in self._metricas.items()}
+        dados = {
+            'taxa_por_s': self.balde.taxa_por_s,
+            'rajada': self.balde.capacidade,
+            'balde_compartilhado': bool(self.balde.arquivo),
+            'endpoints': endpoints,
+        }
+        if self.token_oauth:
+            dados['renovacoes_token'] = self.token_oauth.renovacoes
+        return dados
+
+
+def _renovar_token_conta_azul(refresh_token):
+    resposta = requests.post(
+        os.getenv('CONTA_AZUL_TOKEN_URL', 'https://auth.contaazul.com/oauth2/token'),
+        data={'grant_type': 'refresh_token', 'refresh_token': refresh_token},
+        auth=(os.getenv('CONTA_AZUL_CLIENT_ID', ''), os.getenv('CONTA_AZUL_CLIENT_SECRET', '')),
+        timeout=10,
+    )
+    if resposta.status_code != 200:
+        raise ErroAPI('conta_azul', 'POST /oauth2/token', resposta.status_code, resposta.text)
+    return resposta.json()
+
+
+def _criar_clickup():
+    token = os.getenv('CLICKUP_API_TOKEN', '')
+    por_minuto = float(os.getenv('CLICKUP_LIMITE_POR_MIN', 100))
+    return ClienteAPI(
+        'clickup',
+        os.getenv('CLICKUP_API_URL', 'https://api.clickup.com/api/v2'),
+        taxa_por_s=por_minuto / 60,
+        rajada=int(os.getenv('CLICKUP_RAJADA', 10)),
+        autenticar=lambda: {'Authorization': token},
+        arquivo_balde=os.path.join(INTEGRACOES_DIR, 'balde_clickup'),
+    )
+
+
+def _criar_conta_azul():
+    token_oauth = None
+    autenticar = None
+    if os.getenv('CONTA_AZUL_REFRESH_TOKEN'):
+        token_oauth = CacheTokenOAuth(
+            _renovar_token_conta_azul,
+            os.getenv('CONTA_AZUL_REFRESH_TOKEN'),
+            margem_s=float(os.getenv('CONTA_AZUL_TOKEN_MARGEM_S', 120)),
+            arquivo=os.getenv('CONTA_AZUL_TOKEN_ARQUIVO') or os.path.join(tempfile.gettempdir(), 'conta_azul', 'token.json'),
+        )
+    else:
+        # Token fixo (sem renovação), como no deploy original
+        token = os.getenv('CONTA_AZUL_ACCESS_TOKEN', '')
+        autenticar = lambda: {'Authorization': f"Bearer {token}"}
+        if not token:
+            print("AVISO: CONTA_AZUL_REFRESH_TOKEN e CONTA_AZUL_ACCESS_TOKEN não definidos", file=sys.stderr)
+    return ClienteAPI(
+        'conta_azul',
+        os.getenv('CONTA_AZUL_API_URL', 'https://api-v2.contaazul.com'),
+        taxa_por_s=float(os.getenv('CONTA_AZUL_LIMITE_POR_S', 10)),
+        rajada=int(os.getenv('CONTA_AZUL_RAJADA', 10)),
+        autenticar=autenticar,
+        token_oauth=token_oauth,
+        arquivo_balde=os.path.join(INTEGRACOES_DIR, 'balde_conta_azul'),
+    )
+
+
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+
+def _cliente(nome, criar):
+    with _lock_clientes:
+        if nome not in _clientes:
+            _clientes[nome] = criar()
+            metricas.registrar_fonte(f'api_{nome}', _clientes[nome].estatisticas)
+        return _clientes[nome]
+
+
+def clickup():
+    """Cliente compartilhado da API do ClickUp (um por processo)"""
+    return _cliente('clickup', _criar_clickup)
+
+
+def conta_azul():
+    """Cliente compartilhado da API do Conta Azul (um por processo)"""
+    return _cliente('conta_azul', _criar_conta_azul)
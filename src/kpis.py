@@ -0,0 +1,266 @@
+"""Pré-agregados de KPIs da carteira para o dashboard TurboX.
+
+Dois níveis, ambos no Postgres:
+
+- ``kpi_clientes``: uma linha por cliente com os totais das faturas e as
+  dimensões do ClickUp (segmento, cluster, responsável).
+- ``kpi_rollup``: ``GROUP BY CUBE`` de ``kpi_clientes`` nas três dimensões;
+  dimensão NULL na linha significa "todas". Clientes sem a dimensão no ClickUp
+  entram como "Sem segmento"/"Sem cluster"/"Sem responsável".
+
+``atualizar`` deve rodar ao final de cada sync (``python -m src.kpis``). Ela
+recalcula em ``kpi_clientes`` só os clientes com faturas alteradas desde a última
+execução (``data_alteracao``) ou com dimensões diferentes no ClickUp, e refaz o
+``kpi_rollup`` (pequeno: no máximo uma linha por combinação de dimensões). Na
+primeira execução do dia o recálculo é completo, porque "vencido" depende da
+data atual e faturas excluídas não aparecem na marca de alteração.
+
+A API lê o ``kpi_rollup`` inteiro para a memória do worker (``carregar``), então
+cada chamada de ``/api/kpis`` é só uma busca num dict.
+"""
+import os
+import sys
+import time
+from datetime import date
+
+from src.consultas import ARQUIVO_RECEBIVEIS, SQL_CLICKUP_RECENTE
+
+DIMENSOES = ('segmento', 'cluster', 'responsavel')
+MEDIDAS = ('clientes', 'qtd_faturas', 'total_pago', 'total_pendente', 'total_vencido',
+           'qtd_vencidas', 'clientes_inadimplentes', 'pago_mes')
+
+DDL = """
+CREATE TABLE IF NOT EXISTS kpi_clientes (
+    cliente_nome TEXT PRIMARY KEY,
+    segmento TEXT NOT NULL,
+    cluster TEXT NOT NULL,
+    responsavel TEXT NOT NULL,
+    qtd_faturas INTEGER NOT NULL,
+    total_pago NUMERIC(16, 2) NOT NULL,
+    total_pendente NUMERIC(16, 2) NOT NULL,
+    total_vencido NUMERIC(16, 2) NOT NULL,
+    qtd_vencidas INTEGER NOT NULL,
+    pago_mes NUMERIC(16, 2) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS kpi_rollup (
+    segmento TEXT,
+    cluster TEXT,
+    responsavel TEXT,
+    agrupamento INTEGER NOT NULL,
+    clientes INTEGER NOT NULL,
+    qtd_faturas BIGINT NOT NULL,
+    total_pago NUMERIC(18, 2) NOT NULL,
+    total_pendente NUMERIC(18, 2) NOT NULL,
+    total_vencido NUMERIC(18, 2) NOT NULL,
+    qtd_vencidas BIGINT NOT NULL,
+    clientes_inadimplentes INTEGER NOT NULL,
+    pago_mes NUMERIC(18, 2) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS kpi_meta (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    data_referencia DATE NOT NULL,
+    marca_alteracao TIMESTAMP,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+    clientes_recalculados INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Um cliente por nome (há nomes repetidos em clientes_turbo) e o ClickUp mais recente por CNPJ
+_SQL_DIMENSOES = f"""
+    FROM (SELECT DISTINCT ON (nome) nome, cnpj FROM clientes_turbo ORDER BY nome, id) c
+    LEFT JOIN ({SQL_CLICKUP_RECENTE}) ck ON ck.cnpj = c.cnpj
+"""
+
+# Faturas arquivadas (src/arquivamento.py) entram pelos totais por cliente; são
+# pagas e antigas, então só contam na quantidade e no total pago
+_SQL_FATURAS = "SELECT cliente_nome, pago, nao_pago, data_vencimento, data_alteracao, 1 AS qtd FROM a_receber_turbo"
+if ARQUIVO_RECEBIVEIS:
+    _SQL_FATURAS += """
+    UNION ALL
+    SELECT cliente_nome, pago, 0, NULL, NULL, qtd_faturas FROM a_receber_arquivo_totais
+    """
+
+# "Pago no mês": faturas quitadas cuja última alteração foi no mês corrente (não
+# há data de pagamento na tabela). Vencido segue o critério do LTV (< hoje).
+SQL_RECALCULAR_CLIENTES = f"""
+INSERT INTO kpi_clientes
+SELECT a.cliente_nome,
+       COALESCE(d.segmento, 'Sem segmento'),
+       COALESCE(d.cluster, 'Sem cluster'),
+       COALESCE(d.responsavel, 'Sem responsável'),
+       SUM(a.qtd),
+       COALESCE(SUM(a.pago), 0),
+       COALESCE(SUM(a.nao_pago) FILTER (WHERE a.nao_pago > 0), 0),
+       COALESCE(SUM(a.nao_pago) FILTER (WHERE a.nao_pago > 0 AND a.data_vencimento < CURRENT_DATE), 0),
+       COUNT(*) FILTER (WHERE a.nao_pago > 0 AND a.data_vencimento < CURRENT_DATE),
+       COALESCE(SUM(a.pago) FILTER (WHERE a.nao_pago = 0 AND a.data_alteracao >= date_trunc('month', CURRENT_DATE)), 0)
+FROM ({_SQL_FATURAS}) a
+LEFT JOIN (
+    SELECT c.nome, ck.segmento, ck.cluster, ck.responsavel
+    {_SQL_DIMENSOES}
+) d ON d.nome = a.cliente_nome
+WHERE a.cliente_nome IS NOT NULL
+  AND (%(nomes)s::text[] IS NULL OR a.cliente_nome = ANY(%(nomes)s::text[]))
+GROUP BY a.cliente_nome, d.segmento, d.cluster, d.responsavel
+"""
+
+SQL_CLIENTES_ALTERADOS = f"""
+SELECT DISTINCT cliente_nome FROM a_receber_turbo
+WHERE data_alteracao > %(marca)s AND cliente_nome IS NOT NULL
+UNION
+SELECT k.cliente_nome
+FROM kpi_clientes k
+LEFT JOIN (
+    SELECT c.nome, ck.segmento, ck.cluster, ck.responsavel
+    {_SQL_DIMENSOES}
+) d ON d.nome = k.cliente_nome
+WHERE (k.segmento, k.cluster, k.responsavel) IS DISTINCT FROM
+      (COALESCE(d.segmento, 'Sem segmento'), COALESCE(d.cluster, 'Sem cluster'), COALESCE(d.responsavel, 'Sem responsável'))
+"""
+
+SQL_ROLLUP = """
+INSERT INTO kpi_rollup
+SELECT segmento, cluster, responsavel,
+       GROUPING(segmento, cluster, responsavel),
+       COUNT(*),
+       SUM(qtd_faturas),
+       SUM(total_pago),
+       SUM(total_pendente),
+       SUM(total_vencido),
+       SUM(qtd_vencidas),
+       COUNT(*) FILTER (WHERE total_vencido > 0),
+       SUM(pago_mes)
+FROM kpi_clientes
+GROUP BY CUBE (segmento, cluster, responsavel)
+"""
+
+
+def atualizar(conn, completo=False):
+    """Atualizar os pré-agregados; retorna quantos clientes foram recalculados"""
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(DDL)
+            cursor.execute("SELECT data_referencia, marca_alteracao FROM kpi_meta FOR UPDATE")
+            meta = cursor.fetchone()
+            cursor.execute("SELECT MAX(data_alteracao) FROM a_receber_turbo")
+            nova_marca = cursor.fetchone()[0]
+
+            if completo or meta is None or meta[0] != date.today() or meta[1] is None:
+                cursor.execute("TRUNCATE kpi_clientes")
+                cursor.execute(SQL_RECALCULAR_CLIENTES, {'nomes': None})
+                recalculados = cursor.rowcount
+            else:
+                cursor.execute(SQL_CLIENTES_ALTERADOS, {'marca': meta[1]})
+                nomes = [row[0] for row in cursor.fetchall()]
+                recalculados = 0
+                if nomes:
+                    cursor.execute("DELETE FROM kpi_clientes WHERE cliente_nome = ANY(%s)", (nomes,))
+                    cursor.execute(SQL_RECALCULAR_CLIENTES, {'nomes': nomes})
+                    recalculados = len(nomes)
+
+            if completo or recalculados or meta is None or meta[0] != date.today():
+                cursor.execute("DELETE FROM kpi_rollup")
+                cursor.execute(SQL_ROLLUP)
+
+            cursor.execute("""
+            INSERT INTO kpi_meta (id, data_referencia, marca_alteracao, atualizado_em, clientes_recalculados)
+            VALUES (true, CURRENT_DATE, %s, now(), %s)
+            ON CONFLICT (id) DO UPDATE SET
+                data_referencia = EXCLUDED.data_referencia,
+                marca_alteracao = COALESCE(EXCLUDED.marca_alteracao, kpi_meta.marca_alteracao),
+                atualizado_em = EXCLUDED.atualizado_em,
+                clientes_recalculados = EXCLUDED.clientes_recalculados
+            """, (nova_marca, recalculados))
+        conn.commit()
+        return recalculados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+
+class Rollup:
+    """Cópia em memória do ``kpi_rollup``, indexada pelas dimensões"""
+
+    def __init__(self, linhas, data_referencia, atualizado_em):
+        self.data_referencia = data_referencia
+        self.atualizado_em = atualizado_em
+        self.linhas = {}
+        for linha in linhas:
+            chave = tuple(linha[d] for d in DIMENSOES)
+            self.linhas[chave] = {m: _numero(linha[m]) for m in MEDIDAS}
+
+    def consultar(self, filtros):
+        """Totais para os filtros e quebras por cada dimensão não filtrada.
+
+        ``filtros`` mapeia dimensão -> valor (ausente = todas).
+        """
+        chave = tuple(filtros.get(d) for d in DIMENSOES)
+        vazio = {m: 0 for m in MEDIDAS}
+        resultado = {
+            'filtros': {d: filtros.get(d) for d in DIMENSOES},
+            'data_referencia': self.data_referencia.isoformat() if self.data_referencia else None,
+            'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None,
+            'desatualizado': self.data_referencia != date.today(),
+            'totais': self.linhas.get(chave, vazio),
+        }
+        for i, dimensao in enumerate(DIMENSOES):
+            if filtros.get(dimensao):
+                continue
+            quebra = []
+            for (linha_chave, medidas) in self.linhas.items():
+                if linha_chave[i] is None:
+                    continue
+                if all(linha_chave[j] == chave[j] for j in range(len(DIMENSOES)) if j != i):
+                    quebra.append(dict(medidas, **{dimensao: linha_chave[i]}))
+            quebra.sort(key=lambda item: item['total_vencido'], reverse=True)
+            resultado[f'por_{dimensao}'] = quebra
+        return resultado
+
+
+def _numero(valor):
+    return float(valor) if valor is not None and not isinstance(valor, int) else valor
+
+
+def carregar(cursor):
+    """Ler o ``kpi_rollup`` (cursor RealDictCursor); None se nunca foi calculado"""
+    from psycopg2.errors import UndefinedTable
+
+    try:
+        cursor.execute("SELECT data_referencia, atualizado_em FROM kpi_meta")
+    except UndefinedTable:
+        # "python -m src.kpis" ainda não rodou; qualquer outro erro sobe
+        cursor.connection.rollback()
+        return None
+    meta = cursor.fetchone()
+    if meta is None:
+        return None
+    cursor.execute(f"SELECT {', '.join(DIMENSOES + MEDIDAS)} FROM kpi_rollup")
+    return Rollup(cursor.fetchall(), meta['data_referencia'], meta['atualizado_em'])
+
+
+if __name__ == '__main__':
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.environ.get('DATABASE_URL', '')
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    conexao_pg = psycopg2.connect(database_url) if database_url else psycopg2.connect(
+        host=os.getenv("PG_HOST"),
+        dbname=os.getenv("PG_DBNAME"),
+        user=os.getenv("PG_USER"),
+        password=os.getenv("PG_PASSWORD"),
+        port=os.getenv("PG_PORT")
+    )
+    try:
+        inicio = time.monotonic()
+        quantidade = atualizar(conexao_pg, completo='--completo' in sys.argv[1:])
+        print(f"KPIs atualizados: {quantidade} cliente(s) recalculado(s) em {time.monotonic() - inicio:.2f}s")
+    finally:
+        conexao_pg.close()
@@ -0,0 +1,39 @@
+"""Métricas simples em memória, expostas em JSON pela rota /metricas.
+
+Cada worker do gunicorn tem os próprios contadores; o ``pid`` no retorno
+identifica de qual worker veio a leitura.
+"""
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+_contadores = {}
+_fontes = {}
+_iniciado_em = time.time()
+
+
+def incrementar(nome, valor=1):
+    with _lock:
+        _contadores[nome] = _contadores.get(nome, 0) + valor
+
+
+def registrar_fonte(nome, funcao):
+    """Registrar uma função que devolve um dict de métricas de um componente"""
+    _fontes[nome] = funcao
+
+
+def coletar():
+    with _lock:
+        contadores = dict(_contadores)
+    dados = {
+        'pid': os.getpid(),
+        'uptime_s': round(time.time() - _iniciado_em, 1),
+        'contadores': contadores,
+    }
+    for nome, funcao in list(_fontes.items()):
+        try:
+            dados[nome] = funcao()
+        except Exception as e:
+            dados[nome] = {'erro': str(e)}
+    return dados
@@ -0,0 +1,256 @@
+"""Feed de alterações dos clientes via LISTEN/NOTIFY, para invalidar caches dos workers.
+
+Triggers por comando (FOR EACH STATEMENT, com tabelas de transição) em
+``a_receber_turbo``, ``clientes_clickup`` e ``clientes_turbo`` publicam no canal
+``alteracoes_clientes`` um evento JSON por cliente alterado
+(``{"tabela", "nome", "cnpj"}``). Comandos que alteram muitos clientes de uma vez
+(syncs completos, TRUNCATE) publicam um único ``{"tabela", "tudo": true}``.
+
+Cada worker roda um ``OuvinteAlteracoes`` (thread) que escuta o canal e chama as
+funções registradas com ``ao_alterar``. Notificações não são entregues a quem
+está desconectado, então a cada conexão (inclusive a primeira e após queda) as
+funções de ``ao_resincronizar`` descartam tudo que estava em cache.
+
+Instalar as triggers no banco: ``python -m src.notificacoes``.
+"""
+import json
+import os
+import select
+import sys
+import threading
+import time
+
+CANAL = 'alteracoes_clientes'
+
+# Acima disso, o comando é tratado como alteração geral (um único evento "tudo")
+MAX_CLIENTES_POR_EVENTO = 200
+
+TABELAS = ('a_receber_turbo', 'clientes_clickup', 'clientes_turbo')
+
+DDL_FUNCOES = f"""
+CREATE OR REPLACE FUNCTION notificar_clientes_alterados(tabela TEXT, nomes TEXT[], cnpjs TEXT[])
+RETURNS void AS $$
+DECLARE
+    alterado RECORD;
+BEGIN
+    IF coalesce(array_length(nomes, 1), 0) + coalesce(array_length(cnpjs, 1), 0) > {MAX_CLIENTES_POR_EVENTO} THEN
+        PERFORM pg_notify('{CANAL}', json_build_object('tabela', tabela, 'tudo', true)::text);
+        RETURN;
+    END IF;
+
+    FOR alterado IN
+        SELECT n.nome, c.cnpj FROM unnest(nomes) AS n(nome) LEFT JOIN clientes_turbo c ON c.nome = n.nome
+        WHERE n.nome IS NOT NULL
+        UNION
+        SELECT c.nome, n.cnpj FROM unnest(cnpjs) AS n(cnpj) LEFT JOIN clientes_turbo c ON c.cnpj = n.cnpj
+        WHERE n.cnpj IS NOT NULL
+    LOOP
+        PERFORM pg_notify('{CANAL}', json_build_object('tabela', tabela, 'nome', alterado.nome, 'cnpj', alterado.cnpj)::text);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notificar_alteracoes() RETURNS trigger AS $$
+DECLARE
+    nomes TEXT[] := '{{}}';
+    cnpjs TEXT[] := '{{}}';
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('{CANAL}', json_build_object('tabela', TG_TABLE_NAME, 'tudo', true)::text);
+        RETURN NULL;
+    END IF;
+
+    -- "novos" só existe em INSERT/UPDATE e "antigos" em UPDATE/DELETE
+    IF TG_TABLE_NAME = 'a_receber_turbo' THEN
+        IF TG_OP <> 'DELETE' THEN
+            nomes := nomes || ARRAY(SELECT DISTINCT cliente_nome::text FROM novos);
+        END IF;
+        IF TG_OP <> 'INSERT' THEN
+            nomes := nomes || ARRAY(SELECT DISTINCT cliente_nome::text FROM antigos);
+        END IF;
+    ELSIF TG_TABLE_NAME = 'clientes_clickup' THEN
+        IF TG_OP <> 'DELETE' THEN
+            cnpjs := cnpjs || ARRAY(SELECT DISTINCT cnpj::text FROM novos);
+        END IF;
+        IF TG_OP <> 'INSERT' THEN
+            cnpjs := cnpjs || ARRAY(SELECT DISTINCT cnpj::text FROM antigos);
+        END IF;
+    ELSE
+        IF TG_OP <> 'DELETE' THEN
+            nomes := nomes || ARRAY(SELECT DISTINCT nome::text FROM novos);
+            cnpjs := cnpjs || ARRAY(SELECT DISTINCT cnpj::text FROM novos);
+        END IF;
+        IF TG_OP <> 'INSERT' THEN
+            nomes := nomes || ARRAY(SELECT DISTINCT nome::text FROM antigos);
+            cnpjs := cnpjs || ARRAY(SELECT DISTINCT cnpj::text FROM antigos);
+        END IF;
+    END IF;
+
+    PERFORM notificar_clientes_alterados(TG_TABLE_NAME, nomes, cnpjs);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Tabelas de transição só podem ser usadas em triggers de um único evento
+_REFERENCIAS = {
+    'INSERT': 'REFERENCING NEW TABLE AS novos',
+    'UPDATE': 'REFERENCING OLD TABLE AS antigos NEW TABLE AS novos',
+    'DELETE': 'REFERENCING OLD TABLE AS antigos',
+    'TRUNCATE': '',
+}
+
+
+def ddl_triggers(tabela):
+    comandos = []
+    for evento, referencias in _REFERENCIAS.items():
+        nome = f"notificar_{tabela}_{evento.lower()}"
+        comandos.append(f"DROP TRIGGER IF EXISTS {nome} ON {tabela}")
+        comandos.append(
+            f"CREATE TRIGGER {nome} AFTER {evento} ON {tabela} {referencias} "
+            f"FOR EACH STATEMENT EXECUTE PROCEDURE notificar_alteracoes()"
+        )
+    return comandos
+
+
+def instalar(conn):
+    """Criar (ou recriar) as funções e triggers de notificação"""
+    with conn.cursor() as cursor:
+        cursor.execute(DDL_FUNCOES)
+        for tabela in TABELAS:
+            for comando in ddl_triggers(tabela):
+                cursor.execute(comando)
+    conn.commit()
+
+
+class OuvinteAlteracoes(threading.Thread):
+    """Thread que escuta o canal de alterações e despacha os eventos.
+
+    ``conectar`` deve devolver uma conexão com o primário (réplicas não recebem
+    NOTIFY) ou None; em caso de falha tenta de novo a cada ``espera_reconexao_s``.
+    """
+
+    def __init__(self, conectar, canal=CANAL, espera_reconexao_s=5.0, intervalo_verificacao_s=30.0):
+        super().__init__(name='ouvinte-alteracoes', daemon=True)
+        self._conectar = conectar
+        self.canal = canal
+        self.espera_reconexao_s = espera_reconexao_s
+        self.intervalo_verificacao_s = intervalo_verificacao_s
+        self._ao_alterar = []
+        self._ao_resincronizar = []
+        self._parar = threading.Event()
+        self.conectado = False
+        self.conexoes = 0
+        self.notificacoes = 0
+        self.resincronizacoes = 0
+        self.ultimo_erro = None
+        self.ultima_notificacao_em = None
+
+    def ao_alterar(self, funcao):
+        """Registrar ``funcao(cnpj, nome)`` chamada para cada cliente alterado"""
+        self._ao_alterar.append(funcao)
+
+    def ao_resincronizar(self, funcao):
+        """Registrar ``funcao()`` chamada quando tudo deve ser descartado"""
+        self._ao_resincronizar.append(funcao)
+
+    def parar(self):
+        self._parar.set()
+
+    def _resincronizar(self):
+        self.resincronizacoes += 1
+        for funcao in self._ao_resincronizar:
+            try:
+                funcao()
+            except Exception as e:
+                print(f"AVISO: falha ao resincronizar caches: {e}", file=sys.stderr)
+
+    def _despachar(self, payload):
+        self.notificacoes += 1
+        self.ultima_notificacao_em = time.time()
+        try:
+            evento = json.loads(payload)
+        except ValueError:
+            evento = {'tudo': True}
+
+        if evento.get('tudo'):
+            self._resincronizar()
+            return
+
+        for funcao in self._ao_alterar:
+            try:
+                funcao(evento.get('cnpj'), evento.get('nome'))
+            except Exception as e:
+                print(f"AVISO: falha ao invalidar cache do cliente {evento}: {e}", file=sys.stderr)
+
+    def _escutar(self, conn):
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.canal}")
+        self.conectado = True
+        self.conexoes += 1
+        self.ultimo_erro = None
+        # O que mudou enquanto estávamos desconectados não foi notificado
+        self._resincronizar()
+
+        while not self._parar.is_set():
+            if select.select([conn], [], [], self.intervalo_verificacao_s) == ([], [], []):
+                # Sem notificações: confirmar que a conexão continua viva
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            else:
+                conn.poll()
+            while conn.notifies:
+                self._despachar(conn.notifies.pop(0).payload)
+
+    def run(self):
+        while not self._parar.is_set():
+            conn = None
+            try:
+                conn = self._conectar()
+                if conn is None:
+                    raise ConnectionError("sem conexão com o banco")
+                self._escutar(conn)
+            except Exception as e:
+                self.ultimo_erro = str(e).strip() or e.__class__.__name__
+                print(f"AVISO: ouvinte de alterações desconectado: {self.ultimo_erro}", file=sys.stderr)
+            finally:
+                self.conectado = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._parar.wait(self.espera_reconexao_s)
+
+    def estatisticas(self):
+        return {
+            'conectado': self.conectado,
+            'conexoes': self.conexoes,
+            'notificacoes': self.notificacoes,
+            'resincronizacoes': self.resincronizacoes,
+            'ultima_notificacao_ha_s': round(time.time() - self.ultima_notificacao_em, 1) if self.ultima_notificacao_em else None,
+            'ultimo_erro': self.ultimo_erro,
+        }
+
+
+if __name__ == '__main__':
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.environ.get('DATABASE_URL', '')
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    conexao_pg = psycopg2.connect(database_url) if database_url else psycopg2.connect(
+        host=os.getenv("PG_HOST"),
+        dbname=os.getenv("PG_DBNAME"),
+        user=os.getenv("PG_USER"),
+        password=os.getenv("PG_PASSWORD"),
+        port=os.getenv("PG_PORT")
+    )
+    try:
+        instalar(conexao_pg)
+        print(f"Triggers de notificação instaladas em {', '.join(TABELAS)} (canal {CANAL})")
+    finally:
+        conexao_pg.close()
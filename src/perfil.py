@@ -0,0 +1,345 @@
+"""Perfil sob demanda de uma única requisição (amostragem ou cProfile + tempos de SQL).
+
+Desligado sem ``PERFIL_TOKEN``. Com ele definido, uma requisição que envia o
+cabeçalho ``X-Perfil-Token`` com o token é perfilada; as demais pagam só a
+leitura do cabeçalho. ``X-Perfil-Modo`` escolhe o modo:
+
+- ``amostragem`` (padrão): uma thread captura a pilha da thread da requisição a
+  cada ``PERFIL_INTERVALO_MS`` e gera pilhas colapsadas (formato do
+  flamegraph.pl / speedscope) e um flamegraph SVG;
+- ``cprofile``: ``cProfile`` determinístico, salvo em formato pstats
+  (``python -m pstats``, snakeviz).
+
+Em ambos os modos cada consulta feita pelas conexões da requisição é medida
+(texto, tempo e linhas). O id do perfil volta no cabeçalho ``X-Perfil-Id`` e os
+arquivos ficam em ``PERFIL_DIR``; só os ``PERFIL_MAX`` mais recentes são mantidos.
+
+Respostas em streaming são perfiladas só até o início do envio do corpo.
+"""
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from xml.sax.saxutils import escape
+
+PERFIL_TOKEN = os.getenv('PERFIL_TOKEN')
+PERFIL_DIR = os.getenv('PERFIL_DIR') or os.path.join(tempfile.gettempdir(), 'perfis')
+PERFIL_MAX = int(os.getenv('PERFIL_MAX', 20))
+INTERVALO_AMOSTRAGEM_S = float(os.getenv('PERFIL_INTERVALO_MS', 2)) / 1000
+
+MODOS = ('amostragem', 'cprofile')
+# Extensão do arquivo principal de cada modo
+ARQUIVOS = {'folded': 'folded', 'svg': 'svg', 'pstats': 'prof'}
+
+
+def autorizado(token):
+    return bool(PERFIL_TOKEN) and bool(token) and hmac.compare_digest(token, PERFIL_TOKEN)
+
+
+def _quadro(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Amostrador(threading.Thread):
+    """Captura periodicamente a pilha de outra thread"""
+
+    def __init__(self, id_thread, intervalo):
+        super().__init__(name='perfil-amostrador', daemon=True)
+        self.id_thread = id_thread
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.id_thread)
+            pilha = []
+            while frame is not None:
+                pilha.append(_quadro(frame.f_code))
+                frame = frame.f_back
+            if pilha:
+                self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+class Perfil:
+    """Perfil de uma requisição; ``iniciar`` e ``parar`` na mesma thread"""
+
+    def __init__(self, modo, metodo, caminho, endpoint):
+        self.id = uuid.uuid4().hex
+        self.modo = modo if modo in MODOS else 'amostragem'
+        self.metodo = metodo
+        self.caminho = caminho
+        self.endpoint = endpoint
+        self.consultas = []
+        self._perfilador = None
+        self._amostrador = None
+        self._inicio = None
+        self.duracao_ms = None
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        if self.modo == 'cprofile':
+            self._perfilador = cProfile.Profile()
+            self._perfilador.enable()
+        else:
+            self._amostrador = _Amostrador(threading.get_ident(), INTERVALO_AMOSTRAGEM_S)
+            self._amostrador.start()
+
+    def parar(self):
+        if self._perfilador:
+            self._perfilador.disable()
+        if self._amostrador:
+            self._amostrador.parar()
+        self.duracao_ms = round((time.perf_counter() - self._inicio) * 1000, 2)
+
+    def registrar_consulta(self, sql, duracao_s, linhas):
+        self.consultas.append({
+            'sql': ' '.join(str(sql).split())[:2000],
+            'ms': round(duracao_s * 1000, 2),
+            'linhas': linhas,
+        })
+
+    def salvar(self, status):
+        """Gravar os arquivos do perfil e aplicar o limite; retorna o id"""
+        os.makedirs(PERFIL_DIR, exist_ok=True)
+        resumo = {
+            'id': self.id,
+            'criado_em': time.time(),
+            'modo': self.modo,
+            'metodo': self.metodo,
+            'caminho': self.caminho,
+            'endpoint': self.endpoint,
+            'status': status,
+            'duracao_ms': self.duracao_ms,
+            'sql_ms': round(sum(c['ms'] for c in self.consultas), 2),
+            'consultas': self.consultas,
+            'arquivos': [],
+        }
+        if self._perfilador:
+            self._perfilador.dump_stats(_caminho(self.id, ARQUIVOS['pstats']))
+            resumo['arquivos'].append('pstats')
+            resumo['funcoes'] = _funcoes_mais_lentas(self._perfilador)
+        if self._amostrador:
+            pilhas = self._amostrador.pilhas
+            with open(_caminho(self.id, ARQUIVOS['folded']), 'w', encoding='utf-8') as arquivo:
+                for pilha, amostras in pilhas.most_common():
+                    arquivo.write(f"{pilha} {amostras}\n")
+            with open(_caminho(self.id, ARQUIVOS['svg']), 'w', encoding='utf-8') as arquivo:
+                arquivo.write(flamegraph_svg(pilhas, f"{self.metodo} {self.caminho} ({self.duracao_ms} ms)"))
+            resumo['arquivos'] += ['folded', 'svg']
+            resumo['amostras'] = sum(pilhas.values())
+
+        # Resumo por último: é ele que torna o perfil visível na listagem
+        temporario = _caminho(self.id, 'json.tmp')
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(resumo, arquivo)
+        os.replace(temporario, _caminho(self.id, 'json'))
+        _aplicar_limite()
+        return self.id
+
+
+def _funcoes_mais_lentas(perfilador, limite=30):
+    estatisticas = pstats.Stats(perfilador)
+    linhas = []
+    for (arquivo, linha, funcao), (_, chamadas, proprio, acumulado, _) in estatisticas.stats.items():
+        linhas.append({
+            'funcao': f"{funcao} ({os.path.basename(arquivo)}:{linha})",
+            'chamadas': chamadas,
+            'proprio_ms': round(proprio * 1000, 3),
+            'acumulado_ms': round(acumulado * 1000, 3),
+        })
+    linhas.sort(key=lambda item: item['acumulado_ms'], reverse=True)
+    return linhas[:limite]
+
+
+def _caminho(id_perfil, extensao):
+    return os.path.join(PERFIL_DIR, f"{id_perfil}.{extensao}")
+
+
+def _aplicar_limite():
+    """Manter só os PERFIL_MAX perfis mais recentes"""
+    resumos = []
+    for nome in os.listdir(PERFIL_DIR):
+        if nome.endswith('.json'):
+            try:
+                resumos.append((os.path.getmtime(os.path.join(PERFIL_DIR, nome)), nome[:-5]))
+            except OSError:
+                # Removido por outro worker ao mesmo tempo
+                pass
+    resumos.sort()
+    for _, id_perfil in resumos[:-PERFIL_MAX] if PERFIL_MAX > 0 else resumos:
+        for extensao in ('json', *ARQUIVOS.values()):
+            try:
+                os.remove(_caminho(id_perfil, extensao))
+            except OSError:
+                pass
+
+
+def _valido(id_perfil):
+    return len(id_perfil) == 32 and all(c in '0123456789abcdef' for c in id_perfil)
+
+
+def listar():
+    """Resumos dos perfis guardados, do mais recente para o mais antigo (sem as consultas)"""
+    if not os.path.isdir(PERFIL_DIR):
+        return []
+    resumos = []
+    for nome in os.listdir(PERFIL_DIR):
+        if nome.endswith('.json'):
+            resumo = carregar(nome[:-5])
+            if resumo:
+                resumo.pop('consultas', None)
+                resumo.pop('funcoes', None)
+                resumos.append(resumo)
+    return sorted(resumos, key=lambda resumo: resumo['criado_em'], reverse=True)
+
+
+def carregar(id_perfil):
+    if not _valido(id_perfil):
+        return None
+    try:
+        with open(_caminho(id_perfil, 'json'), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def caminho_arquivo(id_perfil, tipo):
+    """Caminho do arquivo ``tipo`` (folded, svg, pstats) do perfil, ou None"""
+    resumo = carregar(id_perfil)
+    if not resumo or tipo not in resumo['arquivos']:
+        return None
+    caminho = _caminho(id_perfil, ARQUIVOS[tipo])
+    return caminho if os.path.exists(caminho) else None
+
+
+# Flamegraph SVG ------------------------------------------------------------
+
+_LARGURA = 1200
+_ALTURA_QUADRO = 16
+
+
+def flamegraph_svg(pilhas, titulo):
+    """Flamegraph estático (SVG) a partir de pilhas colapsadas {pilha: amostras}"""
+    raiz = {'nome': 'todas', 'amostras': 0, 'filhos': {}}
+    for pilha, amostras in pilhas.items():
+        raiz['amostras'] += amostras
+        no = raiz
+        for quadro in pilha.split(';'):
+            no = no['filhos'].setdefault(quadro, {'nome': quadro, 'amostras': 0, 'filhos': {}})
+            no['amostras'] += amostras
+
+    retangulos = []
+    profundidade_max = [0]
+    total = raiz['amostras'] or 1
+
+    def desenhar(no, x, profundidade):
+        largura = no['amostras'] / total * _LARGURA
+        if largura < 0.5:
+            return
+        profundidade_max[0] = max(profundidade_max[0], profundidade)
+        retangulos.append((x, profundidade, largura, no))
+        for filho in sorted(no['filhos'].values(), key=lambda filho: filho['nome']):
+            desenhar(filho, x, profundidade + 1)
+            x += filho['amostras'] / total * _LARGURA
+
+    desenhar(raiz, 0.0, 0)
+    altura = (profundidade_max[0] + 1) * _ALTURA_QUADRO + 30
+    partes = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_LARGURA}" height="{altura}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="14">{escape(titulo)} - {raiz["amostras"]} amostras</text>',
+    ]
+    for x, profundidade, largura, no in retangulos:
+        y = altura - (profundidade + 1) * _ALTURA_QUADRO
+        # Cor estável por função, em tons quentes
+        tom = 20 + zlib.crc32(no['nome'].encode('utf-8')) % 40
+        percentual = no['amostras'] / total * 100
+        partes.append(
+            f'<g><title>{escape(no["nome"])} ({no["amostras"]} amostras, {percentual:.1f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{largura:.1f}" height="{_ALTURA_QUADRO - 1}" '
+            f'fill="hsl({tom}, 85%, 55%)"/>'
+        )
+        caracteres = int(largura / 7)
+        if caracteres > 3:
+            texto = no['nome'] if len(no['nome']) <= caracteres else no['nome'][:caracteres - 2] + '..'
+            partes.append(f'<text x="{x + 2:.1f}" y="{y + 11}">{escape(texto)}</text>')
+        partes.append('</g>')
+    partes.append('</svg>')
+    return '\n'.join(partes)
+
+
+# Medição de SQL -------------------------------------------------------------
+
+class CursorMedido:
+    """Cursor psycopg2 que registra o tempo de cada execute no perfil"""
+
+    def __init__(self, cursor, perfil):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_perfil', perfil)
+
+    def execute(self, sql, args=None):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, args)
+        finally:
+            self._perfil.registrar_consulta(sql, time.perf_counter() - inicio, self._cursor.rowcount)
+
+    def executemany(self, sql, args_lista):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, args_lista)
+        finally:
+            self._perfil.registrar_consulta(sql, time.perf_counter() - inicio, self._cursor.rowcount)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *excecao):
+        return self._cursor.__exit__(*excecao)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._cursor, nome, valor)
+
+
+class ConexaoMedida:
+    """Conexão psycopg2 cujos cursores são ``CursorMedido``"""
+
+    def __init__(self, conn, perfil):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_perfil', perfil)
+
+    def cursor(self, *args, **kwargs):
+        return CursorMedido(self._conn.cursor(*args, **kwargs), self._perfil)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *excecao):
+        return self._conn.__exit__(*excecao)
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._conn, nome, valor)
@@ -0,0 +1,226 @@
+"""Pool de conexões com o primário, por processo (worker do gunicorn).
+
+Cada ``get_db_connection()`` abria uma conexão nova (TCP + TLS + autenticação)
+e a fechava no fim da requisição. O pool mantém até ``tamanho`` conexões abertas
+e as reutiliza: ``obter`` devolve uma ``ConexaoDoPool``, cujo ``close()`` só a
+devolve ao pool, então as rotas continuam chamando ``conn.close()`` como antes
+(de preferência num ``finally``). Se o chamador perder a conexão sem fechá-la
+(exceção antes do ``close()``), ela volta ao pool quando o objeto é coletado, e
+a vaga não fica presa; essas devoluções aparecem em ``abandonadas``.
+
+Na devolução, transações abertas são desfeitas e conexões quebradas (ou em
+estado desconhecido) são descartadas. Conexões ociosas há mais de
+``ocioso_max_s`` são fechadas na próxima retirada.
+
+Conexões de longa duração (LISTEN, jobs em segundo plano) não devem vir do pool:
+use ``get_db_connection(dedicada=True)``.
+"""
+import os
+import sys
+import threading
+import time
+import weakref
+
+from src.consultas import BancoIndisponivel
+
+try:
+    from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+except ImportError:
+    TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN = 0, 4
+
+
+class PoolEsgotado(BancoIndisponivel):
+    """Todas as conexões do pool ficaram ocupadas durante a espera"""
+
+
+class ConexaoDoPool:
+    """Conexão emprestada do pool; ``close()`` a devolve.
+
+    ``estado`` guarda configurações já aplicadas na sessão (ex.: statement_timeout)
+    e acompanha a conexão entre empréstimos.
+    """
+
+    def __init__(self, conn, estado, pool):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, 'estado', estado)
+        object.__setattr__(self, '_pool', pool)
+        # Devolve a vaga se o objeto for coletado sem close(); não referencia self
+        finalizador = weakref.finalize(self, pool._devolver_abandonada, conn, estado)
+        finalizador.atexit = False
+        object.__setattr__(self, '_finalizador', finalizador)
+
+    def _liberar(self, descartar=False):
+        # detach() só retorna algo uma vez: close() repetido não devolve duas vezes
+        if self._finalizador.detach() is not None:
+            self._pool._devolver(self._conn, self.estado, descartar=descartar)
+
+    def close(self):
+        self._liberar()
+
+    def descartar(self):
+        """Fechar de verdade (ex.: sessão com estado que não pode ser reaproveitado)"""
+        self._liberar(descartar=True)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *excecao):
+        return self._conn.__exit__(*excecao)
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._conn, nome, valor)
+
+
+class PoolConexoes:
+    """``conectar()`` abre uma conexão nova; ``preparar(conn)`` roda uma vez em cada uma"""
+
+    def __init__(self, conectar, tamanho=5, espera_s=2.0, ocioso_max_s=300.0, preparar=None):
+        self._conectar = conectar
+        self._preparar = preparar
+        self.tamanho = tamanho
+        self.espera_s = espera_s
+        self.ocioso_max_s = ocioso_max_s
+        # Reentrante: o finalizador de uma conexão abandonada pode rodar (coleta de
+        # lixo) na mesma thread enquanto ela segura o lock
+        self._lock = threading.RLock()
+        self._reiniciar()
+        self.criadas = 0
+        self.descartadas = 0
+        self.emprestimos = 0
+        self.esgotado = 0
+        self.abandonadas = 0
+
+    def _reiniciar(self):
+        self._pid = os.getpid()
+        self._livres = []  # (conn, estado, devolvida_em)
+        self._vagas = threading.BoundedSemaphore(self.tamanho)
+        self.em_uso = 0
+
+    def _verificar_fork(self):
+        # Depois de um fork (gunicorn --preload) o socket das conexões herdadas é
+        # compartilhado com o processo pai: esquecê-las sem fechar
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._reiniciar()
+
+    def _abrir(self):
+        conn = self._conectar()
+        try:
+            conn.autocommit = True
+        except Exception:
+            conn.close()
+            raise
+        if self._preparar:
+            try:
+                self._preparar(conn)
+            except Exception as e:
+                # Sem as consultas preparadas a conexão continua utilizável
+                print(f"AVISO: falha ao preparar consultas: {e}", file=sys.stderr)
+        with self._lock:
+            self.criadas += 1
+        return conn, {}
+
+    def obter(self):
+        self._verificar_fork()
+        if not self._vagas.acquire(timeout=self.espera_s):
+            with self._lock:
+                self.esgotado += 1
+            raise PoolEsgotado(f"pool de conexões esgotado ({self.tamanho} em uso)")
+        try:
+            conn, estado = self._retirar_livre()
+            if conn is None:
+                conn, estado = self._abrir()
+        except BaseException:
+            self._vagas.release()
+            raise
+        with self._lock:
+            self.em_uso += 1
+            self.emprestimos += 1
+        return ConexaoDoPool(conn, estado, self)
+
+    def _retirar_livre(self):
+        agora = time.monotonic()
+        with self._lock:
+            # A mais recente é reutilizada primeiro; as do início são as mais ociosas
+            vencidas = []
+            while self._livres and agora - self._livres[0][2] > self.ocioso_max_s:
+                vencidas.append(self._livres.pop(0)[0])
+        for conn in vencidas:
+            self._fechar(conn)
+        while True:
+            with self._lock:
+                if not self._livres:
+                    return None, None
+                conn, estado, _ = self._livres.pop()
+            if conn.closed:
+                self._fechar(conn)
+                continue
+            return conn, estado
+
+    def _fechar(self, conn):
+        with self._lock:
+            self.descartadas += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _devolver(self, conn, estado, descartar=False):
+        if os.getpid() != self._pid:
+            return
+        try:
+            if not descartar and not conn.closed:
+                status = conn.info.transaction_status
+                if status == TRANSACTION_STATUS_UNKNOWN:
+                    descartar = True
+                elif status != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if not descartar and not conn.autocommit:
+                    conn.autocommit = True
+            if descartar or conn.closed:
+                self._fechar(conn)
+            else:
+                with self._lock:
+                    self._livres.append((conn, estado, time.monotonic()))
+        except Exception:
+            self._fechar(conn)
+        finally:
+            with self._lock:
+                self.em_uso -= 1
+            self._vagas.release()
+
+    def _devolver_abandonada(self, conn, estado):
+        # Chamado pelo coletor de lixo, em qualquer thread: a sessão pode ter ficado
+        # no meio de uma consulta, então a conexão é descartada em vez de reutilizada
+        with self._lock:
+            self.abandonadas += 1
+        self._devolver(conn, estado, descartar=True)
+
+    def aquecer(self, quantidade):
+        """Abrir até ``quantidade`` conexões agora (na inicialização do worker)"""
+        abertas = []
+        try:
+            for _ in range(min(quantidade, self.tamanho)):
+                abertas.append(self.obter())
+        finally:
+            for conn in abertas:
+                conn.close()
+        return len(abertas)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'tamanho': self.tamanho,
+                'em_uso': self.em_uso,
+                'livres': len(self._livres),
+                'criadas': self.criadas,
+                'descartadas': self.descartadas,
+                'emprestimos': self.emprestimos,
+                'esgotado': self.esgotado,
+                'abandonadas': self.abandonadas,
+            }
@@ -0,0 +1,384 @@
+"""Reconciliação entre o cadastro do ClickUp e os dados do Conta Azul.
+
+Encontra clientes em que ``clientes_clickup`` e ``clientes_turbo``/
+``a_receber_turbo`` discordam, sem juntar as tabelas dos dois lados:
+
+1. Cada lado vira uma linha canônica por cliente (chave = CNPJ só com dígitos),
+   gravada nas tabelas de trabalho ``reconciliacao_clickup`` e
+   ``reconciliacao_conta_azul`` (UNLOGGED, refeitas a cada execução). Os dois
+   lados são calculados em paralelo, cada um com uma varredura agregada.
+2. As chaves são distribuídas em ``FOLHAS`` faixas pelo hash da chave e cada
+   faixa ganha um hash do seu conteúdo (md5 das linhas em ordem), como as folhas
+   de uma árvore de Merkle.
+3. Só as faixas cujo hash mudou desde a execução anterior
+   (``reconciliacao_folhas``) são inspecionadas cliente a cliente, em blocos
+   processados por ``trabalhadores`` conexões em paralelo. Faixas em que os dois
+   lados têm o mesmo hash não têm divergências e nem são lidas.
+
+O relatório fica em ``reconciliacao_divergencias`` (uma linha por cliente e
+tipo, com a data em que foi detectada e a última execução que a confirmou):
+
+- ``cnpj_ausente``: cliente do Conta Azul (ou fatura de cliente sem cadastro)
+  ou registro do ClickUp sem CNPJ válido;
+- ``so_clickup`` / ``so_conta_azul``: CNPJ presente em um lado só;
+- ``cnpj_formato``: mesmos dígitos com formatação diferente (as consultas do
+  app juntam pelo texto, então o cliente aparece sem os dados do ClickUp);
+- ``nome_divergente``: mais de um nome em ``clientes_turbo`` para o mesmo CNPJ;
+- ``status_desatualizado``: ``status_clickup`` das faturas diferente do
+  ``status_conta`` atual no ClickUp.
+
+Rodar ao final de cada sync (``--completo`` reinspeciona todas as faixas)::
+
+    python -m src.reconciliacao [--trabalhadores 4] [--completo] [--relatorio]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+FOLHAS = 1024
+FOLHAS_POR_BLOCO = 32
+TRABALHADORES = int(os.getenv('RECONCILIACAO_TRABALHADORES', 4))
+
+TIPOS = ('cnpj_ausente', 'so_clickup', 'so_conta_azul', 'cnpj_formato', 'nome_divergente', 'status_desatualizado')
+
+DDL = """
+CREATE UNLOGGED TABLE IF NOT EXISTS reconciliacao_clickup (
+    chave TEXT PRIMARY KEY,
+    folha INTEGER NOT NULL,
+    cnpj TEXT,
+    status TEXT,
+    id_clickup INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reconciliacao_clickup_folha ON reconciliacao_clickup (folha);
+
+CREATE UNLOGGED TABLE IF NOT EXISTS reconciliacao_conta_azul (
+    chave TEXT PRIMARY KEY,
+    folha INTEGER NOT NULL,
+    cnpjs TEXT[],
+    nomes TEXT[] NOT NULL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reconciliacao_conta_azul_folha ON reconciliacao_conta_azul (folha);
+
+CREATE TABLE IF NOT EXISTS reconciliacao_folhas (
+    folha INTEGER PRIMARY KEY,
+    hash_clickup TEXT,
+    hash_conta_azul TEXT,
+    divergencias INTEGER NOT NULL DEFAULT 0,
+    verificado_em TIMESTAMPTZ NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reconciliacao_divergencias (
+    chave TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    folha INTEGER NOT NULL,
+    cnpj TEXT,
+    nome TEXT,
+    valor_clickup TEXT,
+    valor_conta_azul TEXT,
+    detectado_em TIMESTAMPTZ NOT NULL,
+    verificado_em TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (chave, tipo)
+);
+CREATE INDEX IF NOT EXISTS idx_reconciliacao_divergencias_folha ON reconciliacao_divergencias (folha);
+"""
+
+
+def _digitos(coluna):
+    return f"regexp_replace(COALESCE({coluna}, ''), '[^0-9]', '', 'g')"
+
+
+def _status(coluna):
+    # Mesmo critério da tela do cliente: só "ativo" é ativo
+    return f"CASE WHEN lower(trim({coluna})) = 'ativo' THEN 'ativo' WHEN {coluna} IS NOT NULL THEN 'inativo' END"
+
+
+def _folha(coluna):
+    return f"mod(hashtext({coluna})::bigint + 2147483648, {FOLHAS})::int"
+
+
+# Registro mais recente do ClickUp por CNPJ; sem CNPJ válido, cada registro é uma chave
+SQL_LINHAS_CLICKUP = f"""
+INSERT INTO reconciliacao_clickup (chave, folha, cnpj, status, id_clickup)
+SELECT chave, {_folha('chave')}, cnpj, {_status('status_conta')}, id
+FROM (
+    SELECT DISTINCT ON (chave) chave, cnpj, status_conta, id
+    FROM (
+        SELECT CASE WHEN length({_digitos('cnpj')}) = 14 THEN {_digitos('cnpj')} ELSE 'clickup:' || id END AS chave,
+               cnpj, status_conta, id
+        FROM clientes_clickup
+    ) ck
+    ORDER BY chave, id DESC
+) recentes
+"""
+
+# Clientes do Conta Azul por CNPJ, com o status_clickup das faturas. Faturas de
+# nomes sem cadastro em clientes_turbo entram com a chave "nome:<cliente_nome>".
+SQL_LINHAS_CONTA_AZUL = f"""
+INSERT INTO reconciliacao_conta_azul (chave, folha, cnpjs, nomes, status)
+SELECT chave, {_folha('chave')},
+       array_agg(DISTINCT cnpj ORDER BY cnpj) FILTER (WHERE cnpj IS NOT NULL),
+       array_agg(DISTINCT nome ORDER BY nome),
+       CASE WHEN COUNT(DISTINCT status) > 1 THEN 'misto' ELSE MAX(status) END
+FROM (
+    SELECT CASE WHEN length({_digitos('c.cnpj')}) = 14 THEN {_digitos('c.cnpj')}
+                ELSE 'nome:' || COALESCE(c.nome, f.cliente_nome) END AS chave,
+           c.cnpj, COALESCE(c.nome, f.cliente_nome) AS nome, f.status
+    FROM (SELECT DISTINCT nome, cnpj FROM clientes_turbo) c
+    FULL JOIN (
+        SELECT cliente_nome, {_status('status_clickup')} AS status
+        FROM a_receber_turbo
+        WHERE cliente_nome IS NOT NULL
+        GROUP BY 1, 2
+    ) f ON f.cliente_nome = c.nome
+) clientes
+GROUP BY chave
+"""
+
+# Conteúdo canônico de cada lado: iguais quando os dois lados concordam
+_LINHA = {
+    'clickup': "concat_ws('|', chave, status, cnpj)",
+    'conta_azul': ("concat_ws('|', chave, status, array_to_string(cnpjs, ','), "
+                   "CASE WHEN cardinality(nomes) > 1 THEN array_to_string(nomes, ';') END)"),
+}
+
+_TABELAS = {'clickup': 'reconciliacao_clickup', 'conta_azul': 'reconciliacao_conta_azul'}
+_SQL_LINHAS = {'clickup': SQL_LINHAS_CLICKUP, 'conta_azul': SQL_LINHAS_CONTA_AZUL}
+
+
+def calcular_lado(conectar, lado):
+    """Refazer as linhas canônicas de um lado; retorna {folha: hash}"""
+    conn = conectar()
+    try:
+        conn.autocommit = False
+        with conn.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {_TABELAS[lado]}")
+            cursor.execute(_SQL_LINHAS[lado])
+            conn.commit()
+            cursor.execute(f"ANALYZE {_TABELAS[lado]}")
+            cursor.execute(f"""
+            SELECT folha, md5(string_agg(md5({_LINHA[lado]}), '' ORDER BY chave))
+            FROM {_TABELAS[lado]}
+            GROUP BY folha
+            """)
+            hashes = dict(cursor.fetchall())
+        conn.commit()
+        return hashes
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def comparar(chave, clickup, conta_azul):
+    """Divergências de um cliente: lista de (tipo, valor_clickup, valor_conta_azul)"""
+    if chave.startswith('clickup:'):
+        return [('cnpj_ausente', clickup['cnpj'], None)]
+    if chave.startswith('nome:'):
+        return [('cnpj_ausente', None, ', '.join(conta_azul['cnpjs'] or []) or None)]
+    if conta_azul is None:
+        return [('so_clickup', clickup['cnpj'], None)]
+    if clickup is None:
+        return [('so_conta_azul', None, ', '.join(conta_azul['cnpjs']))]
+
+    divergencias = []
+    if clickup['cnpj'] not in conta_azul['cnpjs']:
+        divergencias.append(('cnpj_formato', clickup['cnpj'], ', '.join(conta_azul['cnpjs'])))
+    if len(conta_azul['nomes']) > 1:
+        divergencias.append(('nome_divergente', None, '; '.join(conta_azul['nomes'])))
+    # Cliente sem faturas (ou sem status no ClickUp) não tem o que comparar
+    if clickup['status'] and conta_azul['status'] and clickup['status'] != conta_azul['status']:
+        divergencias.append(('status_desatualizado', clickup['status'], conta_azul['status']))
+    return divergencias
+
+
+def _registrar_folhas(cursor, folhas, hashes, divergencias_por_folha, agora):
+    from psycopg2.extras import execute_values
+
+    # Divergências que esta execução não confirmou foram resolvidas
+    cursor.execute(
+        "DELETE FROM reconciliacao_divergencias WHERE folha = ANY(%s) AND verificado_em < %s",
+        (list(folhas), agora)
+    )
+    execute_values(cursor, """
+    INSERT INTO reconciliacao_folhas (folha, hash_clickup, hash_conta_azul, divergencias, verificado_em)
+    VALUES %s
+    ON CONFLICT (folha) DO UPDATE SET
+        hash_clickup = EXCLUDED.hash_clickup,
+        hash_conta_azul = EXCLUDED.hash_conta_azul,
+        divergencias = EXCLUDED.divergencias,
+        verificado_em = EXCLUDED.verificado_em
+    """, [(f, *hashes[f], divergencias_por_folha.get(f, 0), agora) for f in folhas])
+
+
+def inspecionar_bloco(conectar, folhas, hashes, agora):
+    """Comparar cliente a cliente as faixas do bloco; retorna (clientes, divergências)"""
+    from psycopg2.extras import RealDictCursor, execute_values
+
+    conn = conectar()
+    try:
+        conn.autocommit = False
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            lados = {}
+            for lado, tabela in _TABELAS.items():
+                cursor.execute(f"SELECT * FROM {tabela} WHERE folha = ANY(%s)", (list(folhas),))
+                lados[lado] = {row['chave']: row for row in cursor.fetchall()}
+
+            chaves = lados['clickup'].keys() | lados['conta_azul'].keys()
+            linhas = []
+            por_folha = {}
+            for chave in chaves:
+                clickup, conta_azul = lados['clickup'].get(chave), lados['conta_azul'].get(chave)
+                folha = (clickup or conta_azul)['folha']
+                cnpj = None if ':' in chave else chave
+                nome = conta_azul['nomes'][0] if conta_azul else None
+                for tipo, valor_clickup, valor_conta_azul in comparar(chave, clickup, conta_azul):
+                    linhas.append((chave, tipo, folha, cnpj, nome, valor_clickup, valor_conta_azul, agora, agora))
+                    por_folha[folha] = por_folha.get(folha, 0) + 1
+
+            if linhas:
+                execute_values(cursor, """
+                INSERT INTO reconciliacao_divergencias
+                    (chave, tipo, folha, cnpj, nome, valor_clickup, valor_conta_azul, detectado_em, verificado_em)
+                VALUES %s
+                ON CONFLICT (chave, tipo) DO UPDATE SET
+                    folha = EXCLUDED.folha,
+                    cnpj = EXCLUDED.cnpj,
+                    nome = EXCLUDED.nome,
+                    valor_clickup = EXCLUDED.valor_clickup,
+                    valor_conta_azul = EXCLUDED.valor_conta_azul,
+                    verificado_em = EXCLUDED.verificado_em
+                """, linhas)
+            _registrar_folhas(cursor, folhas, hashes, por_folha, agora)
+        conn.commit()
+        return len(chaves), len(linhas)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def reconciliar(conectar, trabalhadores=TRABALHADORES, completo=False):
+    """Executar a reconciliação; retorna um resumo da execução.
+
+    ``conectar()`` deve abrir uma conexão nova com o primário (uma por trabalhador).
+    """
+    inicio = time.monotonic()
+    conn = conectar()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            # Uma execução por vez: as tabelas de trabalho são compartilhadas
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext('reconciliacao'))")
+            if not cursor.fetchone()[0]:
+                raise RuntimeError("Outra reconciliação já está em andamento")
+            cursor.execute(DDL)
+            cursor.execute("SELECT now()")
+            agora = cursor.fetchone()[0]
+
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futuros = {lado: executor.submit(calcular_lado, conectar, lado) for lado in _TABELAS}
+                novos = {lado: futuro.result() for lado, futuro in futuros.items()}
+            hashes = {f: (novos['clickup'].get(f), novos['conta_azul'].get(f)) for f in range(FOLHAS)}
+
+            cursor.execute("SELECT folha, hash_clickup, hash_conta_azul FROM reconciliacao_folhas")
+            anteriores = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+            alteradas = [f for f in range(FOLHAS) if completo or hashes[f] != anteriores.get(f, (None, None))]
+            iguais = [f for f in alteradas if hashes[f][0] == hashes[f][1]]
+            inspecionar = [f for f in alteradas if hashes[f][0] != hashes[f][1]]
+
+            if iguais:
+                conn.autocommit = False
+                _registrar_folhas(cursor, iguais, hashes, {}, agora)
+                conn.commit()
+                conn.autocommit = True
+
+            blocos = [inspecionar[i:i + FOLHAS_POR_BLOCO] for i in range(0, len(inspecionar), FOLHAS_POR_BLOCO)]
+            clientes = divergencias = 0
+            with ThreadPoolExecutor(max_workers=max(1, trabalhadores)) as executor:
+                futuros = [executor.submit(inspecionar_bloco, conectar, bloco, hashes, agora) for bloco in blocos]
+                for n, futuro in enumerate(futuros, 1):
+                    qtd_clientes, qtd_divergencias = futuro.result()
+                    clientes += qtd_clientes
+                    divergencias += qtd_divergencias
+                    if n % 8 == 0:
+                        print(f"  {n}/{len(blocos)} blocos inspecionados", file=sys.stderr)
+
+            cursor.execute("SELECT COUNT(*) FROM reconciliacao_divergencias")
+            total = cursor.fetchone()[0]
+            cursor.execute("SELECT pg_advisory_unlock(hashtext('reconciliacao'))")
+    finally:
+        conn.close()
+
+    return {
+        'folhas_alteradas': len(alteradas),
+        'folhas_inspecionadas': len(inspecionar),
+        'clientes_comparados': clientes,
+        'divergencias_encontradas': divergencias,
+        'divergencias_total': total,
+        'duracao_s': round(time.monotonic() - inicio, 2),
+    }
+
+
+def resumo(cursor, limite=20):
+    """Quantidade por tipo e as divergências mais antigas ainda abertas"""
+    cursor.execute("""
+    SELECT tipo, COUNT(*) FROM reconciliacao_divergencias GROUP BY tipo ORDER BY COUNT(*) DESC
+    """)
+    por_tipo = cursor.fetchall()
+    cursor.execute("""
+    SELECT tipo, COALESCE(nome, chave), valor_clickup, valor_conta_azul, detectado_em
+    FROM reconciliacao_divergencias
+    ORDER BY detectado_em, chave
+    LIMIT %s
+    """, (limite,))
+    return por_tipo, cursor.fetchall()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import psycopg2
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Reconciliar ClickUp e Conta Azul")
+    parser.add_argument('--trabalhadores', type=int, default=TRABALHADORES,
+                        help="Conexões em paralelo na inspeção das faixas alteradas")
+    parser.add_argument('--completo', action='store_true', help="Reinspecionar todas as faixas")
+    parser.add_argument('--relatorio', action='store_true', help="Mostrar o resumo das divergências ao final")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.environ.get('DATABASE_URL', '')
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+
+    def conectar():
+        return psycopg2.connect(database_url) if database_url else psycopg2.connect(
+            host=os.getenv("PG_HOST"),
+            dbname=os.getenv("PG_DBNAME"),
+            user=os.getenv("PG_USER"),
+            password=os.getenv("PG_PASSWORD"),
+            port=os.getenv("PG_PORT")
+        )
+
+    resultado = reconciliar(conectar, trabalhadores=args.trabalhadores, completo=args.completo)
+    print(f"Reconciliação: {resultado['folhas_inspecionadas']}/{resultado['folhas_alteradas']} faixas alteradas "
+          f"inspecionadas, {resultado['clientes_comparados']:,} clientes comparados, "
+          f"{resultado['divergencias_total']:,} divergências abertas ({resultado['duracao_s']}s)")
+
+    if args.relatorio:
+        conexao_pg = conectar()
+        try:
+            with conexao_pg.cursor() as cursor:
+                por_tipo, antigas = resumo(cursor)
+        finally:
+            conexao_pg.close()
+        for tipo, quantidade in por_tipo:
+            print(f"  {tipo:>22}: {quantidade:,}")
+        for tipo, cliente, valor_clickup, valor_conta_azul, detectado_em in antigas:
+            print(f"  [{tipo}] {cliente}: ClickUp={valor_clickup or '-'} Conta Azul={valor_conta_azul or '-'} "
+                  f"(desde {detectado_em:%d/%m/%Y})")
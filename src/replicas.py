@@ -0,0 +1,147 @@
+"""Roteamento de leituras para réplicas do Postgres, com controle de atraso.
+
+As consultas de busca são somente leitura e disputam o primário com as
+escritas dos jobs de sincronização. Quando ``DATABASE_REPLICA_URLS`` (DSNs
+separados por vírgula) está definido, ``conectar`` devolve uma conexão com uma
+réplica saudável, em rodízio; escritas e leituras sensíveis a atraso continuam
+usando o primário (``get_db_connection()`` sem ``replica=True``).
+
+O atraso de cada réplica é medido na própria conexão aberta para a consulta, no
+máximo a cada ``REPLICA_VERIFICAR_S`` segundos. Réplicas com atraso acima de
+``REPLICA_MAX_LAG_S`` ou que falham ao conectar ficam fora do rodízio até a
+próxima verificação. Sem réplica disponível, ``conectar`` retorna None e o
+chamador usa o primário.
+
+Cada réplica tem um ``PoolConexoes`` (``src/pool.py``) no worker: ``conectar``
+empresta uma conexão e o ``close()`` do chamador a devolve. Uma réplica com o
+pool esgotado é pulada (sem sair do rodízio) e a leitura tenta a próxima.
+
+Teste local com duas instâncias: aponte ``DATABASE_URL`` para o primário e
+``DATABASE_REPLICA_URLS`` para a réplica (streaming replication). Na réplica,
+``SELECT pg_wal_replay_pause();`` faz o atraso crescer enquanto o primário recebe
+escritas, e ``pg_wal_replay_resume()`` a devolve ao rodízio.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+
+from src.pool import PoolConexoes, PoolEsgotado
+
+# Atraso: zero se tudo que foi recebido já foi aplicado (primário ocioso não gera
+# atraso falso); senão, tempo desde a última transação reaplicada.
+SQL_ATRASO = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class Replica:
+    def __init__(self, dsn, nome, pool):
+        self.dsn = dsn
+        self.nome = nome
+        self.pool = pool
+        self.atraso = None
+        self.saudavel = True
+        self.erro = None
+        self.verificado_em = 0.0
+
+    def estado(self):
+        return {
+            'nome': self.nome,
+            'saudavel': self.saudavel,
+            'atraso_s': None if self.atraso is None else round(self.atraso, 3),
+            'erro': self.erro,
+            'verificado_ha_s': round(time.monotonic() - self.verificado_em, 1) if self.verificado_em else None,
+            'pool': self.pool.estatisticas(),
+        }
+
+
+class RoteadorReplicas:
+    """``conectar(dsn)`` abre uma conexão nova; ``pool`` são os argumentos de cada ``PoolConexoes``"""
+
+    def __init__(self, dsns, conectar, max_atraso=30.0, intervalo=10.0, **pool):
+        self.replicas = [
+            Replica(dsn, f"replica-{i}", PoolConexoes(lambda dsn=dsn: conectar(dsn), **pool))
+            for i, dsn in enumerate(dsns, 1)
+        ]
+        self.max_atraso = max_atraso
+        self.intervalo = intervalo
+        self._rodizio = itertools.count()
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def _verificacao_vencida(self, replica):
+        return time.monotonic() - replica.verificado_em >= self.intervalo
+
+    def _registrar(self, replica, atraso=None, erro=None):
+        with self._lock:
+            replica.verificado_em = time.monotonic()
+            replica.atraso = atraso
+            replica.erro = erro
+            saudavel = erro is None and atraso is not None and atraso <= self.max_atraso
+            if replica.saudavel and not saudavel:
+                motivo = erro or f"atraso de {atraso:.1f}s"
+                print(f"AVISO: {replica.nome} removida do rodízio ({motivo})", file=sys.stderr)
+            elif not replica.saudavel and saudavel:
+                print(f"INFO: {replica.nome} de volta ao rodízio (atraso de {atraso:.1f}s)", file=sys.stderr)
+            replica.saudavel = saudavel
+
+    def conectar(self):
+        """Conexão com uma réplica saudável, ou None para usar o primário"""
+        if not self.replicas:
+            return None
+
+        inicio = next(self._rodizio)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(inicio + i) % len(self.replicas)]
+            verificar = self._verificacao_vencida(replica)
+            if not replica.saudavel and not verificar:
+                continue
+
+            try:
+                conn = replica.pool.obter()
+            except PoolEsgotado:
+                continue
+            except Exception as e:
+                self._registrar(replica, erro=str(e).strip() or e.__class__.__name__)
+                continue
+
+            if verificar:
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute(SQL_ATRASO)
+                        atraso = float(cursor.fetchone()[0])
+                except Exception as e:
+                    conn.descartar()
+                    self._registrar(replica, erro=str(e).strip() or e.__class__.__name__)
+                    continue
+                self._registrar(replica, atraso=atraso)
+                if not replica.saudavel:
+                    conn.close()
+                    continue
+
+            return conn
+        return None
+
+    def estado(self):
+        return [replica.estado() for replica in self.replicas]
+
+
+def dsns_configurados():
+    """DSNs de réplica definidos em DATABASE_REPLICA_URLS"""
+    dsns = []
+    for dsn in os.getenv('DATABASE_REPLICA_URLS', '').split(','):
+        dsn = dsn.strip()
+        if not dsn:
+            continue
+        if dsn.startswith('postgres://'):
+            dsn = dsn.replace('postgres://', 'postgresql://', 1)
+        dsns.append(dsn)
+    return dsns
@@ -0,0 +1,250 @@
+"""Coalescência de consultas idênticas concorrentes ("single-flight").
+
+Quando vários atendentes consultam o mesmo CNPJ ao mesmo tempo, só a primeira
+requisição executa as consultas no banco; as demais esperam e recebem o mesmo
+resultado. O resultado é compartilhado entre as requisições, então quem o
+recebe não deve alterá-lo (as rotas copiam as linhas com ``dict(row)``).
+
+``SingleFlight`` coalesce dentro do worker (threads). ``SingleFlightPostgres``
+estende isso entre workers/instâncias: o líder segura um advisory lock
+derivado da chave e grava o resultado numa tabela UNLOGGED; quem estava
+esperando o lock lê o resultado em vez de repetir as consultas. O resultado é
+gravado em JSON (``Decimal``, ``date`` e ``datetime`` preservados), nunca em
+pickle: a tabela é compartilhada e não deve poder executar código ao ser lida.
+
+A coordenação usa conexões próprias (``conectar``), separadas das que executam
+a consulta: o líder segura o advisory lock durante toda a execução.
+"""
+import datetime
+import decimal
+import hashlib
+import json
+import sys
+import threading
+
+from src.consultas import BancoIndisponivel
+
+DDL = """
+CREATE UNLOGGED TABLE IF NOT EXISTS singleflight_resultados (
+    chave TEXT PRIMARY KEY,
+    resultado BYTEA NOT NULL,
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+
+class LiderInterrompido(BancoIndisponivel):
+    """A execução do líder foi interrompida (ex.: timeout do worker) sem resultado"""
+
+
+def _codificar(valor):
+    if isinstance(valor, decimal.Decimal):
+        return {'__decimal__': str(valor)}
+    if isinstance(valor, datetime.datetime):
+        return {'__datetime__': valor.isoformat()}
+    if isinstance(valor, datetime.date):
+        return {'__date__': valor.isoformat()}
+    return str(valor)
+
+
+def _decodificar(objeto):
+    if len(objeto) == 1:
+        if '__decimal__' in objeto:
+            return decimal.Decimal(objeto['__decimal__'])
+        if '__datetime__' in objeto:
+            return datetime.datetime.fromisoformat(objeto['__datetime__'])
+        if '__date__' in objeto:
+            return datetime.date.fromisoformat(objeto['__date__'])
+    return objeto
+
+
+def serializar(resultado):
+    return json.dumps(resultado, default=_codificar, ensure_ascii=False).encode('utf-8')
+
+
+def desserializar(dados):
+    return json.loads(bytes(dados).decode('utf-8'), object_hook=_decodificar)
+
+
+class _Chamada:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.aguardando = 0
+
+
+class SingleFlight:
+    """Coalescência dentro do processo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self.execucoes = 0
+        self.compartilhadas = 0
+        self.erros = 0
+
+    def executar(self, chave, funcao):
+        with self._lock:
+            chamada = self._em_andamento.get(chave)
+            if chamada is not None:
+                chamada.aguardando += 1
+                self.compartilhadas += 1
+                lider = False
+            else:
+                chamada = _Chamada()
+                self._em_andamento[chave] = chamada
+                self.execucoes += 1
+                lider = True
+
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao()
+            return chamada.resultado
+        except BaseException as e:
+            # Interrupções (SystemExit, timeout do worker) também liberam quem
+            # espera com um erro, e não com um resultado None
+            chamada.erro = e if isinstance(e, Exception) else LiderInterrompido(repr(e))
+            with self._lock:
+                self.erros += 1
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            chamada.evento.set()
+
+    def estatisticas(self):
+        with self._lock:
+            em_andamento = len(self._em_andamento)
+        return {
+            'execucoes': self.execucoes,
+            'execucoes_economizadas': self.compartilhadas,
+            'erros': self.erros,
+            'em_andamento': em_andamento,
+        }
+
+
+def _chave_lock(chave):
+    """Converter a chave num bigint para pg_advisory_lock"""
+    digest = hashlib.blake2b(repr(chave).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class SingleFlightPostgres:
+    """Coalescência entre workers usando advisory locks do Postgres.
+
+    ``conectar`` deve devolver uma conexão com o primário em autocommit (ou
+    None), de preferência de um pool só para a coordenação: ela fica ocupada
+    enquanto ``funcao`` usa outra conexão. ``validade_s`` é por quanto tempo um resultado gravado pelo líder
+    pode ser reaproveitado por quem chegou enquanto ele executava.
+    """
+
+    def __init__(self, conectar, validade_s=2.0, espera_max_s=15.0):
+        self._conectar = conectar
+        self.validade_s = validade_s
+        self.espera_max_s = espera_max_s
+        self._tabela_criada = False
+        self._lock = threading.Lock()
+        self.execucoes = 0
+        self.compartilhadas = 0
+        self.falhas = 0
+
+    def _contar(self, campo):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def _garantir_tabela(self, cursor):
+        if not self._tabela_criada:
+            cursor.execute(DDL)
+            self._tabela_criada = True
+
+    def executar(self, chave, funcao):
+        try:
+            conn = self._conectar()
+        except Exception:
+            conn = None
+        if conn is None:
+            self._contar('falhas')
+            return funcao()
+
+        chave_texto = repr(chave)
+        chave_lock = _chave_lock(chave)
+        lider = False
+        try:
+            try:
+                with conn.cursor() as cursor:
+                    self._garantir_tabela(cursor)
+                    cursor.execute("SELECT pg_try_advisory_lock(%s)", (chave_lock,))
+                    lider = cursor.fetchone()[0]
+                    if not lider:
+                        resultado = self._aguardar_lider(cursor, chave_texto, chave_lock)
+                        if resultado is not None:
+                            self._contar('compartilhadas')
+                            return resultado
+            except Exception as e:
+                # Falha na coordenação (lock_timeout, tabela, conexão): executar normalmente
+                print(f"AVISO: single-flight entre workers indisponível: {e}", file=sys.stderr)
+                self._contar('falhas')
+
+            if lider:
+                return self._executar_como_lider(conn, chave_texto, chave_lock, funcao)
+        finally:
+            conn.close()
+
+        self._contar('execucoes')
+        return funcao()
+
+    def _aguardar_lider(self, cursor, chave_texto, chave_lock):
+        """Esperar o worker líder liberar o lock e ler o resultado que ele gravou"""
+        # A conexão volta ao pool: o lock_timeout não pode ficar na sessão
+        cursor.execute("SET lock_timeout = %s", (f"{int(self.espera_max_s * 1000)}ms",))
+        try:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (chave_lock,))
+        finally:
+            cursor.execute("RESET lock_timeout")
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (chave_lock,))
+        cursor.execute("""
+        SELECT resultado FROM singleflight_resultados
+        WHERE chave = %s AND criado_em > now() - make_interval(secs => %s)
+        """, (chave_texto, self.validade_s))
+        row = cursor.fetchone()
+        return None if row is None else desserializar(row[0])
+
+    def _executar_como_lider(self, conn, chave_texto, chave_lock, funcao):
+        self._contar('execucoes')
+        try:
+            resultado = funcao()
+            if resultado is not None:
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute("""
+                        INSERT INTO singleflight_resultados (chave, resultado, criado_em)
+                        VALUES (%s, %s, now())
+                        ON CONFLICT (chave) DO UPDATE SET resultado = EXCLUDED.resultado, criado_em = EXCLUDED.criado_em
+                        """, (chave_texto, serializar(resultado)))
+                        cursor.execute("DELETE FROM singleflight_resultados WHERE criado_em < now() - interval '5 minutes'")
+                except Exception as e:
+                    print(f"AVISO: não foi possível compartilhar o resultado do single-flight: {e}", file=sys.stderr)
+            return resultado
+        finally:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (chave_lock,))
+            except Exception as e:
+                # Não trocar o resultado (ou a exceção) da função por esta falha. A
+                # sessão pode continuar com o lock: fechá-la de verdade o libera
+                print(f"AVISO: falha ao liberar o lock do single-flight: {e}", file=sys.stderr)
+                self._contar('falhas')
+                getattr(conn, 'descartar', conn.close)()
+
+    def estatisticas(self):
+        return {
+            'execucoes': self.execucoes,
+            'execucoes_economizadas': self.compartilhadas,
+            'falhas_coordenacao': self.falhas,
+        }
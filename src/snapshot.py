@@ -0,0 +1,559 @@
+"""Snapshot local (SQLite) somente leitura para as consultas de busca e do chat.
+
+Quase todo o tráfego são consultas de leitura sobre dados que só mudam quando
+uma sincronização roda. Depois de cada sync, ``exportar`` copia os dados de
+clientes, faturas e ClickUp para um arquivo SQLite indexado; os workers abrem
+esse arquivo em modo imutável com mmap e respondem sem ir à rede.
+
+Publicação atômica: cada exportação gera um arquivo novo
+(``snapshot-<timestamp>.sqlite``) e só depois troca o ponteiro ``atual.json``
+via ``os.replace``. Os workers verificam o ponteiro periodicamente e passam a
+usar a versão nova na próxima consulta; quem já estava lendo a versão antiga
+termina normalmente.
+
+Desativada por padrão: defina ``SNAPSHOT_DIR`` para ativar. Quando a snapshot
+não existe, está mais velha que ``SNAPSHOT_MAX_IDADE`` segundos ou dá erro, as
+funções retornam ``NAO_DISPONIVEL`` e as rotas consultam o Postgres normalmente.
+
+Exportar (ao final de cada sync):
+    python -m src.snapshot [diretorio]
+"""
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from src.consultas import ARQUIVO_RECEBIVEIS, SQL_CLICKUP_RECENTE
+
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR')
+SNAPSHOT_MAX_IDADE = int(os.getenv('SNAPSHOT_MAX_IDADE', 6 * 3600))
+# Intervalo mínimo entre verificações do ponteiro atual.json
+SNAPSHOT_VERIFICAR_S = float(os.getenv('SNAPSHOT_VERIFICAR_S', 2))
+SNAPSHOT_MMAP_BYTES = int(os.getenv('SNAPSHOT_MMAP_BYTES', 512 * 1024 * 1024))
+# Quantas versões antigas manter no diretório após exportar
+SNAPSHOT_MANTER = 2
+
+PONTEIRO = 'atual.json'
+
+# Valores monetários são guardados em centavos (INTEGER) para somas exatas
+COLUNAS_MONETARIAS = {
+    'total', 'nao_pago', 'pago', 'ltv_total', 'valor_inadimplente_total',
+    'total_geral', 'total_pago', 'total_pendente',
+}
+CENTAVO = Decimal('0.01')
+COLUNAS_DATA = {'data_vencimento'}
+COLUNAS_DATA_HORA = {'data_criacao', 'data_alteracao'}
+COLUNAS_BOOLEANAS = {'tem_pendencias'}
+
+DDL = """
+CREATE TABLE meta (chave TEXT PRIMARY KEY, valor TEXT);
+
+CREATE TABLE clientes (
+    nome TEXT, cnpj TEXT, telefone TEXT, email TEXT
+);
+
+CREATE TABLE clickup (
+    cnpj TEXT PRIMARY KEY, responsavel TEXT, segmento TEXT, cluster TEXT,
+    status_conta TEXT, atividade TEXT, telefone TEXT
+);
+
+CREATE TABLE faturas (
+    id INTEGER PRIMARY KEY, status TEXT, total INTEGER, descricao TEXT,
+    data_vencimento TEXT, nao_pago INTEGER, pago INTEGER,
+    data_criacao TEXT, data_alteracao TEXT, cliente_id TEXT, cliente_nome TEXT,
+    link_pagamento TEXT, status_clickup TEXT,
+    -- cliente_nome.casefold(): o LIKE do SQLite só ignora maiúsculas em ASCII
+    cliente_nome_busca TEXT
+);
+
+-- Totais das faturas arquivadas no Postgres (vazia sem ARQUIVO_RECEBIVEIS)
+CREATE TABLE faturas_arquivadas (
+    cliente_nome TEXT PRIMARY KEY, qtd_faturas INTEGER, total INTEGER, pago INTEGER
+);
+"""
+
+INDICES = """
+CREATE INDEX idx_clientes_cnpj ON clientes (cnpj);
+CREATE INDEX idx_clientes_nome ON clientes (nome);
+CREATE INDEX idx_faturas_cliente ON faturas (cliente_nome, data_vencimento);
+CREATE INDEX idx_faturas_abertas ON faturas (data_vencimento, cliente_nome) WHERE nao_pago > 0;
+"""
+
+# LTV e status calculados na consulta a partir da data de hoje (:hoje), já que
+# a snapshot pode ter sido gerada em outro dia. Faturas arquivadas são pagas.
+SQL_LTV = """
+    SELECT cliente_nome,
+           SUM(total_pago) AS total_pago,
+           SUM(total_faturas) AS total_faturas,
+           SUM(valor_inadimplente_total) AS valor_inadimplente_total
+    FROM (
+        SELECT cliente_nome,
+               SUM(pago) AS total_pago,
+               COUNT(*) AS total_faturas,
+               SUM(CASE WHEN nao_pago > 0 AND data_vencimento < :hoje THEN nao_pago ELSE 0 END) AS valor_inadimplente_total
+        FROM faturas
+        WHERE cliente_nome IN ({filtro})
+        GROUP BY cliente_nome
+        UNION ALL
+        SELECT cliente_nome, pago, qtd_faturas, 0
+        FROM faturas_arquivadas
+        WHERE cliente_nome IN ({filtro})
+    )
+    GROUP BY cliente_nome
+"""
+
+SQL_CLIENTE_CNPJ = """
+SELECT c.nome, c.cnpj,
+       COUNT(a.id) + IFNULL(arq.qtd_faturas, 0) AS total_faturas,
+       CASE WHEN arq.cliente_nome IS NULL THEN SUM(a.total) ELSE IFNULL(SUM(a.total), 0) + arq.total END AS total_geral,
+       CASE WHEN arq.cliente_nome IS NULL THEN SUM(a.pago) ELSE IFNULL(SUM(a.pago), 0) + arq.pago END AS total_pago,
+       SUM(a.nao_pago) AS total_pendente,
+       COUNT(CASE WHEN a.nao_pago > 0 AND a.data_vencimento <= :hoje THEN 1 END) AS faturas_vencidas
+FROM clientes c
+LEFT JOIN faturas a ON c.nome = a.cliente_nome
+LEFT JOIN faturas_arquivadas arq ON c.nome = arq.cliente_nome
+WHERE c.cnpj = :cnpj
+GROUP BY c.nome, c.cnpj
+"""
+
+SQL_HISTORICO_CNPJ = f"""
+SELECT a.id, a.status, a.total, a.descricao, a.data_vencimento,
+       a.nao_pago, a.pago, a.data_criacao, a.data_alteracao,
+       a.cliente_id, a.cliente_nome, a.link_pagamento,
+       a.status_clickup,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone AS telefone_clickup,
+       ltv.total_pago AS ltv_total,
+       ltv.total_faturas,
+       ltv.valor_inadimplente_total,
+       CASE
+           WHEN a.nao_pago = 0 THEN 'pago'
+           WHEN a.nao_pago > 0 AND a.data_vencimento < :hoje THEN 'vencido'
+           WHEN a.nao_pago > 0 AND a.data_vencimento = :hoje THEN 'vence_hoje'
+           WHEN a.nao_pago > 0 AND a.data_vencimento > :hoje THEN 'futuro'
+           ELSE 'indefinido'
+       END AS status_cobranca,
+       CASE
+           WHEN a.nao_pago > 0 AND a.data_vencimento < :hoje THEN 1
+           WHEN a.nao_pago > 0 AND a.data_vencimento = :hoje THEN 2
+           WHEN a.nao_pago > 0 AND a.data_vencimento > :hoje THEN 3
+           WHEN a.nao_pago = 0 THEN 4
+           ELSE 5
+       END AS ordem_prioridade
+FROM faturas a
+JOIN clientes c ON a.cliente_nome = c.nome
+LEFT JOIN clickup ck ON c.cnpj = ck.cnpj
+LEFT JOIN ({SQL_LTV.format(filtro="SELECT nome FROM clientes WHERE cnpj = :cnpj")}) ltv
+       ON a.cliente_nome = ltv.cliente_nome
+WHERE c.cnpj = :cnpj
+ORDER BY ordem_prioridade, a.data_vencimento DESC
+"""
+
+SQL_CLICKUP_CNPJ = f"""
+SELECT DISTINCT ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone AS telefone_clickup,
+       ltv.total_pago AS ltv_total,
+       ltv.total_faturas,
+       ltv.valor_inadimplente_total
+FROM clientes c
+LEFT JOIN clickup ck ON c.cnpj = ck.cnpj
+LEFT JOIN ({SQL_LTV.format(filtro="SELECT nome FROM clientes WHERE cnpj = :cnpj")}) ltv
+       ON c.nome = ltv.cliente_nome
+WHERE c.cnpj = :cnpj
+"""
+
+SQL_VENCIDAS_NOME = f"""
+SELECT a.id, a.status, a.total, a.descricao, a.data_vencimento,
+       a.nao_pago, a.pago, a.data_criacao, a.data_alteracao,
+       a.cliente_id, a.cliente_nome, a.link_pagamento,
+       a.status_clickup,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone AS telefone_clickup,
+       ltv.total_pago AS ltv_total,
+       ltv.total_faturas,
+       ltv.valor_inadimplente_total
+FROM faturas a
+LEFT JOIN clientes c ON a.cliente_nome = c.nome
+LEFT JOIN clickup ck ON c.cnpj = ck.cnpj
+LEFT JOIN ({SQL_LTV.format(filtro="SELECT DISTINCT cliente_nome FROM faturas WHERE cliente_nome_busca LIKE :nome")}) ltv
+       ON a.cliente_nome = ltv.cliente_nome
+WHERE a.cliente_nome_busca LIKE :nome
+  AND a.nao_pago > 0
+  AND a.data_vencimento <= :hoje
+ORDER BY a.data_vencimento DESC
+"""
+
+SQL_TOP_PENDENCIAS = """
+WITH pendentes AS (
+    SELECT cliente_nome, SUM(nao_pago) AS total_pendente
+    FROM faturas
+    WHERE nao_pago > 0 AND data_vencimento <= :hoje
+    GROUP BY cliente_nome
+)
+SELECT DISTINCT c.nome, c.cnpj,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone AS telefone_clickup,
+       ltv.total_pago AS ltv_total,
+       ltv.total_faturas,
+       ltv.valor_inadimplente_total,
+       1 AS tem_pendencias,
+       p.total_pendente
+FROM pendentes p
+JOIN clientes c ON c.nome = p.cliente_nome
+LEFT JOIN clickup ck ON c.cnpj = ck.cnpj
+LEFT JOIN (
+    SELECT cliente_nome,
+           SUM(total_pago) AS total_pago,
+           SUM(total_faturas) AS total_faturas,
+           SUM(valor_inadimplente_total) AS valor_inadimplente_total
+    FROM (
+        SELECT cliente_nome,
+               SUM(pago) AS total_pago,
+               COUNT(*) AS total_faturas,
+               SUM(CASE WHEN nao_pago > 0 AND data_vencimento < :hoje THEN nao_pago ELSE 0 END) AS valor_inadimplente_total
+        FROM faturas
+        WHERE cliente_nome IN (SELECT cliente_nome FROM pendentes)
+        GROUP BY cliente_nome
+        UNION ALL
+        SELECT cliente_nome, pago, qtd_faturas, 0
+        FROM faturas_arquivadas
+        WHERE cliente_nome IN (SELECT cliente_nome FROM pendentes)
+    )
+    GROUP BY cliente_nome
+) ltv ON c.nome = ltv.cliente_nome
+ORDER BY p.total_pendente DESC
+LIMIT :limite
+"""
+
+SQL_LISTAR_CLIENTES = """
+SELECT DISTINCT c.nome, c.cnpj,
+       ck.responsavel, ck.segmento, ck.cluster, ck.status_conta,
+       ck.atividade, ck.telefone AS telefone_clickup,
+       a.status_clickup,
+       COUNT(CASE WHEN a.nao_pago > 0 AND a.data_vencimento <= :hoje THEN 1 END) > 0 AS tem_pendencias
+FROM clientes c
+LEFT JOIN clickup ck ON c.cnpj = ck.cnpj
+LEFT JOIN faturas a ON c.nome = a.cliente_nome
+GROUP BY c.nome, c.cnpj, ck.responsavel, ck.segmento, ck.cluster, ck.status_conta, ck.atividade, ck.telefone, a.status_clickup
+ORDER BY c.nome
+"""
+
+# Retornado pelas consultas quando a snapshot não pode responder (ausente,
+# desatualizada ou com erro); None é um resultado válido (cliente inexistente)
+NAO_DISPONIVEL = object()
+
+_local = threading.local()
+_lock_ponteiro = threading.Lock()
+_ponteiro = {'verificado_em': 0.0, 'mtime': None, 'dados': None}
+
+
+# ---------------------------------------------------------------------------
+# Exportação
+# ---------------------------------------------------------------------------
+
+def _centavos(valor):
+    return None if valor is None else int(round(Decimal(valor) * 100))
+
+
+def _texto(valor):
+    return None if valor is None else str(valor)
+
+
+def exportar(conn, diretorio=None):
+    """Exportar os dados do Postgres para uma nova snapshot e publicá-la.
+
+    ``conn`` é uma conexão psycopg2 (de preferência com o banco recém
+    sincronizado). Retorna o caminho do arquivo publicado.
+    """
+    diretorio = diretorio or SNAPSHOT_DIR
+    if not diretorio:
+        raise ValueError("SNAPSHOT_DIR não definido")
+    os.makedirs(diretorio, exist_ok=True)
+
+    gerado_em = datetime.now()
+    nome_arquivo = f"snapshot-{gerado_em:%Y%m%d%H%M%S%f}.sqlite"
+    destino = os.path.join(diretorio, nome_arquivo)
+    temporario = destino + '.tmp'
+
+    inicio = time.perf_counter()
+    lite = sqlite3.connect(temporario)
+    try:
+        lite.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;")
+        lite.executescript(DDL)
+
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT nome, cnpj, telefone, email FROM clientes_turbo")
+            lite.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?)", cursor)
+
+            # Mesmo registro por CNPJ que as consultas do Postgres usam
+            cursor.execute(SQL_CLICKUP_RECENTE)
+            lite.executemany("INSERT INTO clickup VALUES (?, ?, ?, ?, ?, ?, ?)", cursor)
+
+        # Cursor nomeado (server-side) para não carregar todas as faturas em memória
+        with conn.cursor(name='exportar_snapshot_faturas', withhold=True) as cursor:
+            cursor.itersize = 10000
+            cursor.execute("""
+            SELECT id, status, total, descricao, data_vencimento, nao_pago, pago,
+                   data_criacao, data_alteracao, cliente_id, cliente_nome, link_pagamento, status_clickup
+            FROM a_receber_turbo
+            """)
+            total_faturas = 0
+            lote = []
+            for row in cursor:
+                lote.append((
+                    row[0], row[1], _centavos(row[2]), row[3], _texto(row[4]),
+                    _centavos(row[5]), _centavos(row[6]), _texto(row[7]), _texto(row[8]),
+                    _texto(row[9]), row[10], row[11], row[12],
+                    row[10].casefold() if row[10] else None,
+                ))
+                if len(lote) >= 10000:
+                    lite.executemany("INSERT INTO faturas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", lote)
+                    total_faturas += len(lote)
+                    lote = []
+            if lote:
+                lite.executemany("INSERT INTO faturas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", lote)
+                total_faturas += len(lote)
+
+        if ARQUIVO_RECEBIVEIS:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT cliente_nome, qtd_faturas, total, pago FROM a_receber_arquivo_totais")
+                lite.executemany(
+                    "INSERT INTO faturas_arquivadas VALUES (?, ?, ?, ?)",
+                    ((row[0], row[1], _centavos(row[2]), _centavos(row[3])) for row in cursor),
+                )
+
+        lite.executescript(INDICES)
+        lite.execute("INSERT INTO meta VALUES ('gerado_em', ?)", (gerado_em.isoformat(),))
+        lite.commit()
+        lite.execute("ANALYZE")
+        lite.commit()
+    finally:
+        lite.close()
+
+    os.replace(temporario, destino)
+
+    # Trocar o ponteiro de forma atômica
+    ponteiro_tmp = os.path.join(diretorio, PONTEIRO + '.tmp')
+    with open(ponteiro_tmp, 'w', encoding='utf-8') as f:
+        json.dump({'arquivo': nome_arquivo, 'gerado_em': gerado_em.timestamp(),
+                   'faturas': total_faturas}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ponteiro_tmp, os.path.join(diretorio, PONTEIRO))
+
+    _limpar_versoes_antigas(diretorio, nome_arquivo)
+    print(f"Snapshot {nome_arquivo} publicada ({total_faturas} faturas) em "
+          f"{time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    return destino
+
+
+def _limpar_versoes_antigas(diretorio, atual):
+    # Workers que ainda estão com a versão antiga aberta continuam lendo normalmente
+    # (no Linux o arquivo só some de fato quando o último descritor é fechado)
+    arquivos = sorted(glob.glob(os.path.join(diretorio, 'snapshot-*.sqlite')))
+    antigos = [a for a in arquivos if os.path.basename(a) != atual][:-SNAPSHOT_MANTER or None]
+    for arquivo in antigos:
+        try:
+            os.remove(arquivo)
+        except OSError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Leitura
+# ---------------------------------------------------------------------------
+
+def _ler_ponteiro():
+    """Ler atual.json no máximo a cada SNAPSHOT_VERIFICAR_S segundos"""
+    agora = time.monotonic()
+    if agora - _ponteiro['verificado_em'] < SNAPSHOT_VERIFICAR_S:
+        return _ponteiro['dados']
+
+    with _lock_ponteiro:
+        _ponteiro['verificado_em'] = agora
+        caminho = os.path.join(SNAPSHOT_DIR, PONTEIRO)
+        try:
+            mtime = os.stat(caminho).st_mtime
+        except OSError:
+            _ponteiro['dados'] = None
+            return None
+        if mtime != _ponteiro['mtime']:
+            try:
+                with open(caminho, encoding='utf-8') as f:
+                    _ponteiro['dados'] = json.load(f)
+                _ponteiro['mtime'] = mtime
+            except (OSError, ValueError):
+                _ponteiro['dados'] = None
+        return _ponteiro['dados']
+
+
+def _converter_linha(cursor, row):
+    """Converter para os mesmos tipos que o psycopg2 devolveria"""
+    linha = {}
+    for coluna, valor in zip(cursor.description, row):
+        nome = coluna[0]
+        if valor is not None:
+            if nome in COLUNAS_MONETARIAS:
+                valor = (Decimal(valor) / 100).quantize(CENTAVO)
+            elif nome in COLUNAS_DATA:
+                valor = date.fromisoformat(valor)
+            elif nome in COLUNAS_DATA_HORA:
+                valor = datetime.fromisoformat(valor)
+            elif nome in COLUNAS_BOOLEANAS:
+                valor = bool(valor)
+        linha[nome] = valor
+    return linha
+
+
+def _conexao():
+    """Conexão SQLite da thread atual para a versão publicada, ou None"""
+    if not SNAPSHOT_DIR:
+        return None
+
+    ponteiro = _ler_ponteiro()
+    if not ponteiro:
+        return None
+    if time.time() - ponteiro['gerado_em'] > SNAPSHOT_MAX_IDADE:
+        return None
+
+    arquivo = ponteiro['arquivo']
+    atual = getattr(_local, 'conexao', None)
+    if atual is not None and _local.arquivo == arquivo:
+        return atual
+
+    if atual is not None:
+        _descartar_conexao()
+
+    caminho = os.path.join(SNAPSHOT_DIR, arquivo)
+    # immutable=1: o arquivo nunca muda depois de publicado, então o SQLite
+    # dispensa locks e verificações de alteração
+    conexao = sqlite3.connect(f"file:{caminho}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+    try:
+        conexao.row_factory = _converter_linha
+        conexao.execute(f"PRAGMA mmap_size = {SNAPSHOT_MMAP_BYTES}")
+    except sqlite3.Error:
+        conexao.close()
+        raise
+    _local.conexao = conexao
+    _local.arquivo = arquivo
+    return conexao
+
+
+def _descartar_conexao():
+    """Fechar a conexão SQLite da thread (a próxima consulta abre de novo)"""
+    conexao = getattr(_local, 'conexao', None)
+    _local.conexao = None
+    if conexao is not None:
+        try:
+            conexao.close()
+        except sqlite3.Error:
+            pass
+
+
+def _consultar(sql, **params):
+    """Executar na snapshot; retorna NAO_DISPONIVEL se indisponível/desatualizada ou em erro"""
+    try:
+        conexao = _conexao()
+        if conexao is None:
+            return NAO_DISPONIVEL
+        params.setdefault('hoje', date.today().isoformat())
+        return conexao.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        print(f"AVISO: falha ao consultar snapshot, usando Postgres: {e}", file=sys.stderr)
+        _descartar_conexao()
+        return NAO_DISPONIVEL
+
+
+def disponivel():
+    """Indica se existe uma snapshot válida (não desatualizada) para usar"""
+    try:
+        return _conexao() is not None
+    except sqlite3.Error:
+        return False
+
+
+def cliente_cnpj(cnpj):
+    """Mesmo retorno de ``consultas.cliente_cnpj``"""
+    clientes = _consultar(SQL_CLIENTE_CNPJ, cnpj=cnpj)
+    if clientes is NAO_DISPONIVEL:
+        return NAO_DISPONIVEL
+    if not clientes or not clientes[0]['nome']:
+        return None
+    return clientes[0]
+
+
+def historico_cnpj(cnpj):
+    """Mesmo retorno de ``consultas.historico_cnpj``"""
+    return _consultar(SQL_HISTORICO_CNPJ, cnpj=cnpj)
+
+
+def clickup_cnpj(cnpj):
+    """Mesmo retorno de ``consultas.clickup_cnpj``"""
+    clickup = _consultar(SQL_CLICKUP_CNPJ, cnpj=cnpj)
+    if clickup is NAO_DISPONIVEL:
+        return NAO_DISPONIVEL
+    return clickup[0] if clickup else None
+
+
+def dados_cnpj(cnpj):
+    """Mesmo retorno de ``consultas.dados_cnpj``"""
+    cliente_info = cliente_cnpj(cnpj)
+    if cliente_info is NAO_DISPONIVEL:
+        return NAO_DISPONIVEL
+    if cliente_info is None:
+        return {'cliente_info': None, 'rows': [], 'clickup_data': None}
+
+    rows = historico_cnpj(cnpj)
+    if rows is NAO_DISPONIVEL:
+        return NAO_DISPONIVEL
+
+    clickup_data = None
+    if not rows:
+        clickup_data = clickup_cnpj(cnpj)
+        if clickup_data is NAO_DISPONIVEL:
+            return NAO_DISPONIVEL
+
+    return {'cliente_info': cliente_info, 'rows': rows, 'clickup_data': clickup_data}
+
+
+def vencidas_por_nome(nome):
+    """Mesmo retorno de ``consultas.vencidas_por_nome`` (sem diferenciar maiúsculas,
+    como o ILIKE, também em nomes acentuados)"""
+    return _consultar(SQL_VENCIDAS_NOME, nome=f'%{nome.casefold()}%')
+
+
+def top_pendencias(limite=10):
+    """Mesmo retorno de ``consultas.top_pendencias``"""
+    return _consultar(SQL_TOP_PENDENCIAS, limite=limite)
+
+
+def listar_clientes():
+    """Mesmo retorno de ``consultas.listar_clientes`` (o ClickUp da snapshot já
+    tem um registro por CNPJ, o mais recente)"""
+    return _consultar(SQL_LISTAR_CLIENTES)
+
+
+if __name__ == '__main__':
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.environ.get('DATABASE_URL', '')
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    conexao_pg = psycopg2.connect(database_url) if database_url else psycopg2.connect(
+        host=os.getenv("PG_HOST"),
+        dbname=os.getenv("PG_DBNAME"),
+        user=os.getenv("PG_USER"),
+        password=os.getenv("PG_PASSWORD"),
+        port=os.getenv("PG_PORT")
+    )
+    try:
+        exportar(conexao_pg, sys.argv[1] if len(sys.argv) > 1 else None)
+    finally:
+        conexao_pg.close()
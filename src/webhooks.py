@@ -0,0 +1,601 @@
+"""Recebimento de webhooks do ClickUp e do Conta Azul com fila no Postgres.
+
+As rotas ``/webhooks/clickup`` e ``/webhooks/conta-azul`` só verificam a
+assinatura e gravam o evento em ``webhook_eventos``, respondendo em seguida. O
+``AplicadorWebhooks`` (thread no app ou ``python -m src.webhooks aplicar``)
+pega os eventos pendentes em lotes, junta os eventos de cada tarefa e de cada
+fatura (os dois lados podem mandar só os campos alterados) e aplica o resultado em ``clientes_clickup`` e ``a_receber_turbo``.
+
+Assinaturas: HMAC-SHA256 do corpo bruto, em hexadecimal, com o segredo de
+``CLICKUP_WEBHOOK_SECRET`` (cabeçalho ``X-Signature``, como envia o ClickUp) e
+``CONTA_AZUL_WEBHOOK_SECRET`` (cabeçalho ``X-Signature``, aceitando o prefixo
+``sha256=``). Sem o segredo configurado a rota recusa os eventos.
+
+ClickUp: as Automações enviam a tarefa completa em ``payload``; os webhooks da
+API mandam só ``task_id`` e ``history_items``. Nesse caso o aplicador busca a
+tarefa em ``GET /task/{id}`` pelo cliente compartilhado de ``src.integracoes``
+(``CLICKUP_API_TOKEN``), antes de abrir a transação do lote. Se a API falhar
+(sem resposta, 429 ou 5xx) o evento é adiado com espera crescente
+(``proxima_tentativa_em``) e os seguintes continuam sendo aplicados; depois de
+``WEBHOOKS_TENTATIVAS_MAX`` tentativas ele é encerrado com ``erro``.
+
+Reproduzir payloads gravados (um JSON por linha, ou arquivos .json)::
+
+    python -m src.webhooks reproduzir clickup eventos.jsonl --aplicar
+"""
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+
+ORIGENS = ('clickup', 'conta_azul')
+
+# Tentativas de buscar a tarefa de um evento adiado antes de desistir dele
+TENTATIVAS_MAX = int(os.getenv('WEBHOOKS_TENTATIVAS_MAX', 8))
+# Espera antes da próxima tentativa: dobra a cada falha, até o teto
+ESPERA_BASE_S = 30
+ESPERA_MAX_S = 3600
+
+DDL = """
+CREATE TABLE IF NOT EXISTS webhook_eventos (
+    id BIGSERIAL PRIMARY KEY,
+    origem TEXT NOT NULL,
+    tipo TEXT,
+    chave TEXT,
+    payload JSONB NOT NULL,
+    recebido_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+    processado_em TIMESTAMPTZ,
+    erro TEXT,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa_em TIMESTAMPTZ
+);
+ALTER TABLE webhook_eventos ADD COLUMN IF NOT EXISTS tentativas INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE webhook_eventos ADD COLUMN IF NOT EXISTS proxima_tentativa_em TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS idx_webhook_eventos_pendentes
+    ON webhook_eventos (id) WHERE processado_em IS NULL;
+"""
+
+# Eventos pendentes que já podem ser aplicados (os adiados esperam a vez)
+_PRONTOS = "processado_em IS NULL AND (proxima_tentativa_em IS NULL OR proxima_tentativa_em <= now())"
+
+_SEGREDOS = {
+    'clickup': 'CLICKUP_WEBHOOK_SECRET',
+    'conta_azul': 'CONTA_AZUL_WEBHOOK_SECRET',
+}
+
+# Nomes dos campos personalizados das tarefas de cliente no ClickUp
+CAMPOS_CLICKUP = {
+    'cnpj': 'CNPJ',
+    'segmento': 'Segmento',
+    'cluster': 'Cluster',
+    'atividade': 'Atividade',
+    'telefone': 'Telefone',
+}
+
+COLUNAS_CLICKUP = ('cnpj', 'responsavel', 'segmento', 'cluster', 'status_conta', 'atividade', 'telefone')
+COLUNAS_A_RECEBER = ('id', 'status', 'total', 'descricao', 'data_vencimento', 'nao_pago', 'pago',
+                     'data_criacao', 'data_alteracao', 'cliente_id', 'cliente_nome', 'link_pagamento')
+# Tipos das colunas de a_receber_turbo para os VALUES do lote
+_TIPOS_A_RECEBER = ('bigint', 'text', 'numeric', 'text', 'date', 'numeric', 'numeric',
+                    'timestamp', 'timestamp', 'text', 'text', 'text')
+
+
+_tabela_criada = False
+
+
+class EventoInvalido(ValueError):
+    """O payload não tem os dados mínimos para ser aplicado"""
+
+
+def segredo(origem):
+    return os.getenv(_SEGREDOS[origem])
+
+
+def assinatura_valida(corpo, assinatura, segredo):
+    """Comparar (em tempo constante) a assinatura recebida com o HMAC do corpo"""
+    if not assinatura or not segredo:
+        return False
+    if assinatura.startswith('sha256='):
+        assinatura = assinatura[len('sha256='):]
+    esperada = hmac.new(segredo.encode('utf-8'), corpo, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(esperada, assinatura.strip().lower())
+
+
+def _tarefa_clickup(payload):
+    # Automações do ClickUp enviam a tarefa em "payload"; "task" é preenchido
+    # pelo aplicador quando a tarefa precisa ser buscada na API
+    return payload.get('task') or payload.get('payload') or payload
+
+
+def _sem_tarefa(payload):
+    """Webhook da API do ClickUp: traz o id da tarefa, mas não os campos"""
+    return bool(payload.get('task_id')) and 'custom_fields' not in _tarefa_clickup(payload)
+
+
+def buscar_tarefas(ids_tarefas):
+    """Tarefas lidas na API do ClickUp: {id: tarefa, ou a ``ErroAPI`` da chamada}"""
+    from src import integracoes
+
+    ids_tarefas = list(ids_tarefas)
+    if not ids_tarefas:
+        return {}
+    resultados = integracoes.clickup().em_paralelo(
+        [('GET', f"/task/{id_tarefa}", {'endpoint': 'GET /task/{id}'}) for id_tarefa in ids_tarefas])
+    return dict(zip(ids_tarefas, resultados))
+
+
+def _falha_temporaria(erro):
+    # Sem resposta, 429 ou 5xx: vale tentar de novo. Tarefa excluída ou sem
+    # acesso (demais 4xx) não muda com o tempo
+    status = getattr(erro, 'status', None)
+    return status is None or status == 429 or status >= 500
+
+
+def _espera_s(tentativas):
+    return min(ESPERA_BASE_S * 2 ** (tentativas - 1), ESPERA_MAX_S)
+
+
+def identificar(origem, payload):
+    """(tipo, chave) do evento; a chave identifica a tarefa ou a fatura alterada"""
+    if origem == 'clickup':
+        tarefa = _tarefa_clickup(payload)
+        return payload.get('event'), str(payload.get('task_id') or tarefa.get('id') or '') or None
+    dados = payload.get('data') or payload
+    return payload.get('event') or payload.get('tipo'), str(dados.get('id') or '') or None
+
+
+def garantir_tabela(conn):
+    global _tabela_criada
+    if not _tabela_criada:
+        with conn.cursor() as cursor:
+            cursor.execute(DDL)
+        _tabela_criada = True
+
+
+def enfileirar(conn, origem, payload):
+    """Gravar o evento na fila; retorna o id do evento"""
+    garantir_tabela(conn)
+    tipo, chave = identificar(origem, payload)
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        INSERT INTO webhook_eventos (origem, tipo, chave, payload)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id
+        """, (origem, tipo, chave, json.dumps(payload)))
+        return cursor.fetchone()[0]
+
+
+def normalizar_clickup(payload):
+    """Campos de ``clientes_clickup`` presentes na tarefa enviada pelo ClickUp.
+
+    Como em ``normalizar_conta_azul``, campos ausentes da tarefa ficam fora do
+    dicionário e mantêm o valor atual; o CNPJ é obrigatório.
+    """
+    tarefa = _tarefa_clickup(payload)
+    campos = {}
+    for campo in tarefa.get('custom_fields') or []:
+        campos[campo.get('name')] = campo.get('value')
+
+    registro = {coluna: campos[nome] for coluna, nome in CAMPOS_CLICKUP.items() if nome in campos}
+    if 'assignees' in tarefa:
+        responsaveis = tarefa['assignees'] or []
+        registro['responsavel'] = ', '.join(r.get('username') or r.get('email') or '' for r in responsaveis) or None
+    if 'status' in tarefa:
+        status = tarefa['status']
+        registro['status_conta'] = status.get('status') if isinstance(status, dict) else status
+    if not registro.get('cnpj'):
+        raise EventoInvalido('tarefa sem CNPJ')
+    return registro
+
+
+def normalizar_conta_azul(payload):
+    """Campos de ``a_receber_turbo`` presentes no evento de conta a receber.
+
+    Eventos parciais trazem só os campos alterados: as colunas ausentes ficam
+    fora do dicionário (e não são gravadas como NULL).
+    """
+    dados = payload.get('data') or payload
+    if not dados.get('id'):
+        raise EventoInvalido('conta a receber sem id')
+    registro = {coluna: dados[coluna] for coluna in COLUNAS_A_RECEBER if coluna in dados}
+    if 'total' not in registro and 'valor' in dados:
+        registro['total'] = dados['valor']
+    cliente = dados.get('cliente')
+    if isinstance(cliente, dict):
+        if registro.get('cliente_id') is None and 'id' in cliente:
+            registro['cliente_id'] = cliente['id']
+        if registro.get('cliente_nome') is None and 'nome' in cliente:
+            registro['cliente_nome'] = cliente['nome']
+    return registro
+
+
+def _evento_exclusao(payload):
+    tipo = (payload.get('event') or payload.get('tipo') or '').lower()
+    return 'delet' in tipo or 'exclu' in tipo
+
+
+def _aplicar_clickup(cursor, registros):
+    for registro in registros:
+        colunas = [c for c in COLUNAS_CLICKUP if c in registro]
+        atualizar = colunas[1:]
+        # Há registros duplicados por CNPJ; as consultas usam o de maior id
+        if atualizar:
+            cursor.execute(f"""
+            UPDATE clientes_clickup SET {', '.join(f'{c} = %s' for c in atualizar)}
+            WHERE id = (SELECT max(id) FROM clientes_clickup WHERE cnpj = %s)
+            """, [registro[c] for c in atualizar] + [registro['cnpj']])
+        else:
+            cursor.execute("SELECT 1 FROM clientes_clickup WHERE cnpj = %s LIMIT 1", (registro['cnpj'],))
+        if cursor.rowcount == 0:
+            cursor.execute(f"""
+            INSERT INTO clientes_clickup ({', '.join(colunas)})
+            VALUES ({', '.join(['%s'] * len(colunas))})
+            """, [registro[c] for c in colunas])
+
+
+def _aplicar_conta_azul(cursor, registros, excluir):
+    from psycopg2.extras import execute_values
+
+    if excluir:
+        cursor.execute("DELETE FROM a_receber_turbo WHERE id = ANY(%s::bigint[])", (list(excluir),))
+    if not registros:
+        return
+
+    # Cada linha leva a lista das colunas presentes no evento: as ausentes
+    # mantêm o valor atual (um NULL explícito no evento ainda limpa a coluna)
+    valores = [tuple(registro.get(c) for c in COLUNAS_A_RECEBER) + (sorted(registro),) for registro in registros]
+    modelo = '(' + ', '.join(f'%s::{tipo}' for tipo in _TIPOS_A_RECEBER) + ', %s::text[])'
+    colunas = ', '.join(COLUNAS_A_RECEBER)
+    atribuicoes = ', '.join(f"{c} = CASE WHEN '{c}' = ANY(v.presentes) THEN v.{c} ELSE a.{c} END"
+                            for c in COLUNAS_A_RECEBER[1:])
+    # status_clickup é preenchido pelo sync do ClickUp e não vem no evento
+    execute_values(cursor, f"""
+    UPDATE a_receber_turbo a SET {atribuicoes}
+    FROM (VALUES %s) AS v ({colunas}, presentes)
+    WHERE a.id = v.id
+    """, valores, template=modelo)
+    execute_values(cursor, f"""
+    INSERT INTO a_receber_turbo ({colunas})
+    SELECT {colunas} FROM (VALUES %s) AS v ({colunas}, presentes)
+    WHERE NOT EXISTS (SELECT 1 FROM a_receber_turbo a WHERE a.id = v.id)
+    """, valores, template=modelo)
+
+
+def _aplicar_itens(cursor, itens):
+    _aplicar_clickup(cursor, [valor for _, tipo, valor in itens if tipo == 'clickup'])
+    _aplicar_conta_azul(
+        cursor,
+        [valor for _, tipo, valor in itens if tipo == 'conta_azul'],
+        {valor for _, tipo, valor in itens if tipo == 'excluir'},
+    )
+
+
+def _juntar_conta_azul(eventos_chave, erros):
+    """Itens de uma fatura: exclusão e/ou os campos de todos os eventos, em ordem"""
+    excluir = None
+    registro = None
+    for id_evento, payload in eventos_chave:
+        try:
+            if _evento_exclusao(payload):
+                excluir = (id_evento, 'excluir', int(identificar('conta_azul', payload)[1]))
+                # O que veio antes da exclusão não vale mais
+                registro = None
+            else:
+                campos = dict(registro[2]) if registro else {}
+                campos.update(normalizar_conta_azul(payload))
+                registro = (id_evento, 'conta_azul', campos)
+        except (EventoInvalido, TypeError, ValueError) as e:
+            erros[id_evento] = str(e)
+    return [item for item in (excluir, registro) if item is not None]
+
+
+def _juntar_clickup(eventos_chave, tarefas, erros, adiados):
+    """Campos de uma tarefa: os de todos os eventos, em ordem.
+
+    Webhooks da API usam a tarefa lida em ``tarefas``; se a busca falhou o
+    evento vai para ``adiados`` (com o erro, ou None se ele chegou depois da
+    busca e só precisa do próximo lote).
+    """
+    registro = None
+    for id_evento, payload in eventos_chave:
+        try:
+            if _sem_tarefa(payload):
+                tarefa = tarefas.get(str(payload['task_id']))
+                if tarefa is None:
+                    adiados[id_evento] = None
+                    continue
+                if isinstance(tarefa, Exception):
+                    if _falha_temporaria(tarefa):
+                        adiados[id_evento] = str(tarefa)
+                    else:
+                        erros[id_evento] = str(tarefa)
+                    continue
+                payload = dict(payload, task=tarefa)
+            campos = dict(registro[2]) if registro else {}
+            campos.update(normalizar_clickup(payload))
+            registro = (id_evento, 'clickup', campos)
+        except (EventoInvalido, TypeError, ValueError) as e:
+            erros[id_evento] = str(e)
+    return [registro] if registro is not None else []
+
+
+def _tarefas_a_buscar(conn, tamanho):
+    # Mesma janela do lote: os eventos do ClickUp do próximo lote estão entre os
+    # ``tamanho`` primeiros eventos prontos do ClickUp
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+        SELECT payload FROM webhook_eventos
+        WHERE origem = 'clickup' AND {_PRONTOS}
+        ORDER BY id
+        LIMIT %s
+        """, (tamanho,))
+        return {str(payload['task_id']) for (payload,) in cursor.fetchall() if _sem_tarefa(payload)}
+
+
+def _adiar(cursor, adiados, tentativas):
+    for id_evento, erro in adiados.items():
+        if erro is None:
+            cursor.execute("""
+            UPDATE webhook_eventos SET proxima_tentativa_em = now() + interval '1 second'
+            WHERE id = %s
+            """, (id_evento,))
+            continue
+        tentativa = tentativas[id_evento] + 1
+        if tentativa >= TENTATIVAS_MAX:
+            cursor.execute("""
+            UPDATE webhook_eventos SET tentativas = %s, erro = %s, processado_em = now()
+            WHERE id = %s
+            """, (tentativa, f"{erro} (desistindo após {tentativa} tentativas)", id_evento))
+        else:
+            cursor.execute("""
+            UPDATE webhook_eventos
+            SET tentativas = %s, erro = %s, proxima_tentativa_em = now() + make_interval(secs => %s)
+            WHERE id = %s
+            """, (tentativa, erro, _espera_s(tentativa), id_evento))
+
+
+def aplicar_lote(conn, tamanho=500, buscar=buscar_tarefas):
+    """Aplicar um lote de eventos pendentes; retorna quantos eventos foram tratados.
+
+    As tarefas que os webhooks da API do ClickUp não trazem são buscadas
+    (``buscar``) antes da transação, para não segurar os locks durante as
+    chamadas HTTP. ``FOR UPDATE SKIP LOCKED`` permite vários aplicadores ao
+    mesmo tempo. Os eventos de cada tarefa e de cada fatura são juntados em
+    ordem, já que podem trazer só parte dos campos. Eventos que não puderam
+    ser aplicados ficam marcados como processados, com ``erro``; os que
+    dependem de uma busca que falhou são adiados (``proxima_tentativa_em``).
+    """
+    garantir_tabela(conn)
+    tarefas = buscar(_tarefas_a_buscar(conn, tamanho))
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+            SELECT id, origem, chave, payload, tentativas FROM webhook_eventos
+            WHERE {_PRONTOS}
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """, (tamanho,))
+            eventos = cursor.fetchall()
+            if not eventos:
+                conn.rollback()
+                return 0
+
+            por_chave = {}
+            tentativas = {}
+            for id_evento, origem, chave, payload, tentativas_evento in eventos:
+                por_chave.setdefault((origem, chave or f'evento-{id_evento}'), []).append((id_evento, payload))
+                tentativas[id_evento] = tentativas_evento
+
+            erros = {}
+            adiados = {}
+            itens = []
+            for (origem, _), eventos_chave in por_chave.items():
+                if origem == 'clickup':
+                    itens.extend(_juntar_clickup(eventos_chave, tarefas, erros, adiados))
+                else:
+                    itens.extend(_juntar_conta_azul(eventos_chave, erros))
+
+            cursor.execute("SAVEPOINT lote")
+            try:
+                _aplicar_itens(cursor, itens)
+            except Exception:
+                # Um evento com dado inválido não pode travar a fila: aplicar um a um
+                cursor.execute("ROLLBACK TO SAVEPOINT lote")
+                for item in itens:
+                    cursor.execute("SAVEPOINT evento")
+                    try:
+                        _aplicar_itens(cursor, [item])
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT evento")
+                        erros[item[0]] = str(e).strip()
+
+            cursor.execute("""
+            UPDATE webhook_eventos SET processado_em = now(), erro = NULL
+            WHERE id = ANY(%s)
+            """, ([e[0] for e in eventos if e[0] not in adiados],))
+            for id_evento, erro in erros.items():
+                cursor.execute("UPDATE webhook_eventos SET erro = %s WHERE id = %s", (erro, id_evento))
+            _adiar(cursor, adiados, tentativas)
+        conn.commit()
+        return len(eventos)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+
+class AplicadorWebhooks(threading.Thread):
+    """Thread que aplica a fila de webhooks em lotes.
+
+    ``conectar`` deve devolver uma conexão com o primário ou None. A mesma
+    conexão é reutilizada entre as drenagens e só é reaberta depois de uma
+    falha; ``fechar()`` a encerra. A fila é verificada a cada ``intervalo_s``
+    segundos, ou logo após ``acordar()``.
+    """
+
+    def __init__(self, conectar, tamanho_lote=500, intervalo_s=2.0):
+        super().__init__(name='aplicador-webhooks', daemon=True)
+        self._conectar = conectar
+        self._conn = None
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_s = intervalo_s
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self.lotes = 0
+        self.eventos = 0
+        self.falhas = 0
+        self.ultimo_erro = None
+
+    def acordar(self):
+        self._acordar.set()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def _conexao(self):
+        if self._conn is None or self._conn.closed:
+            conn = self._conectar()
+            if conn is None:
+                raise ConnectionError("sem conexão com o banco")
+            self._conn = conn
+        return self._conn
+
+    def fechar(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def drenar(self):
+        """Aplicar lotes até a fila esvaziar; retorna o total de eventos tratados"""
+        conn = self._conexao()
+        total = 0
+        try:
+            while not self._parar.is_set():
+                consumidos = aplicar_lote(conn, self.tamanho_lote)
+                if not consumidos:
+                    break
+                self.lotes += 1
+                self.eventos += consumidos
+                total += consumidos
+        except Exception:
+            # Conexão em estado desconhecido: a próxima drenagem abre outra
+            self.fechar()
+            raise
+        return total
+
+    def run(self):
+        while not self._parar.is_set():
+            self._acordar.wait(self.intervalo_s)
+            self._acordar.clear()
+            try:
+                self.drenar()
+                self.ultimo_erro = None
+            except Exception as e:
+                self.falhas += 1
+                self.ultimo_erro = str(e).strip() or e.__class__.__name__
+                print(f"AVISO: falha ao aplicar webhooks: {self.ultimo_erro}", file=sys.stderr)
+                self._parar.wait(self.intervalo_s)
+        self.fechar()
+
+    def estatisticas(self):
+        return {
+            'lotes': self.lotes,
+            'eventos_aplicados': self.eventos,
+            'falhas': self.falhas,
+            'ultimo_erro': self.ultimo_erro,
+        }
+
+
+def pendentes(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM webhook_eventos WHERE processado_em IS NULL")
+        return cursor.fetchone()[0]
+
+
+def ler_gravados(caminho):
+    """Payloads gravados: arquivo JSON Lines, arquivo .json ou diretório de .json"""
+    if os.path.isdir(caminho):
+        for nome in sorted(os.listdir(caminho)):
+            if nome.endswith('.json'):
+                yield from ler_gravados(os.path.join(caminho, nome))
+        return
+    with open(caminho, encoding='utf-8') as arquivo:
+        if caminho.endswith('.json'):
+            yield json.load(arquivo)
+            return
+        for linha in arquivo:
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def _conectar_cli():
+    import psycopg2
+
+    database_url = os.environ.get('DATABASE_URL', '')
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    conn = psycopg2.connect(database_url) if database_url else psycopg2.connect(
+        host=os.getenv("PG_HOST"),
+        dbname=os.getenv("PG_DBNAME"),
+        user=os.getenv("PG_USER"),
+        password=os.getenv("PG_PASSWORD"),
+        port=os.getenv("PG_PORT")
+    )
+    conn.autocommit = True
+    return conn
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Fila de webhooks do ClickUp e do Conta Azul")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comandos.add_parser('criar-tabela', help="criar a tabela webhook_eventos")
+    aplicar = comandos.add_parser('aplicar', help="aplicar a fila continuamente")
+    aplicar.add_argument('--intervalo', type=float, default=2.0)
+    aplicar.add_argument('--lote', type=int, default=500)
+    reproduzir = comandos.add_parser('reproduzir', help="enfileirar payloads gravados")
+    reproduzir.add_argument('origem', choices=ORIGENS)
+    reproduzir.add_argument('caminho', help="arquivo .jsonl/.json ou diretório de .json")
+    reproduzir.add_argument('--aplicar', action='store_true', help="aplicar a fila ao final")
+    args = parser.parse_args()
+
+    conexao = _conectar_cli()
+    try:
+        garantir_tabela(conexao)
+        if args.comando == 'reproduzir':
+            quantidade = 0
+            for payload in ler_gravados(args.caminho):
+                enfileirar(conexao, args.origem, payload)
+                quantidade += 1
+            print(f"{quantidade} evento(s) enfileirado(s)")
+            if args.aplicar:
+                inicio = time.monotonic()
+                aplicador = AplicadorWebhooks(_conectar_cli)
+                try:
+                    aplicados = aplicador.drenar()
+                finally:
+                    aplicador.fechar()
+                print(f"{aplicados} evento(s) aplicado(s) em {time.monotonic() - inicio:.2f}s")
+        elif args.comando == 'aplicar':
+            aplicador = AplicadorWebhooks(_conectar_cli, tamanho_lote=args.lote, intervalo_s=args.intervalo)
+            print(f"Aplicando webhooks ({pendentes(conexao)} pendente(s)); Ctrl+C para sair")
+            try:
+                aplicador.run()
+            finally:
+                aplicador.fechar()
+    finally:
+        conexao.close()
@@ -0,0 +1,99 @@
+"""Testes do controle de admissão (src/admissao.py), sem servidor.
+
+Cada ``ControleAdmissao`` abre os próprios arquivos de vaga, então dois
+controles no mesmo diretório disputam as vagas como dois workers.
+
+Executar na raiz do projeto::
+
+    python -m pytest tests
+"""
+import tempfile
+import threading
+import time
+import unittest
+
+from src.admissao import ControleAdmissao, Recusada
+
+ROTAS = {
+    'listar_clientes': {'custo': 2, 'limite': 1},
+    'exportar': {'custo': 1, 'limite': 2},
+}
+
+
+class TestControleAdmissao(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def controle(self, **kwargs):
+        kwargs.setdefault('capacidade', 3)
+        kwargs.setdefault('espera_s', 0)
+        return ControleAdmissao(ROTAS, diretorio=self.diretorio.name, **kwargs)
+
+    def test_limite_por_rota_vale_entre_workers(self):
+        primeiro, segundo = self.controle(), self.controle()
+        with primeiro.admitir('listar_clientes'):
+            with self.assertRaises(Recusada) as recusa:
+                segundo.admitir('listar_clientes')
+            self.assertEqual(recusa.exception.status, 429)
+            self.assertGreaterEqual(recusa.exception.retry_after, 1)
+        segundo.admitir('listar_clientes').liberar()
+
+    def test_custo_consome_a_capacidade_compartilhada(self):
+        controle = self.controle()
+        listagem = controle.admitir('listar_clientes')
+        exportacao = controle.admitir('exportar')
+        # Capacidade 3 = listagem (2) + uma exportação (1), embora a rota aceite duas
+        with self.assertRaises(Recusada):
+            controle.admitir('exportar')
+        listagem.liberar()
+        controle.admitir('exportar').liberar()
+        exportacao.liberar()
+        estatisticas = controle.estatisticas()['rotas']
+        self.assertEqual(estatisticas['exportar']['admitidas'], 2)
+        self.assertEqual(estatisticas['exportar']['recusadas_429'], 1)
+        self.assertEqual(estatisticas['exportar']['em_execucao'], 0)
+
+    def test_fila_espera_a_vaga(self):
+        controle = self.controle(espera_s=2, fila_max=1)
+        ocupada = controle.admitir('listar_clientes')
+        threading.Timer(0.2, ocupada.liberar).start()
+        inicio = time.monotonic()
+        controle.admitir('listar_clientes').liberar()
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.15)
+        self.assertEqual(controle.estatisticas()['rotas']['listar_clientes']['enfileiradas'], 1)
+
+    def test_fila_cheia_429_e_espera_esgotada_503(self):
+        controle = self.controle(espera_s=0.3, fila_max=1)
+        ocupada = controle.admitir('listar_clientes')
+        erros = []
+
+        def na_fila():
+            try:
+                controle.admitir('listar_clientes')
+            except Recusada as e:
+                erros.append(e.status)
+
+        thread = threading.Thread(target=na_fila)
+        thread.start()
+        while controle.estatisticas()['na_fila'] < 1:
+            time.sleep(0.01)
+        with self.assertRaises(Recusada) as recusa:
+            controle.admitir('listar_clientes')
+        self.assertEqual(recusa.exception.status, 429)
+        thread.join()
+        self.assertEqual(erros, [503])
+        ocupada.liberar()
+
+    def test_liberar_duas_vezes_nao_devolve_em_dobro(self):
+        controle = self.controle()
+        permissao = controle.admitir('exportar')
+        permissao.liberar()
+        permissao.liberar()
+        self.assertEqual(controle.estatisticas()['rotas']['exportar']['em_execucao'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
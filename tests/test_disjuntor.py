@@ -0,0 +1,103 @@
+"""Testes do disjuntor do banco (src/disjuntor.py) e do ``conexao_banco`` do app, sem Postgres.
+
+Executar na raiz do projeto::
+
+    python -m pytest tests
+"""
+import time
+import unittest
+from unittest import mock
+
+import psycopg2
+
+from src import app as aplicacao
+from src.consultas import BancoIndisponivel
+from src.disjuntor import ABERTO, FECHADO, MEIO_ABERTO, Disjuntor, DisjuntorAberto
+
+
+class TestDisjuntor(unittest.TestCase):
+    def test_abre_apos_falhas_seguidas(self):
+        disjuntor = Disjuntor('teste', falhas_max=3, espera_s=60)
+        for _ in range(2):
+            disjuntor.registrar_falha()
+        disjuntor.registrar_sucesso()
+        for _ in range(2):
+            disjuntor.registrar_falha()
+        self.assertEqual(disjuntor.estado()['estado'], FECHADO)
+        disjuntor.registrar_falha()
+        self.assertEqual(disjuntor.estado()['estado'], ABERTO)
+        self.assertFalse(disjuntor.permitir())
+        with self.assertRaises(DisjuntorAberto):
+            disjuntor.verificar()
+        self.assertEqual(disjuntor.estado()['rejeicoes'], 2)
+
+    def test_sonda_fecha_ou_reabre(self):
+        disjuntor = Disjuntor('teste', falhas_max=1, espera_s=0.05, intervalo_sondas_s=60)
+        disjuntor.registrar_falha()
+        time.sleep(0.06)
+        self.assertTrue(disjuntor.permitir())
+        self.assertEqual(disjuntor.estado()['estado'], MEIO_ABERTO)
+        # Uma sonda por intervalo
+        self.assertFalse(disjuntor.permitir())
+        disjuntor.registrar_falha()
+        self.assertEqual(disjuntor.estado()['estado'], ABERTO)
+        self.assertEqual(disjuntor.estado()['aberturas'], 2)
+
+        disjuntor.intervalo_sondas_s = 0
+        time.sleep(0.06)
+        disjuntor.verificar()
+        disjuntor.registrar_sucesso()
+        self.assertEqual(disjuntor.estado()['estado'], FECHADO)
+
+
+class _Conexao:
+    def __init__(self):
+        self.fechada = False
+
+    def close(self):
+        self.fechada = True
+
+
+class TestConexaoBanco(unittest.TestCase):
+    def setUp(self):
+        self.disjuntor = Disjuntor('teste', falhas_max=2, espera_s=60)
+        self.conexoes = []
+
+        def abrir(replica=False, dedicada=False):
+            self.conexoes.append(_Conexao())
+            return self.conexoes[-1]
+
+        self.patches = [
+            mock.patch.object(aplicacao, 'disjuntor_db', self.disjuntor),
+            mock.patch.object(aplicacao, '_abrir_conexao', abrir),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def _falhar(self, erro):
+        with aplicacao.conexao_banco():
+            raise erro
+
+    def test_falha_de_conexao_abre_e_recusa_sem_conectar(self):
+        for _ in range(2):
+            with self.assertRaises(BancoIndisponivel):
+                self._falhar(psycopg2.OperationalError('server closed the connection'))
+        with self.assertRaises(DisjuntorAberto):
+            self._falhar(AssertionError('não deveria executar'))
+        self.assertEqual(len(self.conexoes), 2)
+        self.assertTrue(all(conn.fechada for conn in self.conexoes))
+
+    def test_erro_de_sql_conta_como_sucesso(self):
+        with self.assertRaises(BancoIndisponivel):
+            self._falhar(psycopg2.OperationalError('timeout'))
+        with self.assertRaises(psycopg2.ProgrammingError):
+            self._falhar(psycopg2.ProgrammingError('column "x" does not exist'))
+        self.assertEqual(self.disjuntor.estado()['falhas_seguidas'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+"""Testes do cliente HTTP compartilhado (src/integracoes.py) contra servidores locais.
+
+Executar na raiz do projeto::
+
+    python -m pytest tests
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src import integracoes
+from src.integracoes import BaldeTokens, CacheTokenOAuth, ClienteAPI, ErroAPI
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """Responde com as respostas roteirizadas em ``server.roteiro[(método, caminho)]``"""
+
+    def _responder(self):
+        comprimento = int(self.headers.get('Content-Length') or 0)
+        corpo_recebido = self.rfile.read(comprimento) if comprimento else b''
+        self.server.recebidas.append((self.command, self.path, self.headers.get('Authorization'), corpo_recebido))
+        respostas = self.server.roteiro.get((self.command, self.path)) or [(404, {}, {'erro': 'sem roteiro'})]
+        status, cabecalhos, corpo = respostas.pop(0) if len(respostas) > 1 else respostas[0]
+        if callable(corpo):
+            corpo = corpo(self)
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        for nome, valor in cabecalhos.items():
+            self.send_header(nome, valor)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    do_GET = do_POST = _responder
+
+    def log_message(self, *args):
+        pass
+
+
+class _Servidor(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # O cliente desistiu por timeout antes da resposta lenta: esperado
+        pass
+
+
+class _TesteComServidor(unittest.TestCase):
+    def setUp(self):
+        self.servidor = _Servidor(('127.0.0.1', 0), _Stub)
+        self.servidor.roteiro = {}
+        self.servidor.recebidas = []
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}"
+        self.diretorio = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        self.diretorio.cleanup()
+
+    def cliente(self, **kwargs):
+        kwargs.setdefault('backoff_base_s', 0.01)
+        kwargs.setdefault('backoff_max_s', 0.05)
+        return ClienteAPI('teste', self.url, taxa_por_s=1000, rajada=100, **kwargs)
+
+
+class TestNovasTentativas(_TesteComServidor):
+    def test_get_repete_5xx_ate_sucesso(self):
+        self.servidor.roteiro[('GET', '/task/abc1')] = [(503, {}, {}), (502, {}, {}), (200, {}, {'id': 'abc1'})]
+        cliente = self.cliente()
+        self.assertEqual(cliente.json('GET', '/task/abc1', endpoint='GET /task/{id}'), {'id': 'abc1'})
+        resumo = cliente.estatisticas()['endpoints']['GET /task/{id}']
+        self.assertEqual(resumo['chamadas'], 3)
+        self.assertEqual(resumo['novas_tentativas'], 2)
+        self.assertEqual(resumo['erros'], 0)
+
+    def test_post_nao_repete_5xx(self):
+        self.servidor.roteiro[('POST', '/faturas')] = [(500, {}, {}), (200, {}, {'ok': True})]
+        with self.assertRaises(ErroAPI) as erro:
+            self.cliente().json('POST', '/faturas', json={'valor': 1})
+        self.assertEqual(erro.exception.status, 500)
+        self.assertEqual(len(self.servidor.recebidas), 1)
+
+    def test_post_nao_repete_timeout_de_leitura(self):
+        def lento(handler):
+            time.sleep(0.5)
+            return {'ok': True}
+        self.servidor.roteiro[('POST', '/faturas')] = [(200, {}, lento)]
+        with self.assertRaises(ErroAPI) as erro:
+            self.cliente(timeout_s=0.1).json('POST', '/faturas', json={'valor': 1})
+        self.assertIsNone(erro.exception.status)
+        # O servidor pode ter criado a fatura: uma segunda chamada a duplicaria
+        self.assertEqual(len(self.servidor.recebidas), 1)
+
+    def test_post_repete_conexao_recusada(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        cliente = self.cliente(tentativas=3)
+        with self.assertRaises(ErroAPI):
+            cliente.json('POST', '/faturas', json={'valor': 1})
+        self.assertEqual(cliente.estatisticas()['endpoints']['POST /faturas']['novas_tentativas'], 2)
+
+    def test_429_respeita_retry_after(self):
+        self.servidor.roteiro[('GET', '/lista')] = [(429, {'Retry-After': '0.2'}, {}), (200, {}, [])]
+        cliente = self.cliente(backoff_max_s=1.0)
+        inicio = time.monotonic()
+        self.assertEqual(cliente.json('GET', '/lista'), [])
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.2)
+        self.assertEqual(cliente.estatisticas()['endpoints']['GET /lista']['limitadas_429'], 1)
+
+    def test_erro_4xx_sem_nova_tentativa(self):
+        self.servidor.roteiro[('GET', '/task/gone1')] = [(404, {}, {'err': 'not found'})]
+        with self.assertRaises(ErroAPI) as erro:
+            self.cliente().json('GET', '/task/gone1')
+        self.assertEqual(erro.exception.status, 404)
+        self.assertEqual(len(self.servidor.recebidas), 1)
+
+
+class TestTokenOAuth(_TesteComServidor):
+    def _renovacoes(self):
+        emitidos = iter(range(1, 100))
+
+        def renovar(refresh_token):
+            return {'access_token': f"token-{next(emitidos)}", 'expires_in': 3600, 'refresh_token': f"{refresh_token}+"}
+        return renovar
+
+    def test_401_renova_em_vez_de_reler_o_token_do_arquivo(self):
+        arquivo = os.path.join(self.diretorio.name, 'token.json')
+        token_oauth = CacheTokenOAuth(self._renovacoes(), 'refresh', arquivo=arquivo)
+
+        def so_token_2(handler):
+            return {'ok': handler.headers.get('Authorization') == 'Bearer token-2'}
+        self.servidor.roteiro[('GET', '/contas')] = [(200, {}, so_token_2), (401, {}, {}), (200, {}, so_token_2)]
+
+        cliente = self.cliente(token_oauth=token_oauth)
+        self.assertEqual(cliente.json('GET', '/contas'), {'ok': False})
+        # O provedor revogou token-1 antes da expiração gravada no arquivo
+        self.assertEqual(cliente.json('GET', '/contas'), {'ok': True})
+        autorizacoes = [autorizacao for _, _, autorizacao, _ in self.servidor.recebidas]
+        self.assertEqual(autorizacoes, ['Bearer token-1', 'Bearer token-1', 'Bearer token-2'])
+        with open(arquivo, encoding='utf-8') as dados:
+            self.assertEqual(json.load(dados)['access_token'], 'token-2')
+
+    def test_workers_compartilham_o_token_do_arquivo(self):
+        arquivo = os.path.join(self.diretorio.name, 'token.json')
+        renovar = self._renovacoes()
+        primeiro = CacheTokenOAuth(renovar, 'refresh', arquivo=arquivo)
+        segundo = CacheTokenOAuth(renovar, 'refresh', arquivo=arquivo)
+        self.assertEqual(primeiro.obter(), 'token-1')
+        self.assertEqual(segundo.obter(), 'token-1')
+        self.assertEqual(primeiro.renovacoes + segundo.renovacoes, 1)
+
+
+class TestBaldeTokens(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.diretorio.name, 'balde')
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_rajada_e_espera(self):
+        balde = BaldeTokens(taxa_por_s=20, capacidade=2)
+        self.assertEqual(balde.retirar(), 0.0)
+        self.assertEqual(balde.retirar(), 0.0)
+        self.assertGreater(balde.retirar(), 0.0)
+
+    def test_baldes_no_mesmo_arquivo_dividem_a_taxa(self):
+        # Dois "workers" com o mesmo arquivo: a rajada de 3 vale para os dois juntos
+        workers = [BaldeTokens(taxa_por_s=10, capacidade=3, arquivo=self.arquivo) for _ in range(2)]
+        esperas = [workers[i % 2].retirar() for i in range(4)]
+        self.assertEqual(esperas[:3], [0.0, 0.0, 0.0])
+        self.assertGreater(esperas[3], 0.0)
+
+    def test_esvaziar_vale_para_todos_os_workers(self):
+        primeiro = BaldeTokens(taxa_por_s=10, capacidade=5, arquivo=self.arquivo)
+        segundo = BaldeTokens(taxa_por_s=10, capacidade=5, arquivo=self.arquivo)
+        primeiro.retirar()
+        primeiro.esvaziar()
+        self.assertGreater(segundo.retirar(), 0.0)
+
+    def test_taxa_total_entre_threads(self):
+        workers = [BaldeTokens(taxa_por_s=50, capacidade=1, arquivo=self.arquivo) for _ in range(4)]
+        inicio = time.monotonic()
+        threads = [threading.Thread(target=lambda balde=balde: [balde.retirar() for _ in range(5)]) for balde in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 20 retiradas a 50/s com rajada 1: pelo menos 19 intervalos de 20 ms
+        self.assertGreaterEqual(time.monotonic() - inicio, 19 / 50 * 0.9)
+
+
+class TestFabricas(unittest.TestCase):
+    def test_clickup_usa_balde_compartilhado(self):
+        integracoes._clientes.pop('clickup', None)
+        try:
+            cliente = integracoes.clickup()
+            self.assertEqual(cliente.balde.arquivo, os.path.join(integracoes.INTEGRACOES_DIR, 'balde_clickup'))
+            self.assertTrue(cliente.estatisticas()['balde_compartilhado'])
+        finally:
+            integracoes._clientes.pop('clickup', None)
+
+
+if __name__ == '__main__':
+    unittest.main()
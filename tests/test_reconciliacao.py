@@ -0,0 +1,57 @@
+"""Testes da comparação cliente a cliente da reconciliação (src/reconciliacao.py).
+
+Executar na raiz do projeto::
+
+    python -m pytest tests
+"""
+import unittest
+
+from src.reconciliacao import TIPOS, comparar
+
+
+def _clickup(cnpj='12.345.678/0001-90', status='ativo'):
+    return {'cnpj': cnpj, 'status': status}
+
+
+def _conta_azul(cnpjs=('12.345.678/0001-90',), nomes=('Empresa Ltda',), status='ativo'):
+    return {'cnpjs': list(cnpjs), 'nomes': list(nomes), 'status': status}
+
+
+class TestComparar(unittest.TestCase):
+    def test_lados_iguais_sem_divergencia(self):
+        self.assertEqual(comparar('12345678000190', _clickup(), _conta_azul()), [])
+
+    def test_sem_cnpj_valido(self):
+        self.assertEqual(comparar('clickup:42', _clickup(cnpj='sem cnpj'), None),
+                         [('cnpj_ausente', 'sem cnpj', None)])
+        self.assertEqual(comparar('nome:Empresa Ltda', None, _conta_azul(cnpjs=())),
+                         [('cnpj_ausente', None, None)])
+        self.assertEqual(comparar('nome:Empresa Ltda', None, _conta_azul(cnpjs=('123',))),
+                         [('cnpj_ausente', None, '123')])
+
+    def test_presente_em_um_lado_so(self):
+        self.assertEqual(comparar('12345678000190', _clickup(), None),
+                         [('so_clickup', '12.345.678/0001-90', None)])
+        self.assertEqual(comparar('12345678000190', None, _conta_azul(cnpjs=('12345678000190', '12.345.678/0001-90'))),
+                         [('so_conta_azul', None, '12345678000190, 12.345.678/0001-90')])
+
+    def test_mesmos_digitos_com_formato_diferente(self):
+        divergencias = comparar('12345678000190', _clickup(), _conta_azul(cnpjs=('12345678000190',)))
+        self.assertEqual(divergencias, [('cnpj_formato', '12.345.678/0001-90', '12345678000190')])
+
+    def test_nomes_e_status_divergentes(self):
+        divergencias = comparar('12345678000190', _clickup(status='churn'),
+                                _conta_azul(nomes=('Empresa Ltda', 'Empresa LTDA ME'), status='ativo'))
+        self.assertEqual(divergencias, [
+            ('nome_divergente', None, 'Empresa Ltda; Empresa LTDA ME'),
+            ('status_desatualizado', 'churn', 'ativo'),
+        ])
+        self.assertTrue({tipo for tipo, _, _ in divergencias} <= set(TIPOS))
+
+    def test_status_ausente_nao_diverge(self):
+        self.assertEqual(comparar('12345678000190', _clickup(status=None), _conta_azul()), [])
+        self.assertEqual(comparar('12345678000190', _clickup(), _conta_azul(status=None)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
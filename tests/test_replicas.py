@@ -0,0 +1,158 @@
+"""Testes do roteamento para réplicas (src/replicas.py) com conexões falsas, sem Postgres.
+
+Executar na raiz do projeto::
+
+    python -m pytest tests
+"""
+import unittest
+
+from src.replicas import SQL_ATRASO, RoteadorReplicas
+
+try:
+    from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+except ImportError:
+    TRANSACTION_STATUS_IDLE = 0
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.resultado = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        return False
+
+    def execute(self, sql, parametros=None):
+        if sql == SQL_ATRASO:
+            self.conn.servidor.verificacoes += 1
+            if isinstance(self.conn.servidor.atraso, Exception):
+                raise self.conn.servidor.atraso
+            self.resultado = (self.conn.servidor.atraso,)
+
+    def fetchone(self):
+        return self.resultado
+
+
+class _Info:
+    transaction_status = TRANSACTION_STATUS_IDLE
+
+
+class _Conexao:
+    info = _Info()
+
+    def __init__(self, servidor):
+        self.servidor = servidor
+        self.closed = 0
+        self.autocommit = False
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def close(self):
+        self.closed = 1
+
+
+class _Servidor:
+    """Réplica falsa: ``atraso`` em segundos, ou a exceção da consulta de atraso"""
+
+    def __init__(self, atraso=0.0):
+        self.atraso = atraso
+        self.fora_do_ar = False
+        self.abertas = 0
+        self.verificacoes = 0
+
+    def conectar(self):
+        if self.fora_do_ar:
+            raise ConnectionError('connection refused')
+        self.abertas += 1
+        return _Conexao(self)
+
+
+class TestRoteadorReplicas(unittest.TestCase):
+    def roteador(self, *servidores, **kwargs):
+        self.servidores = dict(zip(('r1', 'r2'), servidores))
+        kwargs.setdefault('max_atraso', 5.0)
+        kwargs.setdefault('intervalo', 60.0)
+        kwargs.setdefault('tamanho', 2)
+        kwargs.setdefault('espera_s', 0)
+        return RoteadorReplicas(list(self.servidores), lambda dsn: self.servidores[dsn].conectar(), **kwargs)
+
+    def test_rodizio_entre_replicas_saudaveis(self):
+        r1, r2 = _Servidor(), _Servidor()
+        roteador = self.roteador(r1, r2)
+        usadas = []
+        for _ in range(4):
+            conn = roteador.conectar()
+            usadas.append(conn._conn.servidor)
+            conn.close()
+        self.assertEqual(usadas, [r1, r2, r1, r2])
+        # A conexão volta ao pool da réplica e o atraso só é medido uma vez por intervalo
+        self.assertEqual((r1.abertas, r2.abertas), (1, 1))
+        self.assertEqual((r1.verificacoes, r2.verificacoes), (1, 1))
+
+    def test_replica_atrasada_sai_do_rodizio(self):
+        r1, r2 = _Servidor(atraso=30.0), _Servidor(atraso=0.5)
+        roteador = self.roteador(r1, r2)
+        for _ in range(3):
+            conn = roteador.conectar()
+            self.assertIs(conn._conn.servidor, r2)
+            conn.close()
+        estado = {replica['nome']: replica for replica in roteador.estado()}
+        self.assertFalse(estado['replica-1']['saudavel'])
+        self.assertEqual(estado['replica-1']['atraso_s'], 30.0)
+        self.assertTrue(estado['replica-2']['saudavel'])
+
+    def test_replica_volta_depois_da_verificacao(self):
+        r1 = _Servidor(atraso=30.0)
+        roteador = self.roteador(r1, intervalo=0)
+        self.assertIsNone(roteador.conectar())
+        r1.atraso = 1.0
+        conn = roteador.conectar()
+        self.assertIs(conn._conn.servidor, r1)
+        conn.close()
+
+    def test_sem_replica_saudavel_usa_o_primario(self):
+        r1, r2 = _Servidor(atraso=RuntimeError('recovery conflict')), _Servidor()
+        r2.fora_do_ar = True
+        roteador = self.roteador(r1, r2)
+        self.assertIsNone(roteador.conectar())
+        estado = roteador.estado()
+        self.assertEqual([replica['saudavel'] for replica in estado], [False, False])
+        self.assertEqual(estado[0]['erro'], 'recovery conflict')
+        self.assertEqual(estado[1]['erro'], 'connection refused')
+        # Conexão com erro na verificação é descartada, não devolvida ao pool
+        self.assertEqual(estado[0]['pool']['descartadas'], 1)
+        self.assertEqual(estado[0]['pool']['livres'], 0)
+
+    def test_pool_esgotado_pula_para_a_proxima(self):
+        r1, r2 = _Servidor(), _Servidor()
+        roteador = self.roteador(r1, r2, tamanho=1)
+        primeira = roteador.conectar()
+        self.assertIs(primeira._conn.servidor, r1)
+        # r1 sem vaga: a próxima leitura vai para r2, e r1 continua no rodízio
+        segunda = roteador.conectar()
+        terceira = roteador.conectar()
+        self.assertIs(segunda._conn.servidor, r2)
+        self.assertIsNone(terceira)
+        self.assertTrue(all(replica['saudavel'] for replica in roteador.estado()))
+        primeira.close()
+        segunda.close()
+        self.assertEqual([replica['pool']['esgotado'] for replica in roteador.estado()], [1, 1])
+
+    def test_cada_replica_tem_seu_pool(self):
+        r1, r2 = _Servidor(), _Servidor()
+        roteador = self.roteador(r1, r2, tamanho=3)
+        abertas = [roteador.conectar() for _ in range(4)]
+        pools = [replica['pool'] for replica in roteador.estado()]
+        self.assertEqual([pool['em_uso'] for pool in pools], [2, 2])
+        self.assertEqual([pool['tamanho'] for pool in pools], [3, 3])
+        for conn in abertas:
+            conn.close()
+        self.assertEqual([replica['pool']['livres'] for replica in roteador.estado()], [2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+"""Testes do single-flight (src/singleflight.py) no processo e entre workers, sem Postgres.
+
+A coordenação entre workers roda contra um servidor falso que imita os
+advisory locks e a tabela ``singleflight_resultados``.
+
+Executar na raiz do projeto::
+
+    python -m pytest tests
+"""
+import datetime
+import decimal
+import threading
+import time
+import unittest
+
+from src.singleflight import (LiderInterrompido, SingleFlight, SingleFlightPostgres, desserializar,
+                              serializar)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_chamadas_simultaneas_executam_uma_vez(self):
+        coalescedor = SingleFlight()
+        liberar = threading.Event()
+        execucoes = []
+
+        def consulta():
+            execucoes.append(1)
+            liberar.wait(2)
+            return {'cnpj': '123'}
+
+        resultados = []
+        threads = [threading.Thread(target=lambda: resultados.append(coalescedor.executar(('cnpj', '123'), consulta)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while coalescedor.estatisticas()['execucoes_economizadas'] < 4:
+            time.sleep(0.01)
+        liberar.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(execucoes), 1)
+        self.assertEqual(resultados, [{'cnpj': '123'}] * 5)
+        self.assertEqual(coalescedor.estatisticas()['em_andamento'], 0)
+
+    def test_erro_do_lider_chega_a_quem_espera(self):
+        coalescedor = SingleFlight()
+        iniciou = threading.Event()
+        liberar = threading.Event()
+
+        def falhar():
+            iniciou.set()
+            liberar.wait(2)
+            raise ValueError('consulta inválida')
+
+        erros = []
+
+        def seguidor():
+            try:
+                coalescedor.executar('chave', lambda: None)
+            except ValueError as e:
+                erros.append(e)
+
+        lider = threading.Thread(target=lambda: self.assertRaises(ValueError, coalescedor.executar, 'chave', falhar))
+        lider.start()
+        iniciou.wait(2)
+        outro = threading.Thread(target=seguidor)
+        outro.start()
+        while coalescedor.estatisticas()['execucoes_economizadas'] < 1:
+            time.sleep(0.01)
+        liberar.set()
+        lider.join()
+        outro.join()
+        self.assertEqual([str(e) for e in erros], ['consulta inválida'])
+
+    def test_interrupcao_do_lider_vira_lider_interrompido(self):
+        coalescedor = SingleFlight()
+        iniciou = threading.Event()
+        liberar = threading.Event()
+
+        def interromper():
+            iniciou.set()
+            liberar.wait(2)
+            raise SystemExit(1)
+
+        erros = []
+
+        def seguidor():
+            try:
+                coalescedor.executar('chave', lambda: 'não deveria executar')
+            except LiderInterrompido as e:
+                erros.append(e)
+
+        lider = threading.Thread(target=lambda: self.assertRaises(SystemExit, coalescedor.executar, 'chave', interromper))
+        lider.start()
+        iniciou.wait(2)
+        outro = threading.Thread(target=seguidor)
+        outro.start()
+        while coalescedor.estatisticas()['execucoes_economizadas'] < 1:
+            time.sleep(0.01)
+        liberar.set()
+        lider.join()
+        outro.join()
+        self.assertEqual(len(erros), 1)
+
+    def test_serializacao_preserva_tipos(self):
+        resultado = [{'total': decimal.Decimal('10.50'), 'vencimento': datetime.date(2024, 5, 1),
+                      'alterado_em': datetime.datetime(2024, 5, 1, 12, 30), 'nome': 'Ação'}]
+        self.assertEqual(desserializar(serializar(resultado)), resultado)
+
+
+class _Banco:
+    """Advisory locks de sessão e a tabela de resultados, compartilhados entre as conexões"""
+
+    def __init__(self):
+        self.condicao = threading.Condition()
+        self.donos = {}
+        self.resultados = {}
+        self.falhar_unlock = False
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.linha = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        return False
+
+    def execute(self, sql, parametros=None):
+        banco = self.conn.banco
+        sql = ' '.join(sql.split())
+        with banco.condicao:
+            if sql.startswith('SELECT pg_try_advisory_lock'):
+                chave, = parametros
+                livre = banco.donos.get(chave) in (None, self.conn)
+                if livre:
+                    banco.donos[chave] = self.conn
+                self.linha = (livre,)
+            elif sql.startswith('SELECT pg_advisory_lock'):
+                chave, = parametros
+                if not banco.condicao.wait_for(lambda: banco.donos.get(chave) is None, timeout=2):
+                    raise RuntimeError('lock timeout')
+                banco.donos[chave] = self.conn
+            elif sql.startswith('SELECT pg_advisory_unlock'):
+                if banco.falhar_unlock:
+                    raise RuntimeError('server closed the connection unexpectedly')
+                chave, = parametros
+                if banco.donos.get(chave) is self.conn:
+                    del banco.donos[chave]
+                    banco.condicao.notify_all()
+            elif sql.startswith('INSERT INTO singleflight_resultados'):
+                chave, resultado = parametros
+                banco.resultados[chave] = resultado
+            elif sql.startswith('SELECT resultado FROM singleflight_resultados'):
+                chave, _ = parametros
+                self.linha = (banco.resultados[chave],) if chave in banco.resultados else None
+
+    def fetchone(self):
+        return self.linha
+
+
+class _Conexao:
+    def __init__(self, banco):
+        self.banco = banco
+        self.descartada = False
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def descartar(self):
+        self.descartada = True
+        # Fechar a sessão libera os advisory locks dela
+        with self.banco.condicao:
+            for chave, dono in list(self.banco.donos.items()):
+                if dono is self:
+                    del self.banco.donos[chave]
+            self.banco.condicao.notify_all()
+
+    def close(self):
+        pass
+
+
+class TestSingleFlightPostgres(unittest.TestCase):
+    def setUp(self):
+        self.banco = _Banco()
+        self.conexoes = []
+
+    def conectar(self):
+        self.conexoes.append(_Conexao(self.banco))
+        return self.conexoes[-1]
+
+    def test_workers_compartilham_o_resultado_do_lider(self):
+        workers = [SingleFlightPostgres(self.conectar, validade_s=5) for _ in range(3)]
+        iniciou = threading.Event()
+        liberar = threading.Event()
+        execucoes = []
+
+        def consulta():
+            execucoes.append(1)
+            iniciou.set()
+            liberar.wait(2)
+            return [{'total': decimal.Decimal('1.10')}]
+
+        resultados = []
+        lider = threading.Thread(target=lambda: resultados.append(workers[0].executar('chave', consulta)))
+        lider.start()
+        iniciou.wait(2)
+        seguidores = [threading.Thread(target=lambda w=w: resultados.append(w.executar('chave', consulta)))
+                      for w in workers[1:]]
+        for thread in seguidores:
+            thread.start()
+        time.sleep(0.1)
+        liberar.set()
+        for thread in [lider] + seguidores:
+            thread.join()
+        self.assertEqual(len(execucoes), 1)
+        self.assertEqual(resultados, [[{'total': decimal.Decimal('1.10')}]] * 3)
+        self.assertEqual(sum(w.estatisticas()['execucoes_economizadas'] for w in workers), 2)
+
+    def test_sem_conexao_de_coordenacao_executa_direto(self):
+        coalescedor = SingleFlightPostgres(lambda: None)
+        self.assertEqual(coalescedor.executar('chave', lambda: 42), 42)
+        self.assertEqual(coalescedor.estatisticas()['falhas_coordenacao'], 1)
+
+    def test_falha_no_unlock_nao_troca_o_resultado(self):
+        coalescedor = SingleFlightPostgres(self.conectar)
+        self.banco.falhar_unlock = True
+        self.assertEqual(coalescedor.executar('chave', lambda: {'ok': True}), {'ok': True})
+        # A sessão que ficou com o lock é fechada de verdade, liberando-o
+        self.assertTrue(self.conexoes[0].descartada)
+        self.assertEqual(self.banco.donos, {})
+        self.assertEqual(coalescedor.estatisticas()['falhas_coordenacao'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()